@@ -1,81 +1,155 @@
-from fastapi import APIRouter, Depends, HTTPException, Header, UploadFile, File
-from sqlalchemy.ext.asyncio import AsyncSession
-from typing import Dict, Any, List
+from fastapi import APIRouter, Depends, HTTPException, Header, UploadFile, File, Request
+from fastapi.responses import StreamingResponse
+from typing import Dict, Any, List, Optional
 import json
+import os
+import secrets
 
 """
 Controller for Administrative tasks.
 Handles data import from JSON files for various entities (patients, providers, services, etc.)
-and basic administrative security.
+as background jobs, and basic administrative security.
 """
 
-from database import get_db
-from services.import_service import ImportService
+from database import AsyncSessionLocal, engine
+from services.import_jobs import import_jobs, job_status
+from services.import_service import IMPORT_TYPES, ImportService
+from services.import_pipeline import type_for_filename
+from services.cache import result_cache
+from services.singleflight import flights
+from services.view_refresher import view_refresher
+from repositories.materialized_views import MaterializedViewRepository
+from schemas import ImportJobStatus
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
-# fast and simple security for now due to time constraints
-ADMIN_SECRET_KEY = "super-secret-admin-key-change-me"
+# Shared secret for the admin endpoints. There is no default: without it set, the
+# endpoints (imports included) refuse every request.
+ADMIN_SECRET_KEY = os.getenv("ADMIN_SECRET_KEY")
 
 async def verify_admin(x_admin_key: str = Header(...)):
     """
     Simple verification for admin endpoints.
-    Checks the 'x-admin-key' header against the configured secret.
+    Checks the 'x-admin-key' header against the configured secret; 503 when
+    ADMIN_SECRET_KEY is not configured.
     """
-    if x_admin_key != ADMIN_SECRET_KEY:
+    if not ADMIN_SECRET_KEY:
+        raise HTTPException(status_code=503, detail="Admin endpoints are disabled: ADMIN_SECRET_KEY is not set")
+    if not secrets.compare_digest(x_admin_key.encode(), ADMIN_SECRET_KEY.encode()):
         raise HTTPException(status_code=403, detail="Invalid Admin Key")
 
-@router.post("/import_data")
+@router.post("/import_data", status_code=202)
 async def import_data(
-    file: UploadFile = File(...),
-    type: str = Header(..., description="Type of data: patients, providers, services, appointments, payments"),
-    session: AsyncSession = Depends(get_db),
+    file: List[UploadFile] = File(...),
+    type: Optional[str] = Header(None, description="Type of data: patients, providers, services, appointments, appointment_services, payments. Omit to infer each file's type from its name (e.g. patient.json)."),
     _: bool = Depends(verify_admin)
 ):
     """
-    Import data from a JSON file. 
-    'type' header determines the entity type.
+    Start a background import from one or more JSON files.
+    With a single file the 'type' header may give the entity type; otherwise each
+    file's type comes from its name, and sending 'type' is an error. Returns a job id
+    to poll at /admin/import_jobs/{id}.
     """
-    # Disable endpoint temporarily
-    raise HTTPException(status_code=403, detail="Data import functionality is currently disabled.")
-
-    content = await file.read()
     try:
-        data = json.loads(content)
-    except json.JSONDecodeError:
-        raise HTTPException(status_code=400, detail="Invalid JSON file")
+        if type and len(file) > 1:
+            raise ValueError("The 'type' header applies to a single file; omit it to infer each file's type from its name")
+        if type:
+            uploads = {type: file[0].file}
+        else:
+            uploads = {type_for_filename(f.filename): f.file for f in file}
+        if len(uploads) != len(file):
+            raise ValueError("Each data type can only be uploaded once per import")
 
-    if not isinstance(data, list):
-        raise HTTPException(status_code=400, detail="JSON must be a list of objects")
+        job = await import_jobs.submit(uploads)
+    except ValueError as e:
+        # Unknown type or file name, or a type with several files
+        raise HTTPException(status_code=400, detail=str(e))
 
-    # Initialize the import service with the database session
-    service = ImportService(session)
+    return {"job_id": job.id, "status": job.status, "status_url": f"/admin/import_jobs/{job.id}"}
 
-    try:
-        # Route the import to the correct method based on the 'type' header
-        if type == "patients":
-            await service.upsert_patients(data)
-        elif type == "providers":
-            await service.upsert_providers(data)
-        elif type == "services":
-            await service.upsert_services(data)
-        elif type == "appointments":
-            await service.upsert_appointments(data)
-        elif type == "appointment_services":
-            await service.upsert_appointment_services(data)
-        elif type == "payments":
-            await service.upsert_payments(data)
-        else:
-            raise HTTPException(status_code=400, detail=f"Unknown data type: {type}")
-    except Exception as e:
-        # Handle integrity errors specifically to guide the user on dependency order
-        error_msg = str(e)
-        if "IntegrityError" in error_msg or "ForeignKeyViolationError" in error_msg:
-            raise HTTPException(
-                status_code=400, 
-                detail="Dependency missing: This record references an item (like an appointment or patient) that doesn't exist yet. Please ensure you import Patients -> Providers -> Services -> Appointments before Payments."
-            )
-        # In production we'd log this properly
-        raise HTTPException(status_code=500, detail=f"Import failed: {str(e)}")
-
-    return {"status": "success", "count": len(data), "type": type}
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that does not consume `receive` while listening for a disconnect,
+    so the endpoint can keep reading the request body while the response streams.
+    """
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+@router.post("/import_data/ndjson")
+async def import_data_ndjson(
+    request: Request,
+    type: str = Header(..., description="Type of data: patients, providers, services, appointments, appointment_services, payments"),
+    _: bool = Depends(verify_admin)
+):
+    """
+    Import newline-delimited JSON (one record per line) while the request body streams in.
+    Records are validated and written in batches, so memory is bounded by the batch
+    size rather than the upload. The response is an NDJSON report: one line per
+    rejected record, one per written batch and a final summary.
+    """
+    if type not in IMPORT_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unknown data type: {type}")
+
+    async def report():
+        async with AsyncSessionLocal() as session:
+            service = ImportService(session)
+            async for entry in service.import_ndjson(type, request.stream()):
+                yield json.dumps(entry) + "\n"
+
+    return DuplexStreamingResponse(report(), media_type="application/x-ndjson")
+
+@router.get("/import_jobs/{job_id}", response_model=ImportJobStatus)
+async def get_import_job(job_id: str, _: bool = Depends(verify_admin)):
+    """
+    Report an import job's progress: rows processed, throughput, errors and ETA.
+    """
+    job = await import_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job_status(job)
+
+@router.post("/import_jobs/{job_id}/resume", response_model=ImportJobStatus)
+async def resume_import_job(job_id: str, _: bool = Depends(verify_admin)):
+    """
+    Resume a failed (or orphaned) job from its last committed checkpoint.
+    """
+    job = await import_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    if not await import_jobs.start(job_id, include_failed=True):
+        raise HTTPException(status_code=409, detail=f"Import job is {job.status} and cannot be resumed")
+    return job_status(await import_jobs.get(job_id))
+
+@router.get("/cache_stats")
+async def cache_stats(_: bool = Depends(verify_admin)):
+    """
+    Counters for the analytics result cache (hits, stale hits served while
+    refreshing, misses), request coalescing per endpoint (calls, and how many of
+    them joined a computation already in flight) and the connection pool.
+    """
+    pool = engine.pool
+    return {
+        "result_cache": result_cache.info(),
+        "singleflight": {"in_flight": flights.in_flight, "groups": flights.stats},
+        "pool": {"size": pool.size(), "checked_out": pool.checkedout(), "overflow": pool.overflow()},
+    }
+
+@router.get("/materialized_views")
+async def materialized_views(_: bool = Depends(verify_admin)):
+    """Last refresh of each analytics materialized view, and this process's refresh counters."""
+    async with AsyncSessionLocal() as session:
+        views = await MaterializedViewRepository(session).get_refreshes()
+    return {"views": views, "refresher": view_refresher.stats}
+
+@router.post("/materialized_views/refresh")
+async def refresh_materialized_views(_: bool = Depends(verify_admin)):
+    """
+    Refresh the analytics materialized views now, without waiting for the scheduler.
+    409 if another worker is refreshing them.
+    """
+    refreshed = await view_refresher.refresh(force=True)
+    if refreshed is None:
+        raise HTTPException(status_code=409, detail="A refresh is already running")
+    return {"refreshed": refreshed}
@@ -1,5 +1,4 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.ext.asyncio import AsyncSession
 
 """
 Controller for Analytics.
@@ -7,23 +6,20 @@ Provides high-level analytics summaries and business intelligence data
 aggregated from various services.
 """
 
-from database import get_db
-from repositories.analytics import AnalyticsRepository
 from services.analytics import AnalyticsService
+from services.cache import result_cache
 from schemas import AnalyticsSummary
 
 router = APIRouter(prefix="/analytics", tags=["Analytics"])
 
-# Provide repository instance per request.
-def get_analytics_repository(session: AsyncSession = Depends(get_db)) -> AnalyticsRepository:
-    return AnalyticsRepository(session)
-
-# Provide service instance per request.
-def get_analytics_service(repository: AnalyticsRepository = Depends(get_analytics_repository)) -> AnalyticsService:
+# Provide service instance per request. It opens its own sessions: the summary
+# runs its queries concurrently, one connection each.
+def get_analytics_service() -> AnalyticsService:
     """Dependency injection for AnalyticsService"""
-    return AnalyticsService(repository)
+    return AnalyticsService()
 
-# Return the aggregated analytics summary for the dashboard.
+# Return the aggregated analytics summary for the dashboard; cached until the data
+# changes or the top patients view is refreshed (see services/cache.py).
 @router.get("/summary", response_model=AnalyticsSummary)
 async def get_analytics_summary(service: AnalyticsService = Depends(get_analytics_service)):
-    return await service.get_summary()
+    return await result_cache.get_or_compute("analytics/summary", lambda session: service.get_summary(), views=True)
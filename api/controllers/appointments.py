@@ -1,6 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Literal, Optional
 
 """
 Controller for Appointments.
@@ -8,9 +9,11 @@ Manages appointment creation, retrieval, searching, and analytics.
 """
 
 from database import get_db
+from repositories.pagination import InvalidCursor
 from repositories.appointment import AppointmentRepository
 from services.appointment import AppointmentService
-from schemas import Appointment as AppointmentSchema, PaginatedAppointmentsResponse
+from services.cache import result_cache
+from schemas import Appointment as AppointmentSchema, PaginatedAppointmentsResponse, CountMode
 
 router = APIRouter(prefix="/appointments", tags=["Appointments"])
 
@@ -23,10 +26,23 @@ def get_appointment_service(repository: AppointmentRepository = Depends(get_appo
 
 @router.get("/analytics")
 async def read_appointment_analytics(
-    service: AppointmentService = Depends(get_appointment_service)
+    date_from: Optional[datetime] = Query(None, alias="from"),  # Inclusive
+    date_to: Optional[datetime] = Query(None, alias="to"),  # Exclusive
 ):
-    """Get appointment analytics including status breakdown and revenue"""
-    return await service.get_analytics()
+    """
+    Get appointment analytics including status breakdown and revenue.
+    `from`/`to` (ISO date or datetime) limit it to appointments starting in that window.
+    Cached per window until the data changes (see services/cache.py).
+    """
+    try:
+        return await result_cache.get_or_compute(
+            f"appointments/analytics?from={date_from}&to={date_to}",
+            lambda session: AppointmentService(AppointmentRepository(session)).get_analytics(
+                date_from=date_from, date_to=date_to
+            ),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/", response_model=PaginatedAppointmentsResponse)
 async def read_appointments(
@@ -37,20 +53,31 @@ async def read_appointments(
     sort_by: str = "start_time",
     sort_order: str = "desc",
     date_filter: str = None,
+    cursor: str = None,  # next_cursor from the previous page; replaces skip
+    count: CountMode = "exact",
+    mode: Literal["orm", "json"] = "orm",  # json: Postgres builds the payload (same shape, faster)
     service: AppointmentService = Depends(get_appointment_service)
 ):
     """
     Retrieve a paginated list of appointments.
     Supports filtering by date, text search, and sorting.
     """
-    return await service.get_appointments(
+    params = dict(
         skip=skip, 
         limit=limit,
         search=search,
         sort_by=sort_by,
         sort_order=sort_order,
-        date_filter=date_filter
+        date_filter=date_filter,
+        cursor=cursor,
+        count=count
     )
+    try:
+        if mode == "json":
+            return Response(content=await service.get_appointments_json(**params), media_type="application/json")
+        return await service.get_appointments(**params)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/{appointment_id}", response_model=AppointmentSchema)
 async def read_appointment(
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, and_
 from sqlalchemy.orm import selectinload
@@ -14,14 +14,26 @@ Aggregates high-level data for the main dashboard view, including:
 - Timeline of upcoming appointments
 """
 
-from database import get_db
+from database import AsyncSessionLocal
 from models import Appointment, AppointmentService, Patient, Service
 from schemas import DashboardSummary
+from services.singleflight import flights
 
 router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
 
 @router.get("/summary", response_model=DashboardSummary)
-async def get_dashboard_summary(session: AsyncSession = Depends(get_db)):
+async def get_dashboard_summary():
+    # Every workstation loads the dashboard when the clinic opens; concurrent
+    # requests share one computation (see services/singleflight.py).
+    return await flights.do("dashboard/summary", compute_dashboard_summary)
+
+async def compute_dashboard_summary() -> DashboardSummary:
+    # Own session, and serialized before returning: the result outlives the request
+    # that started it and is shared with the requests that joined it.
+    async with AsyncSessionLocal() as session:
+        return DashboardSummary.model_validate(await build_dashboard_summary(session))
+
+async def build_dashboard_summary(session: AsyncSession) -> dict:
     today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
     today_end = today_start + timedelta(days=1)
 
@@ -99,21 +111,6 @@ async def get_dashboard_summary(session: AsyncSession = Depends(get_db)):
 
     upcoming_sorted = sorted(appointments_today_list, key=get_start_time)
     
-    # Populate computed fields for the schema
-    for apt in upcoming_sorted:
-        apt.service_count = len(apt.services)
-        apt.total_cost = sum(s.service.price for s in apt.services if s.service)
-        
-        # Calculate duration
-        duration = 0
-        starts = []
-        for s in apt.services:
-            if s.start and s.end:
-                duration += (s.end - s.start).total_seconds() / 60
-                starts.append(s.start)
-        apt.duration_minutes = int(duration)
-        apt.start_time = min(starts) if starts else None
-
     return {
         "appointments_today": appointments_today_count,
         "revenue_forecast_today": revenue_forecast,
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
@@ -9,10 +9,12 @@ Also provides patient-centric analytics.
 """
 
 from database import get_db
-from repositories.patient import PatientRepository
+from repositories.pagination import InvalidCursor
+from repositories.patient import PatientRepository, RETENTION_MIN_VISITS, RETENTION_LAPSED_DAYS
 from services.patient import PatientService
-from schemas import Patient as PatientSchema, PaginatedPatientsResponse
-from schemas import PatientAnalyticsResponse
+from services.cache import result_cache
+from schemas import Patient as PatientSchema, PaginatedPatientsResponse, CountMode
+from schemas import PatientAnalyticsResponse, PaginatedRetentionResponse
 
 router = APIRouter(prefix="/patients", tags=["Patients"])
 
@@ -27,26 +29,61 @@ async def read_patients(
     skip: int = 0, 
     limit: int = 100, 
     search: str = None,
-    sort_by: str = "first_name",
+    sort_by: str = None,  # Default: relevance when searching, otherwise first_name
     sort_order: str = "asc",
+    cursor: str = None,  # next_cursor from the previous page; replaces skip
+    count: CountMode = "exact",
     service: PatientService = Depends(get_patient_service)
 ):
     """
     Get a paginated list of patients with optional search and sorting.
     """
-    return await service.get_patients(
-        skip=skip, 
-        limit=limit,
-        search=search,
-        sort_by=sort_by,
-        sort_order=sort_order
-    )
+    try:
+        return await service.get_patients(
+            skip=skip, 
+            limit=limit,
+            search=search,
+            sort_by=sort_by,
+            sort_order=sort_order,
+            cursor=cursor,
+            count=count
+        )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/analytics", response_model=PatientAnalyticsResponse)
-async def get_analytics(
+async def get_analytics():
+    # Cached until the data changes (see services/cache.py)
+    return await result_cache.get_or_compute(
+        "patients/analytics",
+        lambda session: PatientService(PatientRepository(session)).get_analytics(),
+    )
+
+@router.get("/retention", response_model=PaginatedRetentionResponse)
+async def read_retention(
+    skip: int = 0,
+    limit: int = 100,
+    cursor: str = None,  # next_cursor from the previous page; replaces skip
+    count: CountMode = "exact",
+    min_visits: int = Query(RETENTION_MIN_VISITS, ge=1),
+    lapsed_days: int = Query(RETENTION_LAPSED_DAYS, ge=0),
     service: PatientService = Depends(get_patient_service)
 ):
-    return await service.get_analytics()
+    """
+    Retention worklist: regulars with no visit in `lapsed_days` days and nothing
+    booked, most overdue first.
+    """
+    try:
+        return await service.get_retention(
+            skip=skip,
+            limit=limit,
+            cursor=cursor,
+            count=count,
+            min_visits=min_visits,
+            lapsed_days=lapsed_days
+        )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/{patient_id}", response_model=PatientSchema)
 async def read_patient(
@@ -8,9 +8,11 @@ Controller for Providers.
 Manages provider profiles, searches, and provider-specific analytics.
 """
 from database import get_db
+from repositories.pagination import InvalidCursor
 from repositories.provider import ProviderRepository
 from services.provider import ProviderService
-from schemas import PaginatedProvidersResponse, ProviderAnalytics, ProviderDetails
+from services.cache import result_cache
+from schemas import PaginatedProvidersResponse, CountMode, ProviderAnalytics, ProviderDetails
 
 router = APIRouter(prefix="/providers", tags=["Providers"])
 
@@ -21,14 +23,19 @@ def get_provider_service(repository: ProviderRepository = Depends(get_provider_r
     return ProviderService(repository)
 
 @router.get("/analytics", response_model=List[ProviderAnalytics])
-async def read_provider_analytics(
-    service: ProviderService = Depends(get_provider_service)
-):
+async def read_provider_analytics():
     """
     Get performance analytics for all providers.
     Includes metrics like revenue, appointment counts, and retention rates.
+    Cached until the data changes (see services/cache.py).
+    Computed from a materialized view refreshed every few minutes; each item's
+    refreshed_at says when it was last refreshed.
     """
-    return await service.get_provider_analytics()
+    return await result_cache.get_or_compute(
+        "providers/analytics",
+        lambda session: ProviderService(ProviderRepository(session)).get_provider_analytics(),
+        views=True,
+    )
 
 @router.get("/", response_model=PaginatedProvidersResponse)
 async def read_providers(
@@ -37,15 +44,22 @@ async def read_providers(
     search: str = None,
     sort_by: str = "first_name",
     sort_order: str = "asc",
+    cursor: str = None,  # next_cursor from the previous page; replaces skip
+    count: CountMode = "exact",
     service: ProviderService = Depends(get_provider_service)
 ):
-    return await service.get_providers(
-        skip=skip, 
-        limit=limit,
-        search=search,
-        sort_by=sort_by,
-        sort_order=sort_order
-    )
+    try:
+        return await service.get_providers(
+            skip=skip, 
+            limit=limit,
+            search=search,
+            sort_by=sort_by,
+            sort_order=sort_order,
+            cursor=cursor,
+            count=count
+        )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/{provider_id}", response_model=ProviderDetails)
 async def read_provider_details(
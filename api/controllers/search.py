@@ -0,0 +1,49 @@
+import time
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+"""
+Controller for Search.
+- /search: ranked full-text search across patients, providers, services and
+  appointments in a single query (generated tsvector columns + GIN indexes).
+- /search/autocomplete: typeahead suggestions served from the in-process
+  autocomplete index (services/autocomplete.py), so keystrokes never reach the database.
+"""
+
+from database import get_db
+from repositories.search import SearchRepository
+from schemas import AutocompleteResponse, SearchResponse
+from services.autocomplete import autocomplete
+from services.search import SearchService
+
+router = APIRouter(prefix="/search", tags=["Search"])
+
+def get_search_repository(session: AsyncSession = Depends(get_db)) -> SearchRepository:
+    return SearchRepository(session)
+
+def get_search_service(repository: SearchRepository = Depends(get_search_repository)) -> SearchService:
+    return SearchService(repository)
+
+@router.get("", response_model=SearchResponse)
+async def search(
+    q: str = Query(..., min_length=1, description="Words to match; each is matched as a prefix"),
+    types: Optional[List[Literal["patient", "provider", "service", "appointment"]]] = Query(
+        None, description="Restrict to these record types"
+    ),
+    limit: int = Query(20, ge=1, le=100),
+    service: SearchService = Depends(get_search_service),
+):
+    """Typed hits ranked by relevance across every searchable entity."""
+    return await service.search(q, types=types, limit=limit)
+
+@router.get("/autocomplete", response_model=AutocompleteResponse)
+async def search_autocomplete(
+    q: str = Query(..., min_length=1, description="Name, email or phone prefix"),
+    limit: int = Query(10, ge=1, le=50),
+    types: Optional[List[Literal["patient", "provider"]]] = Query(None, description="Restrict to these record types"),
+):
+    """Top matches by name, email or phone prefix, with ids for navigation."""
+    start = time.perf_counter()
+    results = autocomplete.search(q, limit=limit, types=types)
+    return {"query": q, "results": results, "took_ms": round((time.perf_counter() - start) * 1000, 3)}
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
@@ -8,9 +8,11 @@ Manages service catalog, price lookups, and service popularity analytics.
 """
 
 from database import get_db
+from repositories.pagination import InvalidCursor
 from repositories.service import ServiceRepository
 from services.service import ServiceService
-from schemas import Service as ServiceSchema, PaginatedServicesResponse, ServiceAnalytics
+from services.cache import result_cache
+from schemas import Service as ServiceSchema, PaginatedServicesResponse, CountMode, ServiceAnalytics
 
 router = APIRouter(prefix="/services", tags=["Services"])
 
@@ -27,21 +29,33 @@ async def read_services(
     search: str = None,
     sort_by: str = "name",
     sort_order: str = "asc",
+    cursor: str = None,  # next_cursor from the previous page; replaces skip
+    count: CountMode = "exact",
     service: ServiceService = Depends(get_service_service)
 ):
-    return await service.get_services(
-        skip=skip, 
-        limit=limit,
-        search=search,
-        sort_by=sort_by,
-        sort_order=sort_order
-    )
+    try:
+        return await service.get_services(
+            skip=skip, 
+            limit=limit,
+            search=search,
+            sort_by=sort_by,
+            sort_order=sort_order,
+            cursor=cursor,
+            count=count
+        )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/analytics", response_model=List[ServiceAnalytics])
-async def read_service_analytics(
-    service: ServiceService = Depends(get_service_service)
-):
+async def read_service_analytics():
     """
     Get analytics for services to identify top-performing treatments.
+    Cached until the data changes (see services/cache.py).
+    Computed from a materialized view refreshed every few minutes; each item's
+    refreshed_at says when it was last refreshed.
     """
-    return await service.get_service_analytics()
+    return await result_cache.get_or_compute(
+        "services/analytics",
+        lambda session: ServiceService(ServiceRepository(session)).get_service_analytics(),
+        views=True,
+    )
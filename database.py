@@ -1,5 +1,7 @@
 import os  # Read environment variables like DATABASE_URL.
+from contextvars import ContextVar  # Per-request state that follows the request's task.
 from dotenv import load_dotenv  # Load variables from a .env file.
+from sqlalchemy import event  # Hook into statement execution.
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker  # Async SQLAlchemy engine/session.
 from sqlalchemy.orm import DeclarativeBase  # Base class for ORM models.
 
@@ -13,7 +15,9 @@ if not DATABASE_URL:
 if DATABASE_URL.startswith("postgresql://"):
     DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
 
-engine = create_async_engine(DATABASE_URL, echo=True)  # Create async engine (echo logs SQL).
+SQL_ECHO = os.getenv("SQL_ECHO", "true").lower() in ("1", "true", "yes")  # Benchmarks turn SQL logging off.
+
+engine = create_async_engine(DATABASE_URL, echo=SQL_ECHO)  # Create async engine (echo logs SQL).
 
 AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False)  # Session factory.
 
@@ -23,6 +27,29 @@ class Base(DeclarativeBase):
     pass
 
 
+class ViewBase(DeclarativeBase):
+    """Base class for materialized views, kept out of Base.metadata so create_all/drop_all skip them."""
+    pass
+
+
+# Statements executed by the current request; None when nobody is counting.
+_query_count: ContextVar = ContextVar("query_count", default=None)
+
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    counter = _query_count.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+def start_query_count() -> list:
+    """Start counting statements for the current task (and tasks it spawns); read result[0]."""
+    counter = [0]
+    _query_count.set(counter)
+    return counter
+
+
 async def get_db():
     # Dependency that yields a DB session and closes it after the request.
     async with AsyncSessionLocal() as session:
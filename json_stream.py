@@ -0,0 +1,229 @@
+import asyncio
+import codecs
+import json
+import os
+
+"""
+Incremental readers for large JSON array files and NDJSON streams (seed data and admin imports).
+Records are decoded a chunk at a time in a worker thread, so the event loop stays
+free and peak memory is bounded by the chunk size rather than the file size.
+"""
+
+CHUNK_SIZE = 5000  # Records per chunk handed to the caller.
+READ_SIZE = 1 << 16  # Bytes pulled from the file per read.
+MAX_RECORD_SIZE = 1 << 22  # Characters one record may span; past this it is treated as malformed.
+
+_WHITESPACE = " \t\n\r"
+
+
+class JsonArrayReader:
+    """Decodes the items of a top-level JSON array one at a time from a binary file object."""
+
+    def __init__(self, fileobj, read_size: int = READ_SIZE, max_record_size: int = MAX_RECORD_SIZE):
+        self.fileobj = fileobj
+        self.read_size = read_size
+        self.max_record_size = max_record_size
+        self.bytes_read = 0  # For progress reporting.
+        self._buf_offset = 0  # Byte offset in the file of self._buf[0], for error messages.
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+        self._started = False
+        self._done = False
+
+    def _fill(self) -> bool:
+        # Read more text into the buffer; returns False once the file is exhausted.
+        if self._eof:
+            return False
+        data = self.fileobj.read(self.read_size)
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self.bytes_read += len(data)
+        self._buf_offset = self.offset()
+        if not data:
+            self._eof = True
+            self._buf = self._buf[self._pos:] + self._utf8.decode(b"", final=True)
+        else:
+            self._buf = self._buf[self._pos:] + self._utf8.decode(data)
+        self._pos = 0
+        return True
+
+    def offset(self) -> int:
+        """Byte offset in the file of the current position."""
+        return self._buf_offset + len(self._buf[:self._pos].encode("utf-8"))
+
+    def _next_char(self):
+        # Skip whitespace and return the next significant character (None at EOF).
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return None
+
+    def _expect(self, allowed: str) -> str:
+        char = self._next_char()
+        if char is None or char not in allowed:
+            raise ValueError(f"Malformed JSON array at byte {self.offset()}: expected one of {allowed!r}, got {char!r}")
+        self._pos += 1
+        return char
+
+    def _decode_value(self):
+        self._next_char()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+                # A value ending exactly at the buffer edge may be truncated (e.g. a number).
+                if end < len(self._buf) or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError as e:
+                # Incomplete values also fail to decode, so read on, but only so far:
+                # a malformed record would otherwise buffer the rest of the file.
+                if self._eof or len(self._buf) - self._pos > self.max_record_size:
+                    raise ValueError(f"Malformed JSON record at byte {self.offset()}: {e.msg}") from None
+            self._fill()
+
+    def read_item(self):
+        """Return the next array item, or raise StopIteration when the array closes."""
+        if self._done:
+            raise StopIteration
+        if not self._started:
+            self._expect("[")
+            self._started = True
+            if self._next_char() == "]":
+                self._pos += 1
+                self._done = True
+                raise StopIteration
+        else:
+            if self._expect(",]") == "]":
+                self._done = True
+                raise StopIteration
+        return self._decode_value()
+
+    def skip(self, count: int) -> int:
+        """Discard up to `count` items (used to resume from a checkpoint); returns how many were skipped."""
+        skipped = 0
+        while skipped < count:
+            try:
+                self.read_item()
+            except StopIteration:
+                break
+            skipped += 1
+        return skipped
+
+    def read_chunk(self, size: int = CHUNK_SIZE, transform=None) -> list:
+        """Return up to `size` items (empty list once exhausted), applying `transform` to each."""
+        chunk = []
+        while len(chunk) < size:
+            try:
+                item = self.read_item()
+            except StopIteration:
+                break
+            chunk.append(transform(item) if transform else item)
+        return chunk
+
+
+def convert_fields(fields, convert):
+    """Build a per-record transform that runs `convert` over the named fields when present."""
+    fields = tuple(fields)
+
+    def transform(record: dict) -> dict:
+        for field in fields:
+            if field in record:
+                record[field] = convert(record[field])
+        return record
+
+    return transform
+
+
+def _file_size(fileobj):
+    try:
+        position = fileobj.tell()
+        fileobj.seek(0, os.SEEK_END)
+        size = fileobj.tell()
+        fileobj.seek(position)
+        return size
+    except (AttributeError, OSError, ValueError):
+        return None  # Not seekable (e.g. a pipe)
+
+
+class JsonChunkStream:
+    """
+    Async iterator over lists of at most `chunk_size` records from a JSON array.
+    Exposes bytes_read/bytes_total for progress reporting; see iter_json_chunks.
+    """
+
+    def __init__(self, source, chunk_size: int = CHUNK_SIZE, transform=None, skip: int = 0):
+        self._opened = isinstance(source, (str, os.PathLike))
+        self._fileobj = open(source, "rb") if self._opened else source
+        self._reader = JsonArrayReader(self._fileobj)
+        self._chunk_size = chunk_size
+        self._transform = transform
+        self._skip = skip
+        self.bytes_total = _file_size(self._fileobj)
+
+    @property
+    def bytes_read(self) -> int:
+        return self._reader.bytes_read
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> list:
+        try:
+            if self._skip:
+                await asyncio.to_thread(self._reader.skip, self._skip)
+                self._skip = 0
+            chunk = await asyncio.to_thread(self._reader.read_chunk, self._chunk_size, self._transform)
+        except BaseException:
+            self.close()
+            raise
+        if not chunk:
+            self.close()
+            raise StopAsyncIteration
+        return chunk
+
+    def close(self):
+        if self._opened and not self._fileobj.closed:
+            self._fileobj.close()
+
+
+def iter_json_chunks(source, chunk_size: int = CHUNK_SIZE, transform=None, skip: int = 0) -> JsonChunkStream:
+    """
+    Iterate a JSON array (path or binary file object) in chunks of at most `chunk_size`
+    records, parsing off the event loop. `skip` drops that many leading records first.
+
+        async for chunk in iter_json_chunks(path, transform=...):
+            ...
+    """
+    return JsonChunkStream(source, chunk_size, transform, skip)
+
+
+async def iter_ndjson_batches(byte_chunks, batch_size: int = CHUNK_SIZE):
+    """
+    Split an async stream of bytes (e.g. a request body) into newline-delimited records.
+    Yields lists of at most `batch_size` (line_number, raw_line) pairs; blank lines are
+    skipped but still counted, so line numbers match the source. Decoding is left to
+    the caller so it can run off the event loop.
+    """
+    pending = b""
+    line_no = 0
+    batch = []
+    async for data in byte_chunks:
+        pending += data
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            line_no += 1
+            if line.strip():
+                batch.append((line_no, line))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+    if pending.strip():
+        batch.append((line_no + 1, pending))
+    if batch:
+        yield batch
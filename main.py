@@ -1,33 +1,58 @@
+import os
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from database import engine, Base
-from api.controllers import patients, analytics, appointments, services, providers, dashboard, admin
+from database import engine, start_query_count
+from api.controllers import patients, analytics, appointments, services, providers, dashboard, admin, search
 
 from sqlalchemy import select
 from database import AsyncSessionLocal
 from models import Patient
-from scripts.seed import seed_data
+from scripts.seed import seed_data, seed_lock, seed_status
+from services.import_jobs import import_jobs
+from services.autocomplete import autocomplete
+from services.cache import result_cache
+from services.view_refresher import view_refresher
+from schema_version import ensure_schema
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: Create tables
-    async with engine.begin() as conn:
-        # In production, we might use alembic instead of create_all
-        await conn.run_sync(Base.metadata.create_all)
+    # Startup: Check the schema revision (applies pending migrations if AUTO_MIGRATE is on)
+    await ensure_schema()
     
-    # Check if DB is empty and seed if necessary
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(select(Patient).limit(1))
-        patient = result.scalar_one_or_none()
-        if not patient:
+    # Check if DB is empty and seed if necessary. Under the seed lock, so workers starting
+    # together (or a CLI seed in progress) never load twice.
+    async with seed_lock():
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(select(Patient).limit(1))
+            patient = result.scalar_one_or_none()
+        if await seed_status() == "loading":
+            # A seed crashed part-way (it commits as it goes); clearing it is an operator decision
+            print("Previous seed did not finish; the data is incomplete. Run `python -m scripts.seed --resume` to load it again.")
+        elif not patient:
             print("Database appears empty. seeding data...")
             await seed_data(reset=False)
         else:
             print("Database already contains data. Skipping seed.")
 
+    # Build the typeahead index before serving (and optionally keep it fresh)
+    await autocomplete.load()
+    autocomplete.start_reloading()
+
+    # Keep the analytics materialized views refreshed in the background
+    view_refresher.start()
+
+    # Pick up background imports interrupted by a previous shutdown or crash
+    resumed = await import_jobs.resume_pending()
+    if resumed:
+        print(f"Resuming {len(resumed)} import job(s): {', '.join(resumed)}")
+
     yield
     # Shutdown
+    await import_jobs.shutdown()
+    await autocomplete.stop()
+    await view_refresher.stop()
+    await result_cache.close()
     await engine.dispose()
 
 app = FastAPI(title="Beauty Med Spa API", lifespan=lifespan)
@@ -40,6 +65,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Report how many SQL statements each request ran (used by scripts/benchmark.py).
+if os.getenv("QUERY_COUNT_HEADER", "").lower() in ("1", "true", "yes"):
+    @app.middleware("http")
+    async def query_count_header(request: Request, call_next):
+        counter = start_query_count()
+        response = await call_next(request)
+        response.headers["X-Query-Count"] = str(counter[0])
+        return response
+
 app.include_router(patients.router)
 app.include_router(analytics.router)
 app.include_router(appointments.router)
@@ -47,6 +81,7 @@ app.include_router(services.router)
 app.include_router(providers.router)
 app.include_router(dashboard.router)
 app.include_router(admin.router)
+app.include_router(search.router)
 
 @app.get("/")
 async def root():
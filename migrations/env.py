@@ -0,0 +1,51 @@
+import asyncio
+from logging.config import fileConfig
+from alembic import context
+from database import Base, DATABASE_URL, engine
+import models  # noqa: F401  (registers every table on Base.metadata)
+
+"""
+Alembic environment.
+Runs against the application's async engine (DATABASE_URL). When the app applies
+migrations itself (schema_version.py) it passes an open connection in
+config.attributes["connection"] and migrations run on that connection.
+"""
+
+config = context.config
+if config.config_file_name is not None and not config.attributes.get("connection"):
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+
+def run_migrations_offline() -> None:
+    # `alembic upgrade head --sql`: emit the SQL instead of running it.
+    context.configure(
+        url=DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def do_run_migrations(connection) -> None:
+    context.configure(connection=connection, target_metadata=target_metadata)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+async def run_migrations_online() -> None:
+    async with engine.connect() as connection:
+        await connection.run_sync(do_run_migrations)
+        await connection.commit()
+    await engine.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+elif config.attributes.get("connection") is not None:
+    do_run_migrations(config.attributes["connection"])
+else:
+    asyncio.run(run_migrations_online())
@@ -0,0 +1,112 @@
+"""initial schema
+
+Tables as previously created by Base.metadata.create_all. Databases created that way
+are stamped at this revision on startup (see schema_version.py) and upgraded from here.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "patients",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("first_name", sa.String(), nullable=False),
+        sa.Column("last_name", sa.String(), nullable=False),
+        sa.Column("date_of_birth", sa.DateTime(), nullable=False),
+        sa.Column("gender", sa.String(), nullable=False),
+        sa.Column("address", sa.String(), nullable=False),
+        sa.Column("phone", sa.String(), nullable=False),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("source", sa.String(), nullable=False),
+        sa.Column("created_date", sa.DateTime(), nullable=False),
+    )
+    op.create_table(
+        "providers",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("first_name", sa.String(), nullable=False),
+        sa.Column("last_name", sa.String(), nullable=False),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("phone", sa.String(), nullable=False),
+        sa.Column("created_date", sa.DateTime(), nullable=False),
+    )
+    op.create_table(
+        "services",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("description", sa.String(), nullable=False),
+        sa.Column("price", sa.Integer(), nullable=False),
+        sa.Column("duration", sa.Integer(), nullable=False),
+        sa.Column("created_date", sa.DateTime(), nullable=False),
+    )
+    op.create_table(
+        "appointments",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("patient_id", sa.String(), sa.ForeignKey("patients.id"), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("created_date", sa.DateTime(), nullable=False),
+    )
+    op.create_table(
+        "appointment_services",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("appointment_id", sa.String(), sa.ForeignKey("appointments.id"), nullable=False),
+        sa.Column("service_id", sa.String(), sa.ForeignKey("services.id"), nullable=False),
+        sa.Column("provider_id", sa.String(), sa.ForeignKey("providers.id"), nullable=False),
+        sa.Column("start", sa.DateTime(), nullable=False),
+        sa.Column("end", sa.DateTime(), nullable=False),
+        sa.UniqueConstraint(
+            "appointment_id", "service_id", "provider_id", "start",
+            name="uq_appointment_services_natural_key",
+        ),
+    )
+    op.create_table(
+        "payments",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("patient_id", sa.String(), sa.ForeignKey("patients.id"), nullable=False),
+        sa.Column("amount", sa.Integer(), nullable=False),
+        sa.Column("date", sa.DateTime(), nullable=False),
+        sa.Column("method", sa.String(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("provider_id", sa.String(), sa.ForeignKey("providers.id"), nullable=False),
+        sa.Column("appointment_id", sa.String(), sa.ForeignKey("appointments.id"), nullable=False),
+        sa.Column("service_id", sa.String(), sa.ForeignKey("services.id"), nullable=False),
+        sa.Column("created_date", sa.DateTime(), nullable=False),
+    )
+    op.create_table(
+        "import_jobs",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("sources", postgresql.JSONB(), nullable=False),
+        sa.Column("progress", postgresql.JSONB(), nullable=False),
+        sa.Column("rows_processed", sa.Integer(), nullable=False),
+        sa.Column("rows_at_start", sa.Integer(), nullable=False),
+        sa.Column("error_count", sa.Integer(), nullable=False),
+        sa.Column("errors", postgresql.JSONB(), nullable=False),
+        sa.Column("created_date", sa.DateTime(), nullable=False),
+        sa.Column("started_at", sa.DateTime(), nullable=True),
+        sa.Column("heartbeat_at", sa.DateTime(), nullable=True),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("import_jobs")
+    op.drop_table("payments")
+    op.drop_table("appointment_services")
+    op.drop_table("appointments")
+    op.drop_table("services")
+    op.drop_table("providers")
+    op.drop_table("patients")
@@ -0,0 +1,54 @@
+"""query indexes
+
+Indexes for the access paths used in repositories/ and the dashboard:
+- FK joins: appointments.patient_id, payments.{patient,appointment,provider,service}_id
+  and appointment_services.{service,provider}_id. appointment_services.appointment_id
+  is already served by the leading column of uq_appointment_services_natural_key.
+- Time ranges: appointment_services.start (today/upcoming, busiest days),
+  payments.date and (status, date) for paid revenue by month, created_date scans.
+- Sorts on the patient table: first_name and last_name.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (index name, table, columns); kept in sync with the index declarations in models.py
+INDEXES = [
+    ("ix_patients_first_name", "patients", ["first_name"]),
+    ("ix_patients_last_name", "patients", ["last_name"]),
+    ("ix_patients_created_date", "patients", ["created_date"]),
+    ("ix_appointments_patient_id", "appointments", ["patient_id"]),
+    ("ix_appointments_status", "appointments", ["status"]),
+    ("ix_appointments_created_date", "appointments", ["created_date"]),
+    ("ix_appointment_services_start", "appointment_services", ["start"]),
+    ("ix_appointment_services_service_id", "appointment_services", ["service_id"]),
+    ("ix_appointment_services_provider_id_start", "appointment_services", ["provider_id", "start"]),
+    ("ix_payments_patient_id", "payments", ["patient_id"]),
+    ("ix_payments_appointment_id", "payments", ["appointment_id"]),
+    ("ix_payments_provider_id", "payments", ["provider_id"]),
+    ("ix_payments_service_id", "payments", ["service_id"]),
+    ("ix_payments_date", "payments", ["date"]),
+    ("ix_payments_status_date", "payments", ["status", "date"]),
+    ("ix_payments_created_date", "payments", ["created_date"]),
+    ("ix_import_jobs_status", "import_jobs", ["status"]),
+]
+
+
+def upgrade() -> None:
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,45 @@
+"""patient trigram search
+
+pg_trgm GIN indexes for the patient table search. ILIKE '%term%' cannot use a btree
+index, but a trigram index serves it (and the fuzzy <% operator) directly. The search
+matches the full name expression, which also covers matches inside first_name or
+last_name alone, and the email.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # Must match the expression built by repositories.patient.full_name().
+    op.create_index(
+        "ix_patients_full_name_trgm",
+        "patients",
+        [sa.text("(first_name || ' ' || last_name) gin_trgm_ops")],
+        postgresql_using="gin",
+    )
+    op.create_index(
+        "ix_patients_email_trgm",
+        "patients",
+        ["email"],
+        postgresql_using="gin",
+        postgresql_ops={"email": "gin_trgm_ops"},
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_patients_email_trgm", table_name="patients")
+    op.drop_index("ix_patients_full_name_trgm", table_name="patients")
+    # The extension is left installed; other database objects may depend on it.
@@ -0,0 +1,60 @@
+"""search vectors
+
+Generated tsvector columns with GIN indexes behind the unified /search endpoint and
+the list endpoints' search on providers, services and appointments. Postgres keeps
+them up to date on every insert and update, including COPY and upserts.
+
+People use the 'simple' configuration (names should not be stemmed); service names
+and descriptions use 'english'. Appointment vectors hold the id and status; patient
+names are matched through patients.search_vector.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# table -> generated expression; kept in sync with the Computed columns in models.py
+SEARCH_VECTORS = {
+    "patients": (
+        "setweight(to_tsvector('simple', coalesce(first_name, '') || ' ' || coalesce(last_name, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(email, '')), 'B')"
+    ),
+    "providers": (
+        "setweight(to_tsvector('simple', coalesce(first_name, '') || ' ' || coalesce(last_name, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(email, '')), 'B')"
+    ),
+    "services": (
+        "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(description, '')), 'B')"
+    ),
+    "appointments": (
+        "setweight(to_tsvector('simple', coalesce(id, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(status, '')), 'B')"
+    ),
+}
+
+
+def upgrade() -> None:
+    for table, expression in SEARCH_VECTORS.items():
+        op.add_column(
+            table,
+            sa.Column("search_vector", postgresql.TSVECTOR(), sa.Computed(expression, persisted=True)),
+        )
+        op.create_index(f"ix_{table}_search_vector", table, ["search_vector"], postgresql_using="gin")
+
+
+def downgrade() -> None:
+    for table in reversed(list(SEARCH_VECTORS)):
+        op.drop_index(f"ix_{table}_search_vector", table_name=table)
+        op.drop_column(table, "search_vector")
@@ -0,0 +1,41 @@
+"""keyset pagination indexes
+
+List endpoints page by seeking past the last row's (sort key, id) instead of OFFSET
+(see repositories/pagination.py). Each single-column sort index from 0002 becomes a
+(column, id) index so the seek and the ORDER BY ... , id are one index range scan in
+either direction. The composite indexes still serve every lookup the old ones did.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (old index, new index, table, sort column); kept in sync with models.py
+INDEXES = [
+    ("ix_patients_first_name", "ix_patients_first_name_id", "patients", "first_name"),
+    ("ix_patients_last_name", "ix_patients_last_name_id", "patients", "last_name"),
+    ("ix_patients_created_date", "ix_patients_created_date_id", "patients", "created_date"),
+    ("ix_appointments_status", "ix_appointments_status_id", "appointments", "status"),
+    ("ix_appointments_created_date", "ix_appointments_created_date_id", "appointments", "created_date"),
+]
+
+
+def upgrade() -> None:
+    for old, new, table, column in INDEXES:
+        op.create_index(new, table, [column, "id"])
+        op.drop_index(old, table_name=table)
+
+
+def downgrade() -> None:
+    for old, new, table, column in reversed(INDEXES):
+        op.create_index(old, table, [column])
+        op.drop_index(new, table_name=table)
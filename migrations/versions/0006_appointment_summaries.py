@@ -0,0 +1,62 @@
+"""appointment summary columns
+
+Stores each appointment's service count, total cost, duration (first start to last
+end) and start time (first service start) on the appointment row, so listing and
+sorting appointments reads indexed columns instead of aggregating
+appointment_services per request. The application keeps them current through
+AppointmentRepository.refresh_summaries; this migration backfills existing rows
+with the same aggregate.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("appointments", sa.Column("service_count", sa.Integer(), server_default="0", nullable=False))
+    op.add_column("appointments", sa.Column("total_cost", sa.Integer(), server_default="0", nullable=False))
+    op.add_column("appointments", sa.Column("duration_minutes", sa.Integer(), server_default="0", nullable=False))
+    op.add_column("appointments", sa.Column("start_time", sa.DateTime(), nullable=True))
+
+    op.execute(
+        """
+        UPDATE appointments AS a
+        SET service_count = s.service_count,
+            total_cost = s.total_cost,
+            duration_minutes = s.duration_minutes,
+            start_time = s.start_time
+        FROM (
+            SELECT
+                l.appointment_id,
+                count(*) AS service_count,
+                coalesce(sum(sv.price), 0) AS total_cost,
+                floor(extract(epoch FROM max(l."end") - min(l.start)) / 60)::integer AS duration_minutes,
+                min(l.start) AS start_time
+            FROM appointment_services AS l
+            LEFT JOIN services AS sv ON sv.id = l.service_id
+            GROUP BY l.appointment_id
+        ) AS s
+        WHERE a.id = s.appointment_id
+        """
+    )
+
+    op.create_index("ix_appointments_start_time_id", "appointments", ["start_time", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_appointments_start_time_id", table_name="appointments")
+    op.drop_column("appointments", "start_time")
+    op.drop_column("appointments", "duration_minutes")
+    op.drop_column("appointments", "total_cost")
+    op.drop_column("appointments", "service_count")
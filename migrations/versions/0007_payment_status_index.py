@@ -0,0 +1,30 @@
+"""payment status lookup index
+
+Per-service payment status is the latest payment for (appointment_id, service_id),
+resolved in SQL for every listed service (see models.AppointmentService.payment_status).
+An (appointment_id, service_id, date) index makes that a single index probe; it also
+serves every appointment_id lookup, so it replaces ix_payments_appointment_id.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_payments_appointment_service_date", "payments", ["appointment_id", "service_id", "date"])
+    op.drop_index("ix_payments_appointment_id", table_name="payments")
+
+
+def downgrade() -> None:
+    op.create_index("ix_payments_appointment_id", "payments", ["appointment_id"])
+    op.drop_index("ix_payments_appointment_service_date", table_name="payments")
@@ -0,0 +1,48 @@
+"""analytics result cache
+
+data_versions holds the counter that imports and the seed scripts bump when data
+changes; cached analytics results computed at an older version are discarded.
+cache_entries backs the result cache when it is shared between workers
+(CACHE_BACKEND=postgres). It is unlogged: it is only a cache, so it skips the WAL
+and is simply emptied after a crash.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0008"
+down_revision: Union[str, None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    data_versions = op.create_table(
+        "data_versions",
+        sa.Column("name", sa.String(), primary_key=True),
+        sa.Column("version", sa.BigInteger(), server_default="0", nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+    )
+    op.bulk_insert(data_versions, [{"name": "data", "version": 1}])
+
+    op.create_table(
+        "cache_entries",
+        sa.Column("key", sa.String(), primary_key=True),
+        sa.Column("value", sa.JSON(), nullable=False),
+        sa.Column("version", sa.BigInteger(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        prefixes=["UNLOGGED"],
+    )
+    op.create_index("ix_cache_entries_created_at", "cache_entries", ["created_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_cache_entries_created_at", table_name="cache_entries")
+    op.drop_table("cache_entries")
+    op.drop_table("data_versions")
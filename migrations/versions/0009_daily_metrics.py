@@ -0,0 +1,91 @@
+"""daily metrics rollup
+
+daily_metrics holds bookings and paid revenue per day, provider, service,
+appointment status and patient source, so revenue, service popularity and weekday
+analytics read one row per day and dimension instead of every appointment service
+and payment. The application keeps it current through
+DailyMetricsRepository.refresh_dates; this migration backfills it with the same
+aggregate.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-17
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0009"
+down_revision: Union[str, None] = "0008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MEASURES = [
+    "bookings", "appointments", "service_minutes",
+    "payments", "revenue", "cash_revenue", "check_revenue", "credit_card_revenue", "debit_card_revenue", "other_revenue",
+]
+
+
+def upgrade() -> None:
+    op.create_table(
+        "daily_metrics",
+        sa.Column("day", sa.Date(), primary_key=True),
+        sa.Column("provider_id", sa.String(), primary_key=True),
+        sa.Column("service_id", sa.String(), primary_key=True),
+        sa.Column("status", sa.String(), primary_key=True),
+        sa.Column("source", sa.String(), primary_key=True),
+        *[sa.Column(name, sa.Integer(), server_default="0", nullable=False) for name in MEASURES],
+    )
+
+    op.execute(
+        """
+        INSERT INTO daily_metrics (
+            day, provider_id, service_id, status, source,
+            bookings, appointments, service_minutes,
+            payments, revenue, cash_revenue, check_revenue, credit_card_revenue, debit_card_revenue, other_revenue
+        )
+        SELECT
+            day, provider_id, service_id, status, source,
+            coalesce(sum(bookings), 0), coalesce(sum(appointments), 0), coalesce(sum(service_minutes), 0),
+            coalesce(sum(payments), 0), coalesce(sum(revenue), 0),
+            coalesce(sum(cash_revenue), 0), coalesce(sum(check_revenue), 0),
+            coalesce(sum(credit_card_revenue), 0), coalesce(sum(debit_card_revenue), 0),
+            coalesce(sum(other_revenue), 0)
+        FROM (
+            SELECT
+                l.start::date AS day, l.provider_id, l.service_id, a.status, p.source,
+                count(*) AS bookings,
+                count(DISTINCT l.appointment_id) AS appointments,
+                round(sum(extract(epoch FROM l."end" - l.start)) / 60) AS service_minutes,
+                0 AS payments, 0 AS revenue, 0 AS cash_revenue, 0 AS check_revenue,
+                0 AS credit_card_revenue, 0 AS debit_card_revenue, 0 AS other_revenue
+            FROM appointment_services AS l
+            JOIN appointments AS a ON a.id = l.appointment_id
+            JOIN patients AS p ON p.id = a.patient_id
+            GROUP BY 1, 2, 3, 4, 5
+            UNION ALL
+            SELECT
+                pm.date::date, pm.provider_id, pm.service_id, a.status, p.source,
+                0, 0, 0,
+                count(*),
+                sum(pm.amount),
+                sum(pm.amount) FILTER (WHERE pm.method = 'cash'),
+                sum(pm.amount) FILTER (WHERE pm.method = 'check'),
+                sum(pm.amount) FILTER (WHERE pm.method = 'credit_card'),
+                sum(pm.amount) FILTER (WHERE pm.method = 'debit_card'),
+                sum(pm.amount) FILTER (WHERE pm.method NOT IN ('cash', 'check', 'credit_card', 'debit_card') OR pm.method IS NULL)
+            FROM payments AS pm
+            JOIN appointments AS a ON a.id = pm.appointment_id
+            JOIN patients AS p ON p.id = pm.patient_id
+            WHERE pm.status = 'paid'
+            GROUP BY 1, 2, 3, 4, 5
+        ) AS facts
+        GROUP BY 1, 2, 3, 4, 5
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("daily_metrics")
@@ -0,0 +1,103 @@
+"""analytics materialized views
+
+Materialized views for the all-time aggregates behind the top patients, provider
+and service analytics, which scan every booked service but can be minutes stale:
+
+- mv_top_patients: per patient, spend on non-cancelled appointments, visits and
+  last visit
+- mv_provider_analytics: per provider, booked services, their list-price revenue
+  and unique patients
+- mv_service_analytics: per service, bookings and their list-price revenue
+
+Names (and service durations) are joined at read time. Each view has a unique
+index so it can be refreshed CONCURRENTLY, without blocking readers; the
+application does that in the background (services/view_refresher.py) and records
+each refresh in view_refreshes.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-17
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0010"
+down_revision: Union[str, None] = "0009"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+VIEWS = ["mv_top_patients", "mv_provider_analytics", "mv_service_analytics"]
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE MATERIALIZED VIEW mv_top_patients AS
+        SELECT
+            a.patient_id,
+            coalesce(sum(sv.price) FILTER (WHERE a.status <> 'cancelled'), 0)::bigint AS total_spent,
+            count(DISTINCT a.id)::integer AS visit_count,
+            max(l.start) AS last_visit
+        FROM appointments AS a
+        JOIN appointment_services AS l ON l.appointment_id = a.id
+        JOIN services AS sv ON sv.id = l.service_id
+        GROUP BY a.patient_id
+        """
+    )
+    op.execute("CREATE UNIQUE INDEX ux_mv_top_patients_patient_id ON mv_top_patients (patient_id)")
+    op.execute("CREATE INDEX ix_mv_top_patients_total_spent ON mv_top_patients (total_spent, patient_id)")
+
+    op.execute(
+        """
+        CREATE MATERIALIZED VIEW mv_provider_analytics AS
+        SELECT
+            l.provider_id,
+            count(*)::integer AS total_services,
+            coalesce(sum(sv.price), 0)::bigint AS total_revenue,
+            count(DISTINCT a.patient_id)::integer AS unique_patients
+        FROM appointment_services AS l
+        JOIN services AS sv ON sv.id = l.service_id
+        JOIN appointments AS a ON a.id = l.appointment_id
+        GROUP BY l.provider_id
+        """
+    )
+    op.execute("CREATE UNIQUE INDEX ux_mv_provider_analytics_provider_id ON mv_provider_analytics (provider_id)")
+
+    op.execute(
+        """
+        CREATE MATERIALIZED VIEW mv_service_analytics AS
+        SELECT
+            l.service_id,
+            count(*)::integer AS bookings,
+            coalesce(sum(sv.price), 0)::bigint AS revenue
+        FROM appointment_services AS l
+        JOIN services AS sv ON sv.id = l.service_id
+        GROUP BY l.service_id
+        """
+    )
+    op.execute("CREATE UNIQUE INDEX ux_mv_service_analytics_service_id ON mv_service_analytics (service_id)")
+
+    op.create_table(
+        "view_refreshes",
+        sa.Column("name", sa.String(), primary_key=True),
+        sa.Column("refreshed_at", sa.DateTime(), nullable=False),
+        sa.Column("duration_ms", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("data_version", sa.BigInteger(), server_default="0", nullable=False),
+    )
+    # The views were just populated, from the data at the current version
+    op.execute(
+        """
+        INSERT INTO view_refreshes (name, refreshed_at, data_version)
+        SELECT v.name, now()::timestamp, coalesce((SELECT version FROM data_versions WHERE name = 'data'), 0)
+        FROM unnest(ARRAY['mv_top_patients', 'mv_provider_analytics', 'mv_service_analytics']) AS v(name)
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("view_refreshes")
+    for name in reversed(VIEWS):
+        op.execute(f"DROP MATERIALIZED VIEW IF EXISTS {name}")
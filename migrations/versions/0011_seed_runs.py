@@ -0,0 +1,36 @@
+"""seed runs
+
+seed_runs records the progress of the seed loaders (scripts/seed.py): a row is
+marked "loading" before any data is written and "complete" once every table,
+summary and rollup is in place. The seed commits as it goes, so after a crash
+mid-seed the tables are partly filled; on startup the API finds the row still at
+"loading" and seeds again instead of treating the partial data as seeded.
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-17
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0011"
+down_revision: Union[str, None] = "0010"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "seed_runs",
+        sa.Column("name", sa.String(), primary_key=True),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("started_at", sa.DateTime(), nullable=False),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("seed_runs")
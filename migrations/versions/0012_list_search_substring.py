@@ -0,0 +1,71 @@
+"""list search substring indexes
+
+The provider, service and appointment list endpoints match their search as a
+substring again (ILIKE '%term%'), as they did before the search vectors of 0004:
+"767b" finds "apt_580bc822332a767b" and "tox" finds "Botox". pg_trgm GIN indexes
+serve those patterns, like the patient ones from 0003:
+
+- providers: the full name expression (which covers first or last name alone) and
+  the email
+- services: name and description
+- appointments: the id; patient names go through ix_patients_full_name_trgm
+
+The appointment search vector held the status as well, so searching "pending" on
+/search returned every pending appointment. It is regenerated from the id alone.
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-17
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision: str = "0012"
+down_revision: Union[str, None] = "0011"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Kept in sync with APPOINTMENT_SEARCH_VECTOR in models.py
+APPOINTMENT_SEARCH_VECTOR = "setweight(to_tsvector('simple', coalesce(id, '')), 'A')"
+OLD_APPOINTMENT_SEARCH_VECTOR = (
+    "setweight(to_tsvector('simple', coalesce(id, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(status, '')), 'B')"
+)
+
+# index -> (table, column or expression)
+TRIGRAM_INDEXES = {
+    # Must match the expression built by repositories.provider.full_name().
+    "ix_providers_full_name_trgm": ("providers", "(first_name || ' ' || last_name)"),
+    "ix_providers_email_trgm": ("providers", "email"),
+    "ix_services_name_trgm": ("services", "name"),
+    "ix_services_description_trgm": ("services", "description"),
+    "ix_appointments_id_trgm": ("appointments", "id"),
+}
+
+
+def set_appointment_search_vector(expression: str) -> None:
+    # A generated column's expression can't be altered in place on every supported
+    # Postgres version; dropping the column drops its index too.
+    op.drop_column("appointments", "search_vector")
+    op.add_column(
+        "appointments",
+        sa.Column("search_vector", postgresql.TSVECTOR(), sa.Computed(expression, persisted=True)),
+    )
+    op.create_index("ix_appointments_search_vector", "appointments", ["search_vector"], postgresql_using="gin")
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, (table, column) in TRIGRAM_INDEXES.items():
+        op.create_index(name, table, [sa.text(f"{column} gin_trgm_ops")], postgresql_using="gin")
+    set_appointment_search_vector(APPOINTMENT_SEARCH_VECTOR)
+
+
+def downgrade() -> None:
+    set_appointment_search_vector(OLD_APPOINTMENT_SEARCH_VECTOR)
+    for name, (table, _) in reversed(list(TRIGRAM_INDEXES.items())):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,72 @@
+"""import jobs and the appointment_services natural key
+
+Makes sure every database has the import_jobs table behind background imports and
+the unique constraint on appointment_services (appointment_id, service_id,
+provider_id, start) that link imports upsert on. Both come from 0001, but a
+database built by create_all before migrations existed was stamped at 0001
+without them. Duplicate links, which imports before the constraint could create,
+are deleted first, keeping the oldest row of each.
+
+Every statement is guarded, so databases that already have both are unchanged.
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-17
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = "0013"
+down_revision: Union[str, None] = "0012"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+NATURAL_KEY = "uq_appointment_services_natural_key"
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS import_jobs (
+            id VARCHAR PRIMARY KEY,
+            status VARCHAR NOT NULL,
+            sources JSONB NOT NULL,
+            progress JSONB NOT NULL,
+            rows_processed INTEGER NOT NULL,
+            rows_at_start INTEGER NOT NULL,
+            error_count INTEGER NOT NULL,
+            errors JSONB NOT NULL,
+            created_date TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            started_at TIMESTAMP WITHOUT TIME ZONE,
+            heartbeat_at TIMESTAMP WITHOUT TIME ZONE,
+            finished_at TIMESTAMP WITHOUT TIME ZONE
+        )
+        """
+    )
+    op.execute("CREATE INDEX IF NOT EXISTS ix_import_jobs_status ON import_jobs (status)")
+    op.execute(
+        f"""
+        DO $$
+        BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = '{NATURAL_KEY}') THEN
+                DELETE FROM appointment_services AS a
+                USING appointment_services AS b
+                WHERE a.id > b.id
+                  AND a.appointment_id = b.appointment_id
+                  AND a.service_id = b.service_id
+                  AND a.provider_id = b.provider_id
+                  AND a.start = b.start;
+                ALTER TABLE appointment_services
+                    ADD CONSTRAINT {NATURAL_KEY} UNIQUE (appointment_id, service_id, provider_id, start);
+            END IF;
+        END
+        $$
+        """
+    )
+
+
+def downgrade() -> None:
+    # Both objects belong to 0001; nothing to undo here.
+    pass
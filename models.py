@@ -1,12 +1,48 @@
-from datetime import datetime
-from typing import List
-from sqlalchemy import String, Integer, DateTime, ForeignKey
-from sqlalchemy.orm import Mapped, mapped_column, relationship
-from database import Base
+from datetime import date, datetime
+from typing import List, Optional
+from sqlalchemy import String, Integer, BigInteger, Date, DateTime, JSON, ForeignKey, Index, UniqueConstraint, Computed, func, select, text
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
+from sqlalchemy.orm import Mapped, column_property, mapped_column, relationship
+from database import Base, ViewBase
+
+# Generated full-text search vectors (migration 0004). Postgres maintains them on
+# every write; the columns are deferred so regular ORM loads don't fetch them.
+PERSON_SEARCH_VECTOR = (
+    "setweight(to_tsvector('simple', coalesce(first_name, '') || ' ' || coalesce(last_name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(email, '')), 'B')"
+)
+SERVICE_SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'B')"
+)
+APPOINTMENT_SEARCH_VECTOR = "setweight(to_tsvector('simple', coalesce(id, '')), 'A')"  # Id only since 0012
+
+
+# Columns derived from other tables and maintained by the application; loaders
+# (scripts/seed.py) leave them out and refresh them after loading.
+DERIVED = {"derived": True}
+
+
+def search_vector_column(expression: str):
+    return mapped_column(TSVECTOR, Computed(expression, persisted=True), deferred=True)
 
 
 class Patient(Base):
     __tablename__ = "patients"
+    __table_args__ = (
+        # Trigram indexes (pg_trgm) behind the front desk search; see migration 0003.
+        Index(
+            "ix_patients_full_name_trgm",
+            text("(first_name || ' ' || last_name) gin_trgm_ops"),
+            postgresql_using="gin",
+        ),
+        Index("ix_patients_email_trgm", "email", postgresql_using="gin", postgresql_ops={"email": "gin_trgm_ops"}),
+        Index("ix_patients_search_vector", "search_vector", postgresql_using="gin"),
+        # (sort column, id) for keyset pagination; see migration 0005.
+        Index("ix_patients_first_name_id", "first_name", "id"),
+        Index("ix_patients_last_name_id", "last_name", "id"),
+        Index("ix_patients_created_date_id", "created_date", "id"),
+    )
 
     id: Mapped[str] = mapped_column(String, primary_key=True)
     first_name: Mapped[str] = mapped_column(String)
@@ -20,12 +56,23 @@ class Patient(Base):
     email: Mapped[str] = mapped_column(String)
     source: Mapped[str] = mapped_column(String)
     created_date: Mapped[datetime] = mapped_column(DateTime)
+    search_vector: Mapped[Optional[str]] = search_vector_column(PERSON_SEARCH_VECTOR)
 
     appointments: Mapped[List["Appointment"]] = relationship(back_populates="patient")
 
 
 class Provider(Base):
     __tablename__ = "providers"
+    __table_args__ = (
+        # Trigram indexes behind the list search; see migration 0012.
+        Index(
+            "ix_providers_full_name_trgm",
+            text("(first_name || ' ' || last_name) gin_trgm_ops"),
+            postgresql_using="gin",
+        ),
+        Index("ix_providers_email_trgm", "email", postgresql_using="gin", postgresql_ops={"email": "gin_trgm_ops"}),
+        Index("ix_providers_search_vector", "search_vector", postgresql_using="gin"),
+    )
 
     id: Mapped[str] = mapped_column(String, primary_key=True)
     first_name: Mapped[str] = mapped_column(String)
@@ -33,10 +80,22 @@ class Provider(Base):
     email: Mapped[str] = mapped_column(String)
     phone: Mapped[str] = mapped_column(String)
     created_date: Mapped[datetime] = mapped_column(DateTime)
+    search_vector: Mapped[Optional[str]] = search_vector_column(PERSON_SEARCH_VECTOR)
 
 
 class Service(Base):
     __tablename__ = "services"
+    __table_args__ = (
+        # Trigram indexes behind the list search; see migration 0012.
+        Index("ix_services_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+        Index(
+            "ix_services_description_trgm",
+            "description",
+            postgresql_using="gin",
+            postgresql_ops={"description": "gin_trgm_ops"},
+        ),
+        Index("ix_services_search_vector", "search_vector", postgresql_using="gin"),
+    )
 
     id: Mapped[str] = mapped_column(String, primary_key=True)
     name: Mapped[str] = mapped_column(String)
@@ -44,15 +103,32 @@ class Service(Base):
     price: Mapped[int] = mapped_column(Integer)  # In cents
     duration: Mapped[int] = mapped_column(Integer)  # In minutes
     created_date: Mapped[datetime] = mapped_column(DateTime)
+    search_vector: Mapped[Optional[str]] = search_vector_column(SERVICE_SEARCH_VECTOR)
 
 
 class Appointment(Base):
     __tablename__ = "appointments"
+    __table_args__ = (
+        Index("ix_appointments_search_vector", "search_vector", postgresql_using="gin"),
+        # Substring search on the id (list search); see migration 0012.
+        Index("ix_appointments_id_trgm", "id", postgresql_using="gin", postgresql_ops={"id": "gin_trgm_ops"}),
+        Index("ix_appointments_status_id", "status", "id"),
+        Index("ix_appointments_created_date_id", "created_date", "id"),
+        Index("ix_appointments_start_time_id", "start_time", "id"),
+    )
 
     id: Mapped[str] = mapped_column(String, primary_key=True)
-    patient_id: Mapped[str] = mapped_column(ForeignKey("patients.id"))
+    patient_id: Mapped[str] = mapped_column(ForeignKey("patients.id"), index=True)
     status: Mapped[str] = mapped_column(String)
     created_date: Mapped[datetime] = mapped_column(DateTime)
+    search_vector: Mapped[Optional[str]] = search_vector_column(APPOINTMENT_SEARCH_VECTOR)
+
+    # Summary of the appointment's services (migration 0006), kept current by
+    # AppointmentRepository.refresh_summaries whenever appointment_services change.
+    service_count: Mapped[int] = mapped_column(Integer, server_default="0", info=DERIVED)
+    total_cost: Mapped[int] = mapped_column(Integer, server_default="0", info=DERIVED)  # In cents
+    duration_minutes: Mapped[int] = mapped_column(Integer, server_default="0", info=DERIVED)  # First start to last end
+    start_time: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True, info=DERIVED)  # First service start
 
     patient: Mapped["Patient"] = relationship(back_populates="appointments")
     services: Mapped[List["AppointmentService"]] = relationship(
@@ -63,12 +139,23 @@ class Appointment(Base):
 
 class AppointmentService(Base):
     __tablename__ = "appointment_services"
+    __table_args__ = (
+        # Natural key: the same service slot can only be booked once per appointment,
+        # which keeps re-imports idempotent despite the surrogate id.
+        UniqueConstraint(
+            "appointment_id", "service_id", "provider_id", "start",
+            name="uq_appointment_services_natural_key",
+        ),
+        # Provider schedules and per-provider date ranges.
+        Index("ix_appointment_services_provider_id_start", "provider_id", "start"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     appointment_id: Mapped[str] = mapped_column(ForeignKey("appointments.id"))
-    service_id: Mapped[str] = mapped_column(ForeignKey("services.id"))
+    # appointment_id lookups use the natural key's leading column; no separate index.
+    service_id: Mapped[str] = mapped_column(ForeignKey("services.id"), index=True)
     provider_id: Mapped[str] = mapped_column(ForeignKey("providers.id"))
-    start: Mapped[datetime] = mapped_column(DateTime)
+    start: Mapped[datetime] = mapped_column(DateTime, index=True)
     end: Mapped[datetime] = mapped_column(DateTime)
 
     appointment: Mapped["Appointment"] = relationship(back_populates="services")
@@ -78,16 +165,184 @@ class AppointmentService(Base):
 
 class Payment(Base):
     __tablename__ = "payments"
+    __table_args__ = (
+        # Paid revenue by month filters on status and groups by date.
+        Index("ix_payments_status_date", "status", "date"),
+        # Latest payment per appointment service (migration 0007); also serves appointment_id lookups.
+        Index("ix_payments_appointment_service_date", "appointment_id", "service_id", "date"),
+    )
 
     id: Mapped[str] = mapped_column(String, primary_key=True)
-    patient_id: Mapped[str] = mapped_column(ForeignKey("patients.id"))
+    patient_id: Mapped[str] = mapped_column(ForeignKey("patients.id"), index=True)
     amount: Mapped[int] = mapped_column(Integer)
-    date: Mapped[datetime] = mapped_column(DateTime)
+    date: Mapped[datetime] = mapped_column(DateTime, index=True)
     method: Mapped[str] = mapped_column(String)
     status: Mapped[str] = mapped_column(String)
-    provider_id: Mapped[str] = mapped_column(ForeignKey("providers.id"))
+    provider_id: Mapped[str] = mapped_column(ForeignKey("providers.id"), index=True)
     appointment_id: Mapped[str] = mapped_column(ForeignKey("appointments.id"))
-    service_id: Mapped[str] = mapped_column(ForeignKey("services.id"))
-    created_date: Mapped[datetime] = mapped_column(DateTime)
+    service_id: Mapped[str] = mapped_column(ForeignKey("services.id"), index=True)
+    created_date: Mapped[datetime] = mapped_column(DateTime, index=True)
 
     appointment: Mapped["Appointment"] = relationship(back_populates="payments")
+
+
+# Payment state resolved by the database: correlated subqueries that Postgres runs
+# as one index probe per row. Deferred, so only the queries that return them (the
+# appointment list and detail) undefer and pay for them.
+
+# Status of the latest payment for the service ("pending", "paid", "failed"), or "unpaid"
+AppointmentService.payment_status = column_property(
+    func.coalesce(
+        select(Payment.status)
+        .where(
+            Payment.appointment_id == AppointmentService.appointment_id,
+            Payment.service_id == AppointmentService.service_id,
+        )
+        .order_by(Payment.date.desc(), Payment.id.desc())
+        .limit(1)
+        .correlate_except(Payment)
+        .scalar_subquery(),
+        "unpaid",
+    ),
+    deferred=True,
+)
+
+# Total cost less what has been paid, in cents (negative when overpaid)
+Appointment.outstanding_balance = column_property(
+    Appointment.total_cost - func.coalesce(
+        select(func.sum(Payment.amount))
+        .where(Payment.appointment_id == Appointment.id, Payment.status == "paid")
+        .correlate_except(Payment)
+        .scalar_subquery(),
+        0,
+    ),
+    deferred=True,
+)
+
+
+class DailyMetric(Base):
+    """
+    Daily rollup of bookings and paid revenue (migration 0009), one row per
+    (day, provider, service, appointment status, patient source). Kept current by
+    DailyMetricsRepository.refresh_dates as imports write; analytics that only need
+    these totals read it instead of the raw rows.
+    """
+    __tablename__ = "daily_metrics"
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    provider_id: Mapped[str] = mapped_column(String, primary_key=True)
+    service_id: Mapped[str] = mapped_column(String, primary_key=True)
+    status: Mapped[str] = mapped_column(String, primary_key=True)  # Appointment status
+    source: Mapped[str] = mapped_column(String, primary_key=True)  # Patient source
+
+    # Booked services starting that day
+    bookings: Mapped[int] = mapped_column(Integer, server_default="0")
+    appointments: Mapped[int] = mapped_column(Integer, server_default="0")  # Distinct within the row only
+    service_minutes: Mapped[int] = mapped_column(Integer, server_default="0")
+
+    # Paid payments dated that day, in cents, in total and per method
+    payments: Mapped[int] = mapped_column(Integer, server_default="0")
+    revenue: Mapped[int] = mapped_column(Integer, server_default="0")
+    cash_revenue: Mapped[int] = mapped_column(Integer, server_default="0")
+    check_revenue: Mapped[int] = mapped_column(Integer, server_default="0")
+    credit_card_revenue: Mapped[int] = mapped_column(Integer, server_default="0")
+    debit_card_revenue: Mapped[int] = mapped_column(Integer, server_default="0")
+    other_revenue: Mapped[int] = mapped_column(Integer, server_default="0")  # Any other method
+
+
+class ImportJob(Base):
+    """A background data import; progress doubles as the resume checkpoint."""
+    __tablename__ = "import_jobs"
+
+    id: Mapped[str] = mapped_column(String, primary_key=True)
+    status: Mapped[str] = mapped_column(String, index=True)  # queued, running, completed, failed
+    sources: Mapped[dict] = mapped_column(JSONB)  # {type: stored upload path}
+    # {type: {"rows", "bytes", "bytes_total", "inserted", "updated", "unchanged", "duplicates", "done"}}
+    # "rows" is the number of records committed, i.e. where a resumed job picks up.
+    progress: Mapped[dict] = mapped_column(JSONB)
+    rows_processed: Mapped[int] = mapped_column(Integer, default=0)
+    rows_at_start: Mapped[int] = mapped_column(Integer, default=0)  # rows_processed when this run began
+    error_count: Mapped[int] = mapped_column(Integer, default=0)
+    errors: Mapped[list] = mapped_column(JSONB, default=list)
+    created_date: Mapped[datetime] = mapped_column(DateTime)
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+    heartbeat_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+
+
+class DataVersion(Base):
+    """
+    Counters bumped whenever a kind of data changes (migration 0008); cached results
+    computed at an older version are discarded (see services/cache.py).
+    """
+    __tablename__ = "data_versions"
+
+    name: Mapped[str] = mapped_column(String, primary_key=True)
+    version: Mapped[int] = mapped_column(BigInteger, server_default="0")
+    updated_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+
+
+class CacheEntry(Base):
+    """Result cache shared by all workers (CACHE_BACKEND=postgres). Unlogged: losing it in a crash is fine."""
+    __tablename__ = "cache_entries"
+    __table_args__ = {"prefixes": ["UNLOGGED"]}
+
+    key: Mapped[str] = mapped_column(String, primary_key=True)
+    value: Mapped[dict] = mapped_column(JSON)  # JSON rather than JSONB keeps the payload's key order
+    version: Mapped[int] = mapped_column(BigInteger)  # Data version the value was computed at
+    created_at: Mapped[datetime] = mapped_column(DateTime, index=True)
+
+
+class SeedRun(Base):
+    """Progress of the seed loaders (migration 0011): "loading" until a seed has fully finished, then "complete"."""
+    __tablename__ = "seed_runs"
+
+    name: Mapped[str] = mapped_column(String, primary_key=True)
+    status: Mapped[str] = mapped_column(String)  # loading, complete
+    started_at: Mapped[datetime] = mapped_column(DateTime)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+
+
+class ViewRefresh(Base):
+    """Last refresh of each materialized view (migration 0010), see services/view_refresher.py."""
+    __tablename__ = "view_refreshes"
+
+    name: Mapped[str] = mapped_column(String, primary_key=True)
+    refreshed_at: Mapped[datetime] = mapped_column(DateTime)
+    duration_ms: Mapped[int] = mapped_column(Integer, server_default="0")
+    data_version: Mapped[int] = mapped_column(BigInteger, server_default="0")  # Data version the view reflects
+
+
+# Materialized views (migration 0010): all-time aggregates refreshed in the
+# background, minutes stale at most. Names are joined at read time.
+
+class TopPatientsView(ViewBase):
+    """Per patient: spend on non-cancelled appointments (cents), visits and last visit."""
+    __tablename__ = "mv_top_patients"
+    __table_args__ = (
+        Index("ix_mv_top_patients_total_spent", "total_spent", "patient_id"),
+    )
+
+    patient_id: Mapped[str] = mapped_column(String, primary_key=True)
+    total_spent: Mapped[int] = mapped_column(BigInteger)
+    visit_count: Mapped[int] = mapped_column(Integer)
+    last_visit: Mapped[Optional[datetime]] = mapped_column(DateTime)
+
+
+class ProviderAnalyticsView(ViewBase):
+    """Per provider: booked services, their list-price revenue (cents) and unique patients."""
+    __tablename__ = "mv_provider_analytics"
+
+    provider_id: Mapped[str] = mapped_column(String, primary_key=True)
+    total_services: Mapped[int] = mapped_column(Integer)
+    total_revenue: Mapped[int] = mapped_column(BigInteger)
+    unique_patients: Mapped[int] = mapped_column(Integer)
+
+
+class ServiceAnalyticsView(ViewBase):
+    """Per service: bookings and their list-price revenue (cents)."""
+    __tablename__ = "mv_service_analytics"
+
+    service_id: Mapped[str] = mapped_column(String, primary_key=True)
+    bookings: Mapped[int] = mapped_column(Integer)
+    revenue: Mapped[int] = mapped_column(BigInteger)
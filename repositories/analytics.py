@@ -1,7 +1,9 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, desc, literal_column
 from repositories.base import BaseRepository
-from models import Patient, Appointment, Payment, Service, AppointmentService, Provider
+from repositories.materialized_views import refreshed_at
+from repositories.patient import PatientRepository
+from models import Patient, Appointment, Payment, Service, AppointmentService, Provider, DailyMetric, TopPatientsView
 
 class AnalyticsRepository:
     def __init__(self, session: AsyncSession):
@@ -26,10 +28,11 @@ class AnalyticsRepository:
         return result.all()
 
     async def get_top_services(self, limit: int = 5):
-        # Join AppointmentService with Service to get names
+        # Bookings per service from the daily rollup, joined to Service for names
         stmt = (
-            select(Service.name, func.count(AppointmentService.service_id).label("count"))
-            .join(AppointmentService, Service.id == AppointmentService.service_id)
+            select(Service.name, func.sum(DailyMetric.bookings).label("count"))
+            .join(DailyMetric, Service.id == DailyMetric.service_id)
+            .where(DailyMetric.bookings > 0)
             .group_by(Service.name)
             .order_by(desc("count"))
             .limit(limit)
@@ -44,15 +47,13 @@ class AnalyticsRepository:
         return result.all()
 
     async def get_monthly_revenue(self):
-        # Group payments by month for the last 12 months
-        # Note: SQLite vs Postgres date functions differ. Assuming Postgres based on recent interactions.
-        # "YYYY-MM" format
+        # Paid revenue by month from the daily rollup, "YYYY-MM"
         stmt = (
             select(
-                func.to_char(Payment.date, 'YYYY-MM').label('month'),
-                func.sum(Payment.amount)
+                func.to_char(DailyMetric.day, 'YYYY-MM').label('month'),
+                func.sum(DailyMetric.revenue)
             )
-            .where(Payment.status == 'paid')
+            .where(DailyMetric.payments > 0)
             .group_by('month')
             .order_by('month')
             .limit(12)
@@ -83,30 +84,27 @@ class AnalyticsRepository:
         }
 
     async def get_appointment_patterns(self):
-        # Day of week (0=Sunday, 6=Saturday in some versions, or 1-7). Postgres: isodow (1=Mon, 7=Sun) or dow (0=Sun, 6=Sat)
-        # Let's use to_char(Day) for simpler labeling later
+        # Booked services per weekday from the daily rollup; to_char(Day) gives the label
+        weekday = func.to_char(DailyMetric.day, literal_column("'Day'"))
         stmt = (
-            select(func.to_char(AppointmentService.start, literal_column("'Day'")), func.count(AppointmentService.appointment_id))
-            .select_from(AppointmentService)
-            .join(Appointment, AppointmentService.appointment_id == Appointment.id) # Ensure we are counting valid appts
-            .group_by(func.to_char(AppointmentService.start, literal_column("'Day'")))
+            select(weekday, func.sum(DailyMetric.bookings))
+            .where(DailyMetric.bookings > 0)
+            .group_by(weekday)
         )
         result = await self.session.execute(stmt)
-        result = await self.session.execute(stmt)
         return result.all()
 
     async def get_provider_revenue(self):
-        # Revenue by provider
-        # Join Payment with Provider
+        # Paid revenue by provider, from the daily rollup
         stmt = (
             select(
                 func.concat(Provider.first_name, ' ', Provider.last_name).label('provider_name'),
-                func.sum(Payment.amount)
+                func.sum(DailyMetric.revenue)
             )
-            .join(Provider, Payment.provider_id == Provider.id)
-            .where(Payment.status == 'paid')
+            .join(Provider, DailyMetric.provider_id == Provider.id)
+            .where(DailyMetric.payments > 0)
             .group_by('provider_name')
-            .order_by(func.sum(Payment.amount).desc())
+            .order_by(func.sum(DailyMetric.revenue).desc())
         )
         result = await self.session.execute(stmt)
         return result.all()
@@ -127,35 +125,20 @@ class AnalyticsRepository:
         return result.all()
 
     async def get_top_patients(self, limit: int = 5) -> list[dict]:
-        from sqlalchemy import case
-        # Top patients by total value of services provided (excluding cancelled appointments for revenue)
-        # But visit count includes all appointments
-        
+        # Top patients by spend on non-cancelled appointments (visit count includes all),
+        # from the mv_top_patients materialized view
+        view = TopPatientsView
         stmt = (
             select(
                 Patient.id,
                 func.concat(Patient.first_name, ' ', Patient.last_name).label('name'),
-                func.sum(
-                    case(
-                        (Appointment.status != 'cancelled', Service.price),
-                        else_=0
-                    )
-                ).label('total_spent'),
-                func.count(func.distinct(Appointment.id)).label('visit_count'),
-                func.max(AppointmentService.start).label('last_visit')
-            )
-            .join(Appointment, Appointment.patient_id == Patient.id)
-            .join(AppointmentService, AppointmentService.appointment_id == Appointment.id)
-            .join(Service, AppointmentService.service_id == Service.id)
-            .group_by(Patient.id, Patient.first_name, Patient.last_name)
-            .order_by(
-                func.sum(
-                    case(
-                        (Appointment.status != 'cancelled', Service.price),
-                        else_=0
-                    )
-                ).desc()
+                view.total_spent,
+                view.visit_count,
+                view.last_visit,
+                refreshed_at(view),
             )
+            .join(Patient, Patient.id == view.patient_id)
+            .order_by(view.total_spent.desc(), view.patient_id.desc())
             .limit(limit)
         )
         
@@ -164,74 +147,14 @@ class AnalyticsRepository:
             {
                 "id": r.id, 
                 "name": r.name, 
-                "total_spent": (r.total_spent or 0) / 100.0, # Convert cents to dollars
+                "total_spent": r.total_spent / 100.0, # Convert cents to dollars
                 "visit_count": r.visit_count,
-                "last_visit": r.last_visit
+                "last_visit": r.last_visit,
+                "refreshed_at": r.refreshed_at
             } 
             for r in result
         ]
 
     async def get_retention_opportunities(self, limit: int = 5) -> list[dict]:
-        from models import Appointment, AppointmentService
-        from datetime import datetime, timedelta
-        
-        # Logic:
-        # 1. Regulars: At least 2 past appointments
-        # 2. At risk: Last appointment was > 60 days ago
-        # 3. Opportunity: No future appointments booked
-        
-        sixty_days_ago = datetime.now() - timedelta(days=60)
-        now = datetime.now()
-        
-        # Subquery for last appointment date per patient
-        # We need to join Appointment -> AppointmentService to get the actual date
-        stmt = (
-            select(
-                Patient.id,
-                func.concat(Patient.first_name, ' ', Patient.last_name).label('name'),
-                Patient.phone,
-                Patient.email,
-                func.max(AppointmentService.start).label('last_visit'),
-                func.count(func.distinct(Appointment.id)).label('visit_count')
-            )
-            .join(Appointment, Appointment.patient_id == Patient.id)
-            .join(AppointmentService, AppointmentService.appointment_id == Appointment.id)
-            .group_by(Patient.id, Patient.first_name, Patient.last_name, Patient.phone, Patient.email)
-            .having(
-                (func.count(func.distinct(Appointment.id)) >= 2) & 
-                (func.max(AppointmentService.start) < sixty_days_ago)
-            )
-        )
-        
-        result = await self.session.execute(stmt)
-        candidates = result.all()
-        
-        opportunities = []
-        for r in candidates:
-            # Check for future appointments
-            future_check = (
-                select(func.count(Appointment.id))
-                .join(AppointmentService)
-                .where(
-                    (Appointment.patient_id == r.id) &
-                    (AppointmentService.start > now) &
-                    (Appointment.status != 'cancelled')
-                )
-            )
-            future_count = await self.session.scalar(future_check) or 0
-            
-            if future_count == 0:
-                days_since = (now - r.last_visit).days
-                opportunities.append({
-                    "id": r.id,
-                    "name": r.name,
-                    "last_visit": r.last_visit,
-                    "days_since_last_visit": days_since,
-                    "phone": r.phone,
-                    "email": r.email
-                })
-                
-        # Sort by days since last visit (descending) -> most overdue first
-        opportunities.sort(key=lambda x: x['days_since_last_visit'], reverse=True)
-        
-        return opportunities[:limit]
+        # Same worklist as /patients/retention, first page only
+        return await PatientRepository(self.session).get_retention_opportunities(limit)
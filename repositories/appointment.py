@@ -1,8 +1,47 @@
+from datetime import datetime, timedelta
+from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
-from sqlalchemy.orm import selectinload
-from models import Appointment, AppointmentService, Patient, Service, Provider
+from sqlalchemy import select, func, cast, update, tuple_, literal_column, case, union, DateTime, Integer, Text
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.orm import selectinload, undefer
+from models import Appointment, AppointmentService, Patient, Service, Provider, Payment
 from repositories.base import BaseRepository
+from repositories.pagination import SortKey, count_rows, fetch_page
+from repositories.patient import full_name
+
+def json_value(column):
+    """
+    Column as it should appear in the JSON. Timestamps are formatted like Pydantic
+    does (microseconds only when non-zero, all six digits) rather than Postgres'
+    own JSON rendering, which trims trailing zeros.
+    """
+    if not isinstance(column.type, DateTime):
+        return column
+    return case(
+        (func.date_trunc("second", column) == column, func.to_char(column, 'YYYY-MM-DD"T"HH24:MI:SS')),
+        else_=func.to_char(column, 'YYYY-MM-DD"T"HH24:MI:SS.US'),
+    )
+
+
+def json_object(model, fields: list[str]):
+    """json_build_object('field', model.field, ...); keys in schema order."""
+    args = []
+    for field in fields:
+        args += [literal_column(f"'{field}'"), json_value(getattr(model, field))]
+    return func.json_build_object(*args)
+
+
+def json_list(element, *order_by):
+    """json_agg(element ORDER BY ...) as a JSON array, [] when there are no rows."""
+    return func.coalesce(func.json_agg(aggregate_order_by(element, *order_by)), literal_column("'[]'::json"))
+
+
+# Fields of each nested object, in the order the Pydantic schemas serialize them
+PATIENT_FIELDS = ["id", "first_name", "last_name", "date_of_birth", "gender", "address", "phone", "email", "source", "created_date"]
+SERVICE_FIELDS = ["id", "name", "description", "price", "duration", "created_date"]
+PROVIDER_FIELDS = ["id", "first_name", "last_name", "email", "phone", "created_date"]
+PAYMENT_FIELDS = ["id", "patient_id", "amount", "date", "method", "status", "provider_id", "appointment_id", "service_id", "created_date"]
+
 
 class AppointmentRepository(BaseRepository[Appointment]):
     def __init__(self, session: AsyncSession):
@@ -15,187 +54,273 @@ class AppointmentRepository(BaseRepository[Appointment]):
         search: str = None,
         sort_by: str = "start_time",
         sort_order: str = "desc",
-        date_filter: str = None  # "today", "all"
-    ) -> tuple[list[Appointment], int]:
-        """Get all appointments with patient information loaded, with search and sorting"""
-        query = (
-            select(self.model)
-            .options(
-                selectinload(self.model.patient),
-                selectinload(self.model.services)
-                .selectinload(AppointmentService.service),
-                selectinload(self.model.services)
-                .selectinload(AppointmentService.provider),
-                selectinload(self.model.payments)
-            )
-        )
+        date_filter: str = None,  # "today", "all"
+        cursor: str = None,
+        count: str = "exact",
+        as_json: bool = False
+    ) -> tuple[list, Optional[int], str, Optional[str]]:
+        """
+        Get all appointments with patient information loaded, with search and sorting.
+        With as_json the items are each appointment's finished JSON document (text),
+        built by Postgres in the page query itself (see document()); no ORM objects.
+        """
+        query = select(self.model)
         
         # Apply search filter
         if search:
-            search_filter = f"%{search}%"
-            query = query.join(self.model.patient).where(
-                Patient.first_name.ilike(search_filter) |
-                Patient.last_name.ilike(search_filter) |
-                (Patient.first_name + ' ' + Patient.last_name).ilike(search_filter) |
-                self.model.id.ilike(search_filter)
-            )
+            query = query.where(self.model.id.in_(self.search_ids(search)))
         
-        # Apply date filter
+        # Apply date filter: appointments whose first service starts today
         if date_filter == "today":
-            from datetime import datetime, timedelta
             today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
             today_end = today_start + timedelta(days=1)
-            
-            # Subquery to find appointments with services starting today
-            today_appointments_subquery = (
-                select(AppointmentService.appointment_id)
-                .where(
-                    (AppointmentService.start >= today_start) &
-                    (AppointmentService.start < today_end)
-                )
-                .distinct()
-                .subquery()
-            )
-            query = query.where(self.model.id.in_(select(today_appointments_subquery)))
+            query = query.where(self.model.start_time >= today_start, self.model.start_time < today_end)
         
         # Get total count before pagination
-        count_query = select(func.count()).select_from(query.subquery())
-        total_result = await self.session.execute(count_query)
-        total = total_result.scalar()
+        filtered = search or date_filter == "today"
+        table = None if filtered else self.model.__table__
+        count_key = f"appointments|{search}|{date_filter}"
+        total, total_kind = await count_rows(self.session, query, count, count_key, table)
         
         # Apply sorting
+        nullable = False
         if sort_by == "start_time":
-            # For start_time, we need to sort by the minimum start time of services
-            # Create a subquery to get min start time per appointment
-            start_time_subquery = (
-                select(
-                    AppointmentService.appointment_id,
-                    func.min(AppointmentService.start).label('min_start')
-                )
-                .group_by(AppointmentService.appointment_id)
-                .subquery()
-            )
-            query = query.outerjoin(
-                start_time_subquery,
-                self.model.id == start_time_subquery.c.appointment_id
-            )
-            sort_column = start_time_subquery.c.min_start
+            # Stored summary column (first service start); see refresh_summaries
+            sort_column = self.model.start_time
+            nullable = True  # Appointments without services have no start time
         elif sort_by == "status":
             sort_column = self.model.status
         elif sort_by == "patient_name":
             sort_column = Patient.last_name
-            query = query.join(self.model.patient) if not search else query
+            query = query.join(self.model.patient)
         else:
             sort_column = self.model.created_date  # default
         
-        if sort_order == "desc":
-            query = query.order_by(sort_column.desc())
+        if as_json:
+            query = query.with_only_columns(self.document(), maintain_column_froms=True)
         else:
-            query = query.order_by(sort_column.asc())
-        
-        # Apply pagination
-        query = query.offset(skip).limit(limit)
-        
-        result = await self.session.execute(query)
-        return list(result.scalars().all()), total
+            query = query.options(*self.detail_options())
+
+        # Page in (sort column, id) order; id makes the order total for cursors
+        descending = sort_order == "desc"
+        keys = [SortKey(sort_column, descending, nullable), SortKey(self.model.id, descending)]
+        scope = f"appointments|{search}|{sort_by}|{sort_order}|{date_filter}"
+        appointments, next_cursor = await fetch_page(self.session, query, keys, limit, skip, cursor, scope)
+        return appointments, total, total_kind, next_cursor
+
+    def detail_options(self) -> list:
+        """
+        Loader options for appointments returned with their related rows: patient,
+        services (with service and provider), payments, and the deferred payment
+        state columns (see models.py).
+        """
+        return [
+            undefer(self.model.outstanding_balance),
+            selectinload(self.model.patient),
+            selectinload(self.model.services)
+            .selectinload(AppointmentService.service),
+            selectinload(self.model.services)
+            .selectinload(AppointmentService.provider),
+            selectinload(self.model.services)
+            .undefer(AppointmentService.payment_status),
+            selectinload(self.model.payments),
+        ]
+
+    def search_ids(self, search: str):
+        """
+        Ids of the appointments whose id, or whose patient's name, contains `search`
+        (case-insensitive, like the patient search). An OR across the patient join
+        can use neither trigram index, so each side selects its own ids, through
+        ix_appointments_id_trgm and ix_patients_full_name_trgm respectively.
+        """
+        search_filter = f"%{search}%"
+        matching_patients = select(Patient.id).where(full_name().ilike(search_filter))
+        return union(
+            select(self.model.id).where(self.model.id.ilike(search_filter)),
+            select(self.model.id).where(self.model.patient_id.in_(matching_patients)),
+        )
+
+    def document(self):
+        """
+        One appointment as the JSON the schemas.Appointment response model produces,
+        built in SQL: the patient, services (with service, provider and payment status)
+        and payments come from correlated subqueries on the page's rows, so a whole page
+        is one statement. Returned as text, ready to splice into a response body.
+        """
+        link = AppointmentService
+        services = (
+            select(
+                json_list(
+                    func.json_build_object(
+                        literal_column("'id'"), link.id,
+                        literal_column("'appointment_id'"), link.appointment_id,
+                        literal_column("'service_id'"), link.service_id,
+                        literal_column("'provider_id'"), link.provider_id,
+                        literal_column("'start'"), json_value(link.start),
+                        literal_column("'end'"), json_value(link.end),
+                        literal_column("'service'"), json_object(Service, SERVICE_FIELDS),
+                        literal_column("'provider'"), json_object(Provider, PROVIDER_FIELDS),
+                        literal_column("'payment_status'"), link.payment_status,
+                    ),
+                    link.start,
+                    link.id,
+                )
+            )
+            .join(Service, Service.id == link.service_id)
+            .join(Provider, Provider.id == link.provider_id)
+            .where(link.appointment_id == self.model.id)
+            .correlate(self.model)
+            .scalar_subquery()
+        )
+        patient = (
+            select(json_object(Patient, PATIENT_FIELDS))
+            .where(Patient.id == self.model.patient_id)
+            .correlate(self.model)  # Only the appointment, even when the page query joins patients
+            .scalar_subquery()
+        )
+        payments = (
+            select(json_list(json_object(Payment, PAYMENT_FIELDS), Payment.date, Payment.id))
+            .where(Payment.appointment_id == self.model.id)
+            .correlate(self.model)
+            .scalar_subquery()
+        )
+        document = func.json_build_object(
+            literal_column("'id'"), self.model.id,
+            literal_column("'patient_id'"), self.model.patient_id,
+            literal_column("'status'"), self.model.status,
+            literal_column("'created_date'"), json_value(self.model.created_date),
+            literal_column("'patient'"), patient,
+            literal_column("'services'"), services,
+            literal_column("'payments'"), payments,
+            literal_column("'service_count'"), self.model.service_count,
+            literal_column("'total_cost'"), self.model.total_cost,
+            literal_column("'duration_minutes'"), self.model.duration_minutes,
+            literal_column("'start_time'"), json_value(self.model.start_time),
+            literal_column("'outstanding_balance'"), self.model.outstanding_balance,
+        )
+        # As text: the driver would otherwise decode it, and it is never needed as Python objects
+        return cast(document, Text).label("document")
+
+    async def refresh_summaries(self, appointment_ids=None) -> int:
+        """
+        Recompute the stored summary columns (service_count, total_cost, duration_minutes,
+        start_time) from appointment_services. `appointment_ids` is a list of ids or a
+        select of ids; None refreshes every appointment. Only rows whose summary
+        changes are written. Returns the number of appointments updated.
+        """
+        link = AppointmentService
+        summary = (
+            select(
+                self.model.id.label("appointment_id"),
+                func.count(link.id).label("service_count"),
+                func.coalesce(func.sum(Service.price), 0).label("total_cost"),
+                func.coalesce(
+                    cast(func.floor(func.extract("epoch", func.max(link.end) - func.min(link.start)) / 60), Integer), 0
+                ).label("duration_minutes"),
+                func.min(link.start).label("start_time"),
+            )
+            .outerjoin(link, link.appointment_id == self.model.id)
+            .outerjoin(Service, Service.id == link.service_id)
+            .group_by(self.model.id)
+        )
+        if appointment_ids is not None:
+            summary = summary.where(self.model.id.in_(appointment_ids))
+        summary = summary.subquery()
+
+        table = self.model.__table__
+        fields = ["service_count", "total_cost", "duration_minutes", "start_time"]
+        stmt = (
+            update(table)
+            .where(table.c.id == summary.c.appointment_id)
+            .where(tuple_(*[table.c[f] for f in fields]).is_distinct_from(tuple_(*[summary.c[f] for f in fields])))
+            .values({f: summary.c[f] for f in fields})
+        )
+        result = await self.session.execute(stmt)
+        return result.rowcount
 
     async def get_by_id_with_details(self, appointment_id: str):
         """Get appointment with all related data: patient, services, providers"""
         query = (
             select(self.model)
-            .options(
-                selectinload(self.model.patient),
-                selectinload(self.model.services)
-                .selectinload(AppointmentService.service),
-                selectinload(self.model.services)
-                .selectinload(AppointmentService.provider),
-                selectinload(self.model.payments)
-            )
+            .options(*self.detail_options())
             .where(self.model.id == appointment_id)
         )
         result = await self.session.execute(query)
         return result.scalar_one_or_none()
     
-    async def get_analytics(self) -> dict:
-        """Get appointment analytics"""
-        from datetime import datetime, timedelta
-        
-        query = select(self.model).options(
-            selectinload(self.model.services).selectinload(AppointmentService.service)
+    async def get_analytics(self, date_from: Optional[datetime] = None, date_to: Optional[datetime] = None) -> dict:
+        """
+        Appointment analytics from grouped aggregates; nothing is loaded row by row.
+        `date_from`/`date_to` bound the window (`date_to` exclusive): appointments by
+        their start time, services by their own start. The today_* figures always
+        cover today.
+        """
+        def window(column):
+            conditions = []
+            if date_from is not None:
+                conditions.append(column >= date_from)
+            if date_to is not None:
+                conditions.append(column < date_to)
+            return conditions
+
+        # Status breakdown; bounded, it is a range scan on ix_appointments_start_time_id
+        status_query = (
+            select(self.model.status, func.count())
+            .where(*window(self.model.start_time))
+            .group_by(self.model.status)
         )
-        result = await self.session.execute(query)
-        appointments = result.scalars().all()
-        
-        total = len(appointments)
-        confirmed = sum(1 for a in appointments if a.status == "confirmed")
-        pending = sum(1 for a in appointments if a.status == "pending")
-        cancelled = sum(1 for a in appointments if a.status == "cancelled")
-        
-        # Calculate today's appointments (appointments with start time today)
+        by_status = dict((await self.session.execute(status_query)).all())
+
+        # Today's appointments: those whose first service starts today
         today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
         today_end = today_start + timedelta(days=1)
-        
-        today_count = 0
-        today_confirmed = 0
-        today_pending = 0
-        today_cancelled = 0
-        
-        for apt in appointments:
-            if apt.services:
-                starts = [svc.start for svc in apt.services if svc.start]
-                if starts:
-                    earliest_start = min(starts)
-                    if today_start <= earliest_start < today_end:
-                        today_count += 1
-                        if apt.status == "confirmed":
-                            today_confirmed += 1
-                        elif apt.status == "pending":
-                            today_pending += 1
-                        elif apt.status == "cancelled":
-                            today_cancelled += 1
-        
-        total_revenue = 0
-        total_duration = 0
-        count_with_duration = 0
-        # Initialize all days to ensure 0 counts are shown
-        day_mapping = {
-            "Monday": 0, "Tuesday": 1, "Wednesday": 2, "Thursday": 3,
-            "Friday": 4, "Saturday": 5, "Sunday": 6
-        }
-        day_counts = {day: 0 for day in day_mapping.keys()}
-        
-        for apt in appointments:
-            if apt.services:
-                for svc in apt.services:
-                    if svc.service and svc.service.price:
-                        total_revenue += svc.service.price
-                    if svc.start and svc.end:
-                        duration = (svc.end - svc.start).total_seconds() / 60
-                        total_duration += duration
-                        count_with_duration += 1
-                        
-                        # Count day of week
-                        day_name = svc.start.strftime('%A')
-                        if day_name in day_counts:
-                            day_counts[day_name] += 1
-        
-        avg_duration = total_duration / count_with_duration if count_with_duration > 0 else 0
-        
-        # Format busiest days sorted Mon-Sun
+        today_query = (
+            select(self.model.status, func.count())
+            .where(self.model.start_time >= today_start, self.model.start_time < today_end)
+            .group_by(self.model.status)
+        )
+        today_by_status = dict((await self.session.execute(today_query)).all())
+
+        # Booked services by ISO weekday (1 = Monday): count, revenue and total minutes,
+        # bounded by ix_appointment_services_start
+        link = AppointmentService
+        minutes = func.extract("epoch", link.end - link.start) / 60
+        day_query = (
+            select(
+                func.extract("isodow", link.start).label("day"),
+                func.count(link.end).label("timed"),
+                func.sum(Service.price).label("revenue"),
+                func.sum(minutes).label("minutes"),
+            )
+            .outerjoin(Service, Service.id == link.service_id)
+            .where(*window(link.start))
+            .group_by("day")
+        )
+        day_rows = (await self.session.execute(day_query)).all()
+
+        total_revenue = sum(int(row.revenue or 0) for row in day_rows)
+        timed = sum(row.timed for row in day_rows)
+        total_minutes = sum(float(row.minutes or 0) for row in day_rows)
+        avg_duration = total_minutes / timed if timed else 0
+
+        # Every day Mon-Sun, including days with no bookings
+        day_counts = {int(row.day): row.timed for row in day_rows if row.day is not None}
         busiest_days = [
-            {"label": day, "value": day_counts[day]} 
-            for day in sorted(day_counts.keys(), key=lambda d: day_mapping[d])
+            {"label": label, "value": day_counts.get(day, 0)}
+            for day, label in enumerate(
+                ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"], start=1
+            )
         ]
-        
+
         return {
-            "total_appointments": total,
-            "confirmed": confirmed,
-            "pending": pending,
-            "cancelled": cancelled,
-            "today_appointments": today_count,
-            "today_confirmed": today_confirmed,
-            "today_pending": today_pending,
-            "today_cancelled": today_cancelled,
+            "total_appointments": sum(by_status.values()),
+            "confirmed": by_status.get("confirmed", 0),
+            "pending": by_status.get("pending", 0),
+            "cancelled": by_status.get("cancelled", 0),
+            "today_appointments": sum(today_by_status.values()),
+            "today_confirmed": today_by_status.get("confirmed", 0),
+            "today_pending": today_by_status.get("pending", 0),
+            "today_cancelled": today_by_status.get("cancelled", 0),
             "total_revenue": total_revenue,
             "avg_duration_minutes": round(avg_duration, 1),
             "busiest_days": busiest_days
@@ -17,3 +17,16 @@ class BaseRepository(Generic[T]):
 
     async def get_by_id(self, id: Any) -> Optional[T]:
         return await self.session.get(self.model, id)
+
+    async def stream_columns(self, columns, batch_size: int = 10000):
+        """Yield lists of row tuples for `columns` over the whole table, fetched in batches with a server-side cursor."""
+        result = await self.session.stream(select(*columns).execution_options(yield_per=batch_size))
+        async for partition in result.partitions():
+            yield partition
+
+    async def get_columns(self, columns, ids: List[Any]) -> list:
+        """Row tuples for `columns` of the given primary keys."""
+        if not ids:
+            return []
+        result = await self.session.execute(select(*columns).where(self.model.id.in_(ids)))
+        return list(result.all())
@@ -0,0 +1,128 @@
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+from sqlalchemy import Date, cast, delete, func, insert, literal, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import Appointment, AppointmentService, DailyMetric, Patient, Payment
+
+"""
+The daily_metrics rollup (migration 0009): bookings and paid revenue per day,
+provider, service, appointment status and patient source. Analytics that only
+need those totals read a row per day and dimension instead of every booking and
+payment.
+
+A day's rows are always recomputed whole from the raw tables (refresh_dates), so
+an incremental refresh and a full rebuild produce the same rows. Imports refresh
+the days they touch in their own transaction; scripts/rebuild_rollups.py and the
+seed loaders rebuild everything.
+"""
+
+PAYMENT_METHODS = ("cash", "check", "credit_card", "debit_card")  # Each has a <method>_revenue column
+
+KEYS = ["day", "provider_id", "service_id", "status", "source"]
+BOOKING_MEASURES = ["bookings", "appointments", "service_minutes"]
+PAYMENT_MEASURES = ["payments", "revenue", *[f"{method}_revenue" for method in PAYMENT_METHODS], "other_revenue"]
+
+# Advisory lock serializing rollup writers: two transactions refreshing the same
+# day would otherwise both insert its rows.
+ROLLUP_LOCK = "daily_metrics"
+
+
+def in_days(column, days: list[date]) -> list:
+    """`column` (a timestamp) falls on one of `days`, as an index range plus a date filter."""
+    return [
+        column >= datetime.combine(min(days), time()),
+        column < datetime.combine(max(days) + timedelta(days=1), time()),
+        cast(column, Date).in_(days),
+    ]
+
+
+class DailyMetricsRepository:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    def aggregate(self, days: Optional[list[date]] = None):
+        """Rollup rows computed from the raw tables, for `days` or (None) all of them."""
+        link = AppointmentService
+        booking_day = cast(link.start, Date)
+        bookings = (
+            select(
+                booking_day.label("day"), link.provider_id, link.service_id, Appointment.status, Patient.source,
+                func.count().label("bookings"),
+                func.count(func.distinct(link.appointment_id)).label("appointments"),
+                func.round(func.sum(func.extract("epoch", link.end - link.start)) / 60).label("service_minutes"),
+                *[literal(0).label(measure) for measure in PAYMENT_MEASURES],
+            )
+            .join(Appointment, Appointment.id == link.appointment_id)
+            .join(Patient, Patient.id == Appointment.patient_id)
+            .group_by(booking_day, link.provider_id, link.service_id, Appointment.status, Patient.source)
+        )
+
+        payment_day = cast(Payment.date, Date)
+        paid = func.sum(Payment.amount)
+        payments = (
+            select(
+                payment_day.label("day"), Payment.provider_id, Payment.service_id, Appointment.status, Patient.source,
+                *[literal(0).label(measure) for measure in BOOKING_MEASURES],
+                func.count().label("payments"),
+                paid.label("revenue"),
+                *[paid.filter(Payment.method == method).label(f"{method}_revenue") for method in PAYMENT_METHODS],
+                paid.filter(Payment.method.not_in(PAYMENT_METHODS) | Payment.method.is_(None)).label("other_revenue"),
+            )
+            .join(Appointment, Appointment.id == Payment.appointment_id)
+            .join(Patient, Patient.id == Payment.patient_id)
+            .where(Payment.status == "paid")
+            .group_by(payment_day, Payment.provider_id, Payment.service_id, Appointment.status, Patient.source)
+        )
+
+        if days is not None:
+            bookings = bookings.where(*in_days(link.start, days))
+            payments = payments.where(*in_days(Payment.date, days))
+
+        combined = union_all(bookings, payments).subquery()
+        return (
+            select(
+                *[combined.c[key] for key in KEYS],
+                *[func.coalesce(func.sum(combined.c[measure]), 0) for measure in BOOKING_MEASURES + PAYMENT_MEASURES],
+            )
+            .group_by(*[combined.c[key] for key in KEYS])
+        )
+
+    async def _write(self, days: Optional[list[date]]) -> int:
+        await self.session.execute(select(func.pg_advisory_xact_lock(func.hashtext(ROLLUP_LOCK))))
+        stale = delete(DailyMetric)
+        if days is not None:
+            stale = stale.where(DailyMetric.day.in_(days))
+        await self.session.execute(stale)
+        result = await self.session.execute(
+            insert(DailyMetric).from_select(KEYS + BOOKING_MEASURES + PAYMENT_MEASURES, self.aggregate(days))
+        )
+        return result.rowcount
+
+    async def refresh_dates(self, days) -> int:
+        """
+        Recompute the rollup for `days`: dates, or a select of dates. Runs in the
+        caller's transaction. Returns the number of rollup rows written.
+        """
+        if not isinstance(days, (list, tuple, set)):
+            days = (await self.session.scalars(days)).all()
+        days = sorted({day for day in days if day is not None})
+        if not days:
+            return 0
+        return await self._write(days)
+
+    async def rebuild(self) -> int:
+        """Recompute the whole rollup. Returns the number of rows written."""
+        return await self._write(None)
+
+    @staticmethod
+    def days_of_appointments(appointment_ids):
+        """Select of the days the appointments' services and payments fall on."""
+        return union_all(
+            select(cast(AppointmentService.start, Date)).where(AppointmentService.appointment_id.in_(appointment_ids)),
+            select(cast(Payment.date, Date)).where(Payment.appointment_id.in_(appointment_ids)),
+        )
+
+    @staticmethod
+    def days_of_payments(payment_ids):
+        """Select of the days the payments are dated."""
+        return select(cast(Payment.date, Date).distinct()).where(Payment.id.in_(payment_ids))
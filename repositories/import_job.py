@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import update, bindparam, func, or_, and_
+from sqlalchemy.dialects.postgresql import JSONB
+from models import ImportJob
+from repositories.base import BaseRepository
+
+MAX_STORED_ERRORS = 100  # Keep the job row small; error_count still counts everything
+
+
+class ImportJobRepository(BaseRepository[ImportJob]):
+    def __init__(self, session: AsyncSession):
+        super().__init__(session, ImportJob)
+
+    async def create(self, job_id: str, sources: dict, progress: dict) -> ImportJob:
+        job = self.model(
+            id=job_id,
+            status="queued",
+            sources=sources,
+            progress=progress,
+            rows_processed=0,
+            rows_at_start=0,
+            error_count=0,
+            errors=[],
+            created_date=datetime.utcnow(),
+        )
+        self.session.add(job)
+        await self.session.commit()
+        return job
+
+    async def claim(self, job_id: Optional[str] = None, stale_after: int = 120, include_failed: bool = False) -> list[str]:
+        """
+        Atomically mark runnable jobs as running and return their ids.
+        Runnable means queued, or running with no heartbeat for `stale_after` seconds
+        (the worker died), or failed when include_failed is set (manual resume).
+        """
+        now = datetime.utcnow()
+        runnable = [
+            self.model.status == "queued",
+            and_(
+                self.model.status == "running",
+                or_(self.model.heartbeat_at.is_(None), self.model.heartbeat_at < now - timedelta(seconds=stale_after)),
+            ),
+        ]
+        if include_failed:
+            runnable.append(self.model.status == "failed")
+
+        stmt = (
+            update(self.model)
+            .where(or_(*runnable))
+            .values(
+                status="running",
+                started_at=now,
+                heartbeat_at=now,
+                finished_at=None,
+                rows_at_start=self.model.rows_processed,
+            )
+            .returning(self.model.id)
+        )
+        if job_id:
+            stmt = stmt.where(self.model.id == job_id)
+        result = await self.session.execute(stmt)
+        ids = list(result.scalars().all())
+        await self.session.commit()
+        return ids
+
+    async def record_progress(self, job_id: str, type: str, rows: int, checkpoint: dict):
+        """
+        Merge one type's checkpoint into the job and add `rows` to the running total.
+        Runs in the caller's transaction so data and checkpoint commit together.
+        """
+        stmt = (
+            update(self.model)
+            .where(self.model.id == job_id)
+            .values(
+                progress=self.model.progress.op("||", return_type=JSONB)(
+                    func.jsonb_build_object(type, bindparam("checkpoint", checkpoint, type_=JSONB))
+                ),
+                rows_processed=self.model.rows_processed + rows,
+                heartbeat_at=datetime.utcnow(),
+            )
+        )
+        await self.session.execute(stmt)
+
+    async def finish(self, job_id: str, status: str, error: Optional[dict] = None):
+        job = await self.get_by_id(job_id)
+        if not job:
+            return
+        job.status = status
+        job.finished_at = datetime.utcnow()
+        if error:
+            job.error_count += 1
+            job.errors = (job.errors + [error])[-MAX_STORED_ERRORS:]
+        await self.session.commit()
@@ -0,0 +1,70 @@
+import time
+from datetime import datetime
+from typing import Dict, List
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import ProviderAnalyticsView, ServiceAnalyticsView, TopPatientsView, ViewRefresh
+
+"""
+Refreshes of the analytics materialized views (migration 0010) and their
+bookkeeping in view_refreshes. The scheduling lives in services/view_refresher.py.
+"""
+
+VIEWS = [model.__tablename__ for model in (TopPatientsView, ProviderAnalyticsView, ServiceAnalyticsView)]
+
+# Advisory lock held by the refreshing transaction, so only one worker refreshes at a time
+REFRESH_LOCK = "materialized_views"
+
+
+def refreshed_at(view):
+    """Scalar subquery for the view's last refresh time, to select alongside its rows."""
+    return (
+        select(ViewRefresh.refreshed_at)
+        .where(ViewRefresh.name == view.__tablename__)
+        .scalar_subquery()
+        .label("refreshed_at")
+    )
+
+
+class MaterializedViewRepository:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def try_lock(self) -> bool:
+        """Take the refresh lock for the current transaction; False if another one holds it."""
+        return await self.session.scalar(select(func.pg_try_advisory_xact_lock(func.hashtext(REFRESH_LOCK))))
+
+    async def refreshed_versions(self) -> Dict[str, int]:
+        """Data version each view was last refreshed at."""
+        result = await self.session.execute(select(ViewRefresh.name, ViewRefresh.data_version))
+        return dict(result.all())
+
+    async def refresh(self, name: str) -> float:
+        """
+        REFRESH ... CONCURRENTLY one view (readers keep seeing the old contents until
+        the transaction commits). Returns the time taken in milliseconds.
+        """
+        if name not in VIEWS:
+            raise ValueError(f"Unknown materialized view {name!r}")
+        started = time.perf_counter()
+        await self.session.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {name}"))
+        return (time.perf_counter() - started) * 1000
+
+    async def record(self, name: str, duration_ms: float, data_version: int):
+        values = dict(refreshed_at=datetime.now(), duration_ms=round(duration_ms), data_version=data_version)
+        await self.session.execute(
+            insert(ViewRefresh).values(name=name, **values).on_conflict_do_update(index_elements=["name"], set_=values)
+        )
+
+    async def get_refreshes(self) -> List[dict]:
+        result = await self.session.execute(select(ViewRefresh).order_by(ViewRefresh.name))
+        return [
+            {
+                "name": row.name,
+                "refreshed_at": row.refreshed_at,
+                "duration_ms": row.duration_ms,
+                "data_version": row.data_version,
+            }
+            for row in result.scalars()
+        ]
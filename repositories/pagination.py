@@ -0,0 +1,219 @@
+import base64
+import binascii
+import json
+import os
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, List, NamedTuple, Optional, Tuple
+from sqlalchemy import and_, or_, tuple_, false, select, func, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from services.cache import result_cache
+
+"""
+Keyset (cursor) pagination shared by the list repositories.
+
+A page is ordered by the requested sort keys plus the primary key as a unique
+tiebreaker. Instead of OFFSET, the next page seeks past the last row's key values,
+so every page costs the same and rows don't shift when data changes between
+requests. The cursor is an opaque, URL-safe token holding those values plus a
+scope string (sort and filters) so it can't be replayed against a different order.
+
+The total that comes with a page is selectable (`count=`): "exact" runs count(*)
+and caches it briefly per filter, "estimate" uses a cached exact count when there
+is one and otherwise the planner's row estimate, and "none" skips it. Cached counts
+are stamped with the shared data version (services/cache.py), so an import in any
+worker retires them, like cached analytics.
+"""
+
+COUNT_CACHE_SECONDS = float(os.getenv("COUNT_CACHE_SECONDS", "30"))
+COUNT_CACHE_SIZE = 1000
+
+
+class CachedCount(NamedTuple):
+    expires_at: float  # time.monotonic()
+    version: int  # Data version it was counted at
+    total: int
+
+
+# filter key -> cached count, least recently used first
+_count_cache: OrderedDict[str, CachedCount] = OrderedDict()
+
+
+class SortKey(NamedTuple):
+    expr: Any
+    descending: bool = False
+    nullable: bool = False  # NULLs sort as the largest values (Postgres' default): last ascending, first descending
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"d": value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if "dt" in value:
+            return datetime.fromisoformat(value["dt"])
+        if "d" in value:
+            return date.fromisoformat(value["d"])
+    return value
+
+
+def encode_cursor(scope: str, values: List[Any]) -> str:
+    payload = json.dumps({"s": scope, "v": [_encode_value(v) for v in values]}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, scope: str, size: int) -> List[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values = [_decode_value(v) for v in payload["v"]]
+    except (binascii.Error, ValueError, TypeError, KeyError, UnicodeDecodeError):
+        raise InvalidCursor("Malformed cursor")
+    if payload.get("s") != scope or len(values) != size:
+        raise InvalidCursor("Cursor does not match this sort order or filter; start again without it")
+    return values
+
+
+def order_by(keys: List[SortKey]) -> list:
+    # Default NULL placement, so a (key, id) btree index serves either direction
+    return [key.expr.desc() if key.descending else key.expr.asc() for key in keys]
+
+
+def seek(keys: List[SortKey], values: List[Any]):
+    """WHERE clause selecting the rows that come after `values` in `keys` order."""
+    directions = {key.descending for key in keys}
+    descending = keys[0].descending
+    if len(directions) == 1 and None not in values and (descending or not any(key.nullable for key in keys)):
+        # Row-value comparison: a single index range scan on (key..., id). Descending,
+        # rows with a NULL key sort first, so comparing them to NULL correctly drops them.
+        row, last = tuple_(*[key.expr for key in keys]), tuple_(*values)
+        return row < last if descending else row > last
+
+    # General form: lexicographic OR-chain, with NULL as the largest value.
+    conditions = []
+    for i, (key, value) in enumerate(zip(keys, values)):
+        equal_before = [
+            prev.expr.is_(None) if prev_value is None else prev.expr == prev_value
+            for prev, prev_value in zip(keys[:i], values[:i])
+        ]
+        if key.descending:
+            after = key.expr.is_not(None) if value is None else key.expr < value
+        elif value is None:
+            after = false()  # Nothing sorts after NULL ascending; fall through to the next key
+        else:
+            after = key.expr > value
+            if key.nullable:
+                after = or_(after, key.expr.is_(None))
+        conditions.append(and_(*equal_before, after))
+    return or_(*conditions)
+
+
+async def fetch_page(
+    session: AsyncSession,
+    query,
+    keys: List[SortKey],
+    limit: int,
+    skip: int = 0,
+    cursor: Optional[str] = None,
+    scope: str = "",
+) -> tuple[list, Optional[str]]:
+    """
+    Run `query` ordered by `keys`. Items are the selected ORM entity, or the whole
+    rows when the query selects several columns.
+    With a cursor it seeks past the cursor's row; otherwise it falls back to OFFSET
+    `skip`. Returns (items, next_cursor); next_cursor is None on the last page.
+    """
+    width = len(query.column_descriptions)
+    if cursor:
+        query = query.where(seek(keys, decode_cursor(cursor, scope, len(keys))))
+    elif skip:
+        query = query.offset(skip)
+
+    # Fetch one extra row to know whether another page exists, and the sort values
+    # alongside each entity to build the next cursor from.
+    query = query.add_columns(*[key.expr for key in keys]).order_by(*order_by(keys)).limit(limit + 1)
+    rows = (await session.execute(query)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(scope, list(rows[-1][width:]))
+    return [row[0] if width == 1 else row for row in rows], next_cursor
+
+
+def _cached_count(key: str, version: int) -> Optional[int]:
+    entry = _count_cache.get(key)
+    if entry is None:
+        return None
+    if entry.version != version or entry.expires_at <= time.monotonic():
+        del _count_cache[key]
+        return None
+    _count_cache.move_to_end(key)
+    return entry.total
+
+
+def _store_count(key: str, version: int, total: int):
+    _count_cache[key] = CachedCount(time.monotonic() + COUNT_CACHE_SECONDS, version, total)
+    _count_cache.move_to_end(key)
+    while len(_count_cache) > COUNT_CACHE_SIZE:
+        _count_cache.popitem(last=False)
+
+
+async def _planner_estimate(session: AsyncSession, query, table=None) -> int:
+    if table is not None:
+        # Whole table: the row count ANALYZE/autovacuum keep in pg_class (-1 = never analyzed)
+        reltuples = await session.scalar(
+            text("SELECT reltuples FROM pg_class WHERE oid = CAST(:table AS regclass)"), {"table": table.name}
+        )
+        if reltuples is not None and reltuples >= 0:
+            return int(reltuples)
+
+    # Filtered: the row estimate of the plan for the filtered select, without running it
+    connection = await session.connection()
+    compiled = query.compile(dialect=connection.dialect)
+    params = compiled.construct_params()
+    result = await connection.exec_driver_sql(
+        f"EXPLAIN (FORMAT JSON) {compiled.string}",
+        tuple(params[name] for name in compiled.positiontup),
+    )
+    plan = result.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+async def count_rows(
+    session: AsyncSession,
+    query,
+    mode: str = "exact",
+    key: str = "",
+    table=None,
+) -> Tuple[Optional[int], str]:
+    """
+    Total for the filtered `query` in the requested mode. `key` identifies the filter
+    for caching; pass `table` when the query is the whole, unfiltered table.
+    Returns (total, kind) where kind says what the total is: exact, estimate or none.
+    """
+    if mode == "none":
+        return None, "none"
+
+    version = await result_cache.data_version()
+    cached = _cached_count(key, version)
+    if cached is not None:
+        return cached, "exact"
+    if mode == "estimate":
+        return await _planner_estimate(session, query, table), "estimate"
+
+    total = await session.scalar(select(func.count()).select_from(query.order_by(None).subquery())) or 0
+    _store_count(key, version, total)
+    return total, "exact"
@@ -1,9 +1,50 @@
+import os
+from datetime import datetime, timedelta
+from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from models import Patient
-from sqlalchemy import select, func
+from sqlalchemy import select, func, or_, literal, literal_column
 from sqlalchemy.orm import selectinload
-from models import Patient
+from models import Patient, Appointment, AppointmentService
 from repositories.base import BaseRepository
+from repositories.pagination import SortKey, count_rows, fetch_page
+
+# Retention worklist defaults: a "regular" has at least this many past appointments,
+# and has lapsed when the latest is older than this many days.
+RETENTION_MIN_VISITS = int(os.getenv("RETENTION_MIN_VISITS", "2"))
+RETENTION_LAPSED_DAYS = int(os.getenv("RETENTION_LAPSED_DAYS", "60"))
+
+def full_name():
+    """
+    "First Last" as SQL. Rendered as first_name || ' ' || last_name with a literal
+    separator so it matches the ix_patients_full_name_trgm expression index.
+    """
+    # Grouped so custom operators such as <% bind to the whole expression.
+    return (Patient.first_name + literal_column("' '") + Patient.last_name).self_group()
+
+
+def search_filter(search: str):
+    """
+    Trigram-indexed patient match: substring of the full name (which covers first or
+    last name alone) or email, plus fuzzy word matches so small typos still find
+    the patient. Every branch can use the pg_trgm GIN indexes.
+    """
+    pattern = f"%{search}%"
+    return or_(
+        full_name().ilike(pattern),
+        Patient.email.ilike(pattern),
+        literal(search).op("<%", is_comparison=True)(full_name()),
+    )
+
+
+def search_rank(search: str) -> list:
+    """Relevance terms, best match first (each sorts descending)."""
+    name_rank = func.word_similarity(search, full_name())
+    return [
+        func.greatest(name_rank, func.word_similarity(search, Patient.email)),
+        func.similarity(full_name(), search),
+    ]
+
 
 class PatientRepository(BaseRepository[Patient]):
     def __init__(self, session: AsyncSession):
@@ -12,15 +53,9 @@ class PatientRepository(BaseRepository[Patient]):
     
     async def get_by_id_with_appointments(self, patient_id: str):
         """Get patient with all appointments loaded"""
-        from models import Appointment, AppointmentService
-        
         query = (
             select(self.model)
-            .options(
-                selectinload(self.model.appointments)
-                .selectinload(Appointment.services)
-                .selectinload(AppointmentService.service)
-            )
+            .options(selectinload(self.model.appointments))
             .where(self.model.id == patient_id)
         )
         result = await self.session.execute(query)
@@ -31,46 +66,39 @@ class PatientRepository(BaseRepository[Patient]):
         skip: int = 0, 
         limit: int = 100, 
         search: str = None, 
-        sort_by: str = "first_name", 
-        sort_order: str = "asc"
-    ) -> tuple[list[Patient], int]:
+        sort_by: str = None, 
+        sort_order: str = "asc",
+        cursor: str = None,
+        count: str = "exact"
+    ) -> tuple[list[Patient], Optional[int], str, Optional[str]]:
         # Base query structure for filtering
         filters = []
         if search:
-            search_filter = f"%{search}%"
-            # Concatenate first_name and last_name for full name search
-            full_name = func.concat(self.model.first_name, ' ', self.model.last_name)
-            
-            filters.append(
-                (self.model.first_name.ilike(search_filter)) |
-                (self.model.last_name.ilike(search_filter)) |
-                (self.model.email.ilike(search_filter)) |
-                (full_name.ilike(search_filter))  # Match "FirstName LastName"
-            )
+            filters.append(search_filter(search))
 
-        # Get total count
-        count_query = select(func.count()).select_from(self.model)
-        for f in filters:
-            count_query = count_query.where(f)
-        total = await self.session.scalar(count_query) or 0
-
-        # Get data
         query = select(self.model)
         for f in filters:
             query = query.where(f)
-            
-        if sort_by:
-            sort_attr = getattr(self.model, sort_by, self.model.first_name)
-            if sort_order == "desc":
-                query = query.order_by(sort_attr.desc())
-            else:
-                query = query.order_by(sort_attr.asc())
+
+        # Get total count
+        table = None if filters else self.model.__table__
+        total, total_kind = await count_rows(self.session, query, count, f"patients|{search}", table)
+
+        # Sort keys, always ending in id so the order is total and cursors are unambiguous
+        if search and sort_by in (None, "relevance"):
+            # Best matches first
+            keys = [SortKey(rank, descending=True) for rank in search_rank(search)]
+            keys.append(SortKey(self.model.id))
         else:
-             query = query.order_by(self.model.first_name.asc())
+            sort_attr = self.model.first_name
+            if sort_by and sort_by != "relevance":
+                sort_attr = getattr(self.model, sort_by, self.model.first_name)
+            descending = sort_order == "desc"
+            keys = [SortKey(sort_attr, descending), SortKey(self.model.id, descending)]
 
-        query = query.offset(skip).limit(limit)
-        result = await self.session.execute(query)
-        return list(result.scalars().all()), total
+        scope = f"patients|{search}|{sort_by}|{sort_order}"
+        patients, next_cursor = await fetch_page(self.session, query, keys, limit, skip, cursor, scope)
+        return patients, total, total_kind, next_cursor
 
     async def get_analytics(self) -> dict:
         # Total Patients
@@ -140,75 +168,72 @@ class PatientRepository(BaseRepository[Patient]):
             for r in result
         ]
 
-    async def get_retention_opportunities(self, limit: int = 5) -> list[dict]:
-        from models import Appointment, AppointmentService
-        from datetime import datetime, timedelta
-        
-        # Logic:
-        # 1. Regulars: At least 2 past appointments
-        # 2. At risk: Last appointment was > 60 days ago
-        # 3. Opportunity: No future appointments booked
-        
-        sixty_days_ago = datetime.now() - timedelta(days=60)
+    async def get_retention(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: str = None,
+        count: str = "exact",
+        min_visits: int = RETENTION_MIN_VISITS,
+        lapsed_days: int = RETENTION_LAPSED_DAYS
+    ) -> tuple[list[dict], Optional[int], str, Optional[str]]:
+        """
+        Lapsed regulars, most overdue first: patients with at least `min_visits`
+        past appointments, none in the last `lapsed_days` days, and nothing but
+        cancellations booked ahead. One statement; the per-patient "anything booked?"
+        check is a NOT EXISTS probe on ix_appointments_patient_id.
+        """
         now = datetime.now()
-        
-        # Subquery for last appointment date per patient
-        # We need to join Appointment -> AppointmentService to get the actual date
-        
-        stmt = (
+        last_visit = func.max(AppointmentService.start)
+        visit_count = func.count(func.distinct(Appointment.id))
+
+        booked_ahead = (
+            select(Appointment.id)
+            .join(AppointmentService, AppointmentService.appointment_id == Appointment.id)
+            .where(
+                Appointment.patient_id == self.model.id,
+                Appointment.status != "cancelled",
+                AppointmentService.start > now,
+            )
+        )
+        lapsed = (
             select(
                 self.model.id,
                 func.concat(self.model.first_name, ' ', self.model.last_name).label('name'),
                 self.model.phone,
                 self.model.email,
-                func.max(AppointmentService.start).label('last_visit'),
-                func.count(func.distinct(Appointment.id)).label('visit_count')
+                last_visit.label('last_visit'),
+                visit_count.label('visit_count')
             )
             .join(Appointment, Appointment.patient_id == self.model.id)
             .join(AppointmentService, AppointmentService.appointment_id == Appointment.id)
-            .group_by(self.model.id, self.model.first_name, self.model.last_name, self.model.phone, self.model.email)
-            .having(
-                (func.count(func.distinct(Appointment.id)) >= 2) & 
-                (func.max(AppointmentService.start) < sixty_days_ago)
-            )
+            .where(AppointmentService.start <= now, ~booked_ahead.exists())
+            .group_by(self.model.id)
+            .having(visit_count >= min_visits, last_visit < now - timedelta(days=lapsed_days))
+            .subquery()
         )
-        
-        # Execute and filter in python for "no future appointments" 
-        # (Doing pure SQL for "no future" with having/subqueries is complex in asyncpg/sqlalchemy randomly sometimes, 
-        # easier to filter the small list of candidates or use a NOT EXISTS)
-        
-        # Let's try adding a NOT EXISTS clause for robustness
-        # Actually, simpler: fetch candidates, then check if they have future appts.
-        
-        result = await self.session.execute(stmt)
-        candidates = result.all()
-        
-        opportunities = []
-        for r in candidates:
-            # Check for future appointments
-            future_check = (
-                select(func.count(Appointment.id))
-                .join(AppointmentService)
-                .where(
-                    (Appointment.patient_id == r.id) &
-                    (AppointmentService.start > now) &
-                    (Appointment.status != 'cancelled')
-                )
-            )
-            future_count = await self.session.scalar(future_check) or 0
-            
-            if future_count == 0:
-                days_since = (now - r.last_visit).days
-                opportunities.append({
-                    "id": r.id,
-                    "name": r.name,
-                    "last_visit": r.last_visit,
-                    "days_since_last_visit": days_since,
-                    "phone": r.phone,
-                    "email": r.email
-                })
-                
-        # Sort by days since last visit (descending) -> most overdue first
-        opportunities.sort(key=lambda x: x['days_since_last_visit'], reverse=True)
-        
-        return opportunities[:limit]
+        query = select(lapsed)
+
+        total, total_kind = await count_rows(self.session, query, count, f"retention|{min_visits}|{lapsed_days}")
+
+        keys = [SortKey(lapsed.c.last_visit), SortKey(lapsed.c.id)]
+        scope = f"retention|{min_visits}|{lapsed_days}"
+        rows, next_cursor = await fetch_page(self.session, query, keys, limit, skip, cursor, scope)
+        opportunities = [
+            {
+                "id": r.id,
+                "name": r.name,
+                "last_visit": r.last_visit,
+                "days_since_last_visit": (now - r.last_visit).days,
+                "visit_count": r.visit_count,
+                "phone": r.phone,
+                "email": r.email
+            }
+            for r in rows
+        ]
+        return opportunities, total, total_kind, next_cursor
+
+    async def get_retention_opportunities(self, limit: int = 5) -> list[dict]:
+        """The `limit` most overdue lapsed regulars, at the default thresholds."""
+        opportunities, _, _, _ = await self.get_retention(limit=limit, count="none")
+        return opportunities
@@ -1,7 +1,18 @@
+from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
-from models import Provider
+from sqlalchemy import select, func, literal_column
+from models import Provider, ProviderAnalyticsView
 from repositories.base import BaseRepository
+from repositories.materialized_views import refreshed_at
+from repositories.pagination import SortKey, count_rows, fetch_page
+
+def full_name():
+    """
+    "First Last" as SQL, matching the ix_providers_full_name_trgm expression index
+    (a literal separator, like repositories.patient.full_name).
+    """
+    return (Provider.first_name + literal_column("' '") + Provider.last_name).self_group()
+
 
 class ProviderRepository(BaseRepository[Provider]):
     def __init__(self, session: AsyncSession):
@@ -13,23 +24,22 @@ class ProviderRepository(BaseRepository[Provider]):
         limit: int = 100,
         search: str = None,
         sort_by: str = "first_name",
-        sort_order: str = "asc"
-    ) -> tuple[list[Provider], int]:
+        sort_order: str = "asc",
+        cursor: str = None,
+        count: str = "exact"
+    ) -> tuple[list[Provider], Optional[int], str, Optional[str]]:
         """Get all providers with search and sorting"""
         query = select(self.model)
         
         # Apply search filter
         if search:
+            # Substring of the full name or email; served by the trigram indexes (0012)
             search_filter = f"%{search}%"
-            query = query.where(
-                (self.model.first_name + " " + self.model.last_name).ilike(search_filter) |
-                self.model.email.ilike(search_filter)
-            )
+            query = query.where(full_name().ilike(search_filter) | self.model.email.ilike(search_filter))
         
         # Get total count before pagination
-        count_query = select(func.count()).select_from(query.subquery())
-        total_result = await self.session.execute(count_query)
-        total = total_result.scalar()
+        table = None if search else self.model.__table__
+        total, total_kind = await count_rows(self.session, query, count, f"providers|{search}", table)
         
         # Apply sorting
         if sort_by == "last_name":
@@ -41,35 +51,27 @@ class ProviderRepository(BaseRepository[Provider]):
         else:
             sort_column = self.model.first_name  # default
         
-        if sort_order == "desc":
-            query = query.order_by(sort_column.desc())
-        else:
-            query = query.order_by(sort_column.asc())
-        
-        # Apply pagination
-        query = query.offset(skip).limit(limit)
-        
-        result = await self.session.execute(query)
-        return list(result.scalars().all()), total
+        # Page in (sort column, id) order; id makes the order total for cursors
+        descending = sort_order == "desc"
+        keys = [SortKey(sort_column, descending), SortKey(self.model.id, descending)]
+        scope = f"providers|{search}|{sort_by}|{sort_order}"
+        providers, next_cursor = await fetch_page(self.session, query, keys, limit, skip, cursor, scope)
+        return providers, total, total_kind, next_cursor
 
     async def get_analytics(self) -> list[dict]:
-        """Aggregate analytics for providers"""
-        from models import AppointmentService, Service, Appointment
-        from sqlalchemy import desc, distinct
-
+        """Aggregate analytics for providers, from the mv_provider_analytics materialized view"""
+        view = ProviderAnalyticsView
         stmt = (
             select(
                 self.model.first_name,
                 self.model.last_name,
-                func.count(AppointmentService.id).label("total_services"),
-                func.sum(Service.price).label("total_revenue"),
-                func.count(distinct(Appointment.patient_id)).label("unique_patients")
+                view.total_services,
+                view.total_revenue,
+                view.unique_patients,
+                refreshed_at(view),
             )
-            .join(AppointmentService, self.model.id == AppointmentService.provider_id)
-            .join(Service, AppointmentService.service_id == Service.id)
-            .join(Appointment, AppointmentService.appointment_id == Appointment.id)
-            .group_by(self.model.id, self.model.first_name, self.model.last_name)
-            .order_by(desc("total_revenue"))
+            .join(self.model, self.model.id == view.provider_id)
+            .order_by(view.total_revenue.desc(), view.provider_id)
         )
         
         result = await self.session.execute(stmt)
@@ -79,9 +81,10 @@ class ProviderRepository(BaseRepository[Provider]):
             {
                 "provider_name": f"{row.first_name} {row.last_name}",
                 "total_services": row.total_services,
-                "total_revenue": row.total_revenue or 0,
+                "total_revenue": row.total_revenue,
                 "unique_patients": row.unique_patients,
-                "average_ticket": round((row.total_revenue or 0) / row.total_services, 2) if row.total_services > 0 else 0
+                "average_ticket": round(row.total_revenue / row.total_services, 2) if row.total_services > 0 else 0,
+                "refreshed_at": row.refreshed_at
             }
             for row in rows
         ]
@@ -0,0 +1,139 @@
+import re
+from typing import Iterable, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, literal, union, union_all
+from models import Patient, Provider, Service, Appointment
+
+"""
+Full-text search over the generated search_vector columns (see migration 0004),
+behind the unified /search endpoint. Every word of the query matches as a word
+prefix. The list endpoints' `search` filter instead matches substrings (ILIKE,
+through the pg_trgm indexes of migrations 0003 and 0012).
+"""
+
+# Text search configuration each entity's vector was built with.
+SIMPLE, ENGLISH = "simple", "english"
+
+SEARCH_TYPES = ("patient", "provider", "service", "appointment")
+
+_WORDS = re.compile(r"\w+", re.UNICODE)
+# Tokens people paste whole (emails, ids, domains); matched as the exact lexemes
+# their vector holds instead of being split into word prefixes
+_EXACT = re.compile(r"[@._]")
+
+
+def prefix_query(search: str, config: str = SIMPLE):
+    """
+    tsquery matching every word of `search` as a prefix ("jo smi" -> 'jo':* & 'smi':*),
+    so results narrow as the user types. Tokens containing @, . or _ (an email or an
+    id) are parsed the way the vectors were, into the same exact lexemes, and ANDed
+    in. Returns None when there is nothing to match.
+    """
+    words, parts = [], []
+    for token in (search or "").split():
+        token = token.strip("._")  # "Dr." is still a word being typed
+        if _EXACT.search(token):
+            parts.append(func.phraseto_tsquery(config, token))
+        else:
+            words += _WORDS.findall(token)
+    if words:
+        parts.insert(0, func.to_tsquery(config, " & ".join(f"{word}:*" for word in words)))
+    if not parts:
+        return None
+    query = parts[0]
+    for part in parts[1:]:
+        query = query.op("&&")(part)
+    return query
+
+
+class SearchRepository:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def search(self, search: str, types: Optional[Iterable[str]] = None, limit: int = 20) -> list[dict]:
+        """
+        Ranked hits across entity types in one statement: each type contributes its own
+        top `limit` (index scan + ts_rank), then the union is ranked as a whole.
+        """
+        simple, english = prefix_query(search, SIMPLE), prefix_query(search, ENGLISH)
+        if simple is None:
+            return []
+        types = set(types or SEARCH_TYPES)
+        branches = []
+
+        if "patient" in types:
+            branches.append(
+                select(
+                    literal("patient").label("type"),
+                    Patient.id.label("id"),
+                    (Patient.first_name + " " + Patient.last_name).label("title"),
+                    Patient.email.label("subtitle"),
+                    func.ts_rank(Patient.search_vector, simple).label("rank"),
+                )
+                .where(Patient.search_vector.op("@@")(simple))
+                .order_by(func.ts_rank(Patient.search_vector, simple).desc())
+                .limit(limit)
+            )
+
+        if "provider" in types:
+            branches.append(
+                select(
+                    literal("provider").label("type"),
+                    Provider.id.label("id"),
+                    (Provider.first_name + " " + Provider.last_name).label("title"),
+                    Provider.email.label("subtitle"),
+                    func.ts_rank(Provider.search_vector, simple).label("rank"),
+                )
+                .where(Provider.search_vector.op("@@")(simple))
+                .order_by(func.ts_rank(Provider.search_vector, simple).desc())
+                .limit(limit)
+            )
+
+        if "service" in types:
+            branches.append(
+                select(
+                    literal("service").label("type"),
+                    Service.id.label("id"),
+                    Service.name.label("title"),
+                    Service.description.label("subtitle"),
+                    func.ts_rank(Service.search_vector, english).label("rank"),
+                )
+                .where(Service.search_vector.op("@@")(english))
+                .order_by(func.ts_rank(Service.search_vector, english).desc())
+                .limit(limit)
+            )
+
+        if "appointment" in types:
+            # Hits on the appointment id or on its patient's name. An OR across the
+            # join can use neither GIN index, so each side selects its own ids and
+            # only the union is joined back for ranking.
+            hits = union(
+                select(Appointment.id).where(Appointment.search_vector.op("@@")(simple)),
+                select(Appointment.id).where(
+                    Appointment.patient_id.in_(select(Patient.id).where(Patient.search_vector.op("@@")(simple)))
+                ),
+            )
+            rank = func.greatest(
+                func.ts_rank(Appointment.search_vector, simple),
+                func.ts_rank(Patient.search_vector, simple) * 0.9,  # Just below the patient hit itself
+            )
+            branches.append(
+                select(
+                    literal("appointment").label("type"),
+                    Appointment.id.label("id"),
+                    (Patient.first_name + " " + Patient.last_name).label("title"),
+                    Appointment.status.label("subtitle"),
+                    rank.label("rank"),
+                )
+                .join(Patient, Appointment.patient_id == Patient.id)
+                .where(Appointment.id.in_(hits))
+                .order_by(rank.desc(), Appointment.created_date.desc())
+                .limit(limit)
+            )
+
+        if not branches:
+            return []
+        combined = union_all(*[branch.subquery().select() for branch in branches]).subquery()
+        stmt = select(combined).order_by(combined.c.rank.desc(), combined.c.type, combined.c.title).limit(limit)
+        result = await self.session.execute(stmt)
+        return [dict(row._mapping) for row in result]
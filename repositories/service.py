@@ -1,8 +1,10 @@
+from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
-from sqlalchemy.orm import selectinload
-from models import Service
+from sqlalchemy import select
+from models import Service, ServiceAnalyticsView
 from repositories.base import BaseRepository
+from repositories.materialized_views import refreshed_at
+from repositories.pagination import SortKey, count_rows, fetch_page
 
 class ServiceRepository(BaseRepository[Service]):
     def __init__(self, session: AsyncSession):
@@ -14,23 +16,22 @@ class ServiceRepository(BaseRepository[Service]):
         limit: int = 100,
         search: str = None,
         sort_by: str = "name",
-        sort_order: str = "asc"
-    ) -> tuple[list[Service], int]:
+        sort_order: str = "asc",
+        cursor: str = None,
+        count: str = "exact"
+    ) -> tuple[list[Service], Optional[int], str, Optional[str]]:
         """Get all services with search and sorting"""
         query = select(self.model)
         
         # Apply search filter
         if search:
+            # Substring of the name or description; served by the trigram indexes (0012)
             search_filter = f"%{search}%"
-            query = query.where(
-                Service.name.ilike(search_filter) |
-                Service.description.ilike(search_filter)
-            )
+            query = query.where(Service.name.ilike(search_filter) | Service.description.ilike(search_filter))
         
         # Get total count before pagination
-        count_query = select(func.count()).select_from(query.subquery())
-        total_result = await self.session.execute(count_query)
-        total = total_result.scalar()
+        table = None if search else self.model.__table__
+        total, total_kind = await count_rows(self.session, query, count, f"services|{search}", table)
         
         # Apply sorting
         if sort_by == "price":
@@ -40,32 +41,26 @@ class ServiceRepository(BaseRepository[Service]):
         else:
             sort_column = self.model.name  # default
         
-        if sort_order == "desc":
-            query = query.order_by(sort_column.desc())
-        else:
-            query = query.order_by(sort_column.asc())
-        
-        # Apply pagination
-        query = query.offset(skip).limit(limit)
-        
-        result = await self.session.execute(query)
-        return list(result.scalars().all()), total
+        # Page in (sort column, id) order; id makes the order total for cursors
+        descending = sort_order == "desc"
+        keys = [SortKey(sort_column, descending), SortKey(self.model.id, descending)]
+        scope = f"services|{search}|{sort_by}|{sort_order}"
+        services, next_cursor = await fetch_page(self.session, query, keys, limit, skip, cursor, scope)
+        return services, total, total_kind, next_cursor
 
     async def get_service_analytics(self) -> list[dict]:
-        """Aggregate analytics for services: counts, revenue, and duration"""
-        from models import AppointmentService
-        from sqlalchemy import desc
-
+        """Aggregate analytics for services: counts, revenue, and duration, from the mv_service_analytics materialized view"""
+        view = ServiceAnalyticsView
         stmt = (
             select(
                 self.model.name,
-                func.count(AppointmentService.id).label("count"),
-                func.sum(self.model.price).label("revenue"),
-                self.model.duration.label("duration")
+                view.bookings.label("count"),
+                view.revenue,
+                self.model.duration,
+                refreshed_at(view),
             )
-            .join(AppointmentService, self.model.id == AppointmentService.service_id)
-            .group_by(self.model.id, self.model.name, self.model.duration)
-            .order_by(desc("count"))
+            .join(self.model, self.model.id == view.service_id)
+            .order_by(view.bookings.desc(), view.service_id)
         )
         
         result = await self.session.execute(stmt)
@@ -77,7 +72,8 @@ class ServiceRepository(BaseRepository[Service]):
                 "count": row.count,
                 "revenue": row.revenue,
                 "duration": row.duration,
-                "revenue_per_minute": round((row.revenue / row.count) / row.duration, 2) if row.duration > 0 else 0
+                "revenue_per_minute": round((row.revenue / row.count) / row.duration, 2) if row.duration > 0 else 0,
+                "refreshed_at": row.refreshed_at
             }
             for row in rows
         ]
@@ -0,0 +1,110 @@
+import os
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import inspect, text
+from database import engine, Base, ViewBase
+
+"""
+Schema revision checks for application startup and the seed scripts.
+The schema is owned by the Alembic migrations in migrations/. The API verifies the
+database is at the head revision before serving and, when AUTO_MIGRATE is on,
+applies pending migrations itself.
+"""
+
+ALEMBIC_INI = os.path.join(os.path.dirname(__file__), "alembic.ini")
+AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "true").lower() in ("1", "true", "yes")
+
+# Revision matching the schema Base.metadata.create_all used to build, for adopting
+# databases created before migrations existed.
+BASELINE_REVISION = "0001"
+
+# The one table of 0001 the old create_all schema lacked; adopted databases need it
+# before 0002 indexes it. The natural key on appointment_services comes with 0013.
+BASELINE_IMPORT_JOBS = """
+CREATE TABLE IF NOT EXISTS import_jobs (
+    id VARCHAR PRIMARY KEY,
+    status VARCHAR NOT NULL,
+    sources JSONB NOT NULL,
+    progress JSONB NOT NULL,
+    rows_processed INTEGER NOT NULL,
+    rows_at_start INTEGER NOT NULL,
+    error_count INTEGER NOT NULL,
+    errors JSONB NOT NULL,
+    created_date TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    started_at TIMESTAMP WITHOUT TIME ZONE,
+    heartbeat_at TIMESTAMP WITHOUT TIME ZONE,
+    finished_at TIMESTAMP WITHOUT TIME ZONE
+)
+"""
+
+
+class SchemaOutOfDate(RuntimeError):
+    pass
+
+
+def alembic_config(connection=None) -> Config:
+    config = Config(ALEMBIC_INI)
+    if connection is not None:
+        config.attributes["connection"] = connection
+    return config
+
+
+def head_revision() -> str:
+    return ScriptDirectory.from_config(alembic_config()).get_current_head()
+
+
+def _current_revision(connection):
+    revision = MigrationContext.configure(connection).get_current_revision()
+    if revision is None and inspect(connection).has_table("patients"):
+        # Created by create_all before migrations: complete the baseline, record it, then upgrade.
+        connection.execute(text(BASELINE_IMPORT_JOBS))
+        command.stamp(alembic_config(connection), BASELINE_REVISION)
+        revision = BASELINE_REVISION
+    return revision
+
+
+def _upgrade(connection, revision="head"):
+    command.upgrade(alembic_config(connection), revision)
+
+
+async def current_revision():
+    async with engine.begin() as conn:
+        return await conn.run_sync(_current_revision)
+
+
+async def upgrade(revision="head"):
+    async with engine.begin() as conn:
+        await conn.run_sync(_upgrade, revision)
+
+
+async def ensure_schema(auto_migrate: bool = AUTO_MIGRATE) -> str:
+    """
+    Make sure the database is at the head revision.
+    Applies pending migrations when auto_migrate is set; otherwise raises
+    SchemaOutOfDate so a stale schema fails fast instead of erroring per request.
+    """
+    head = head_revision()
+    current = await current_revision()
+    if current == head:
+        return current
+    if not auto_migrate:
+        raise SchemaOutOfDate(
+            f"Database schema is at revision {current or 'none'}, code expects {head}. "
+            "Run `alembic upgrade head` (or set AUTO_MIGRATE=true)."
+        )
+    print(f"Migrating database schema from {current or 'empty'} to {head}...")
+    await upgrade(head)
+    return head
+
+
+async def reset_schema():
+    """Drop every table and rebuild the schema from the migrations (used by the seed scripts)."""
+    async with engine.begin() as conn:
+        # drop_all doesn't know materialized views, and they depend on the tables
+        for name in ViewBase.metadata.tables:
+            await conn.execute(text(f"DROP MATERIALIZED VIEW IF EXISTS {name}"))
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.execute(text("DROP TABLE IF EXISTS alembic_version"))
+        await conn.run_sync(_upgrade, "head")
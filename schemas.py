@@ -1,9 +1,13 @@
 from datetime import datetime
-from typing import Literal, Optional, List
+from typing import Any, Dict, Literal, Optional, List
 from pydantic import BaseModel, ConfigDict
 
 
 
+# How the `total` of a paginated response was obtained (the list endpoints' `count` option)
+CountMode = Literal["exact", "estimate", "none"]
+
+
 class StatItem(BaseModel):
     label: str
     value: float
@@ -41,6 +45,7 @@ class AnalyticsSummary(BaseModel):
     provider_performance: ProviderPerformance
     top_patients: List["TopPatient"] = []
     retention_opportunities: List["RetentionOpportunity"] = []
+    query_timings_ms: Dict[str, float] = {}  # Wall time of each summary query; they run concurrently
 
 
 class PatientListItem(BaseModel):
@@ -61,24 +66,32 @@ class PatientListItem(BaseModel):
 
 class PaginatedPatientsResponse(BaseModel):
     data: List["PatientListItem"]
-    total: int
+    total: Optional[int] = None  # Null when count=none
+    total_kind: CountMode = "exact"
+    next_cursor: Optional[str] = None  # Pass as `cursor` for the next page; null on the last page
 
 
 class PaginatedAppointmentsResponse(BaseModel):
     data: List["Appointment"]
-    total: int
+    total: Optional[int] = None  # Null when count=none
+    total_kind: CountMode = "exact"
+    next_cursor: Optional[str] = None  # Pass as `cursor` for the next page; null on the last page
 
 
 
 class PaginatedServicesResponse(BaseModel):
     data: List["Service"]
-    total: int
+    total: Optional[int] = None  # Null when count=none
+    total_kind: CountMode = "exact"
+    next_cursor: Optional[str] = None  # Pass as `cursor` for the next page; null on the last page
 
 
 
 class PaginatedProvidersResponse(BaseModel):
     data: List["Provider"]
-    total: int
+    total: Optional[int] = None  # Null when count=none
+    total_kind: CountMode = "exact"
+    next_cursor: Optional[str] = None  # Pass as `cursor` for the next page; null on the last page
 
 
 class DashboardSummary(BaseModel):
@@ -95,6 +108,7 @@ class ProviderAnalytics(BaseModel):
     total_revenue: float
     unique_patients: int
     average_ticket: float
+    refreshed_at: Optional[datetime] = None  # When mv_provider_analytics was last refreshed
 
 
 class TopPatient(BaseModel):
@@ -103,6 +117,7 @@ class TopPatient(BaseModel):
     total_spent: float
     visit_count: int
     last_visit: Optional[datetime]
+    refreshed_at: Optional[datetime] = None  # When mv_top_patients was last refreshed
 
 
 class RetentionOpportunity(BaseModel):
@@ -110,10 +125,18 @@ class RetentionOpportunity(BaseModel):
     name: str
     last_visit: datetime
     days_since_last_visit: int
+    visit_count: Optional[int] = None
     phone: str
     email: str
 
 
+class PaginatedRetentionResponse(BaseModel):
+    data: List[RetentionOpportunity]
+    total: Optional[int] = None  # Null when count=none
+    total_kind: CountMode = "exact"
+    next_cursor: Optional[str] = None  # Pass as `cursor` for the next page; null on the last page
+
+
 class PatientAnalyticsResponse(BaseModel):
     total_patients: int
     by_source: List[StatItem]
@@ -133,6 +156,7 @@ class ServiceAnalytics(BaseModel):
     revenue: int
     duration: int
     revenue_per_minute: float
+    refreshed_at: Optional[datetime] = None  # When mv_service_analytics was last refreshed
 
 class Patient(BaseModel):
     model_config = ConfigDict(from_attributes=True)
@@ -240,10 +264,11 @@ class Appointment(BaseModel):
     patient: Optional["PatientListItem"] = None  # Related patient (simplified to avoid circular ref)
     services: Optional[List["AppointmentService"]] = None  # Related appointment services
     payments: Optional[List["Payment"]] = None  # Related payments (loaded via relationship)
-    service_count: Optional[int] = None  # Number of services (computed)
-    total_cost: Optional[int] = None  # Total cost in cents (computed)
-    duration_minutes: Optional[int] = None  # Duration in minutes (computed)
-    start_time: Optional[datetime] = None  # Appointment start time from first service (computed)
+    service_count: Optional[int] = None  # Number of services (stored summary)
+    total_cost: Optional[int] = None  # Total cost in cents (stored summary)
+    duration_minutes: Optional[int] = None  # First service start to last service end (stored summary)
+    start_time: Optional[datetime] = None  # Appointment start time from first service (stored summary)
+    outstanding_balance: Optional[int] = None  # total_cost less paid payments, in cents (negative when overpaid)
 
 
 class AppointmentService(BaseModel):
@@ -269,7 +294,7 @@ class AppointmentService(BaseModel):
     end: datetime  # Scheduled end time for this service
     service: Optional["Service"] = None  # Related service (loaded via relationship)
     provider: Optional["Provider"] = None  # Related provider (loaded via relationship)
-    payment_status: Optional[str] = None  # Payment status for this service (computed)
+    payment_status: Optional[str] = None  # Latest payment's status for this service, or "unpaid" (resolved in SQL)
 
 
 class Service(BaseModel):
@@ -297,3 +322,117 @@ class Service(BaseModel):
 class ProviderDetails(Provider):
     average_patients_per_day: float
     services: List["Service"]
+
+
+class ImportJobStatus(BaseModel):
+    """Progress of a background import job (see /admin/import_jobs/{id})"""
+    id: str
+    status: Literal["queued", "running", "completed", "failed"]
+    rows_processed: int
+    throughput_rows_per_sec: Optional[float] = None  # For the current run
+    eta_seconds: Optional[float] = None  # Estimated from the share of bytes read so far
+    bytes_processed: int
+    bytes_total: int
+    progress: Dict[str, Dict[str, Any]]  # Per data type checkpoint and counts
+    error_count: int
+    errors: List[Dict[str, Any]]
+    created_date: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
+# Import rows (NDJSON imports). Only the key is required: a record for an existing
+# row may carry just the fields to change. A new row missing a required field is
+# rejected when it is written (see ImportService._upsert).
+
+class PatientImport(BaseModel):
+    """Import row for patients"""
+    id: str
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    date_of_birth: Optional[datetime] = None
+    gender: Optional[Literal["male", "female", "other"]] = None
+    address: Optional[str] = None
+    phone: Optional[str] = None
+    email: Optional[str] = None
+    source: Optional[Literal["in_person", "phone", "instagram", "tiktok", "google", "website"]] = None
+    created_date: Optional[datetime] = None
+
+
+class ProviderImport(BaseModel):
+    """Import row for providers"""
+    id: str
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    email: Optional[str] = None
+    phone: Optional[str] = None
+    created_date: Optional[datetime] = None
+
+
+class ServiceImport(BaseModel):
+    """Import row for services"""
+    id: str
+    name: Optional[str] = None
+    description: Optional[str] = None
+    price: Optional[int] = None  # In cents
+    duration: Optional[int] = None  # In minutes
+    created_date: Optional[datetime] = None
+
+
+class AppointmentImport(BaseModel):
+    """Import row for appointments"""
+    id: str
+    patient_id: Optional[str] = None
+    status: Optional[Literal["pending", "confirmed", "cancelled"]] = None
+    created_date: Optional[datetime] = None
+
+
+class AppointmentServiceImport(BaseModel):
+    """Import row for appointment_services (the surrogate id is assigned by the database; rows match on the rest)"""
+    appointment_id: str
+    service_id: str
+    provider_id: str
+    start: datetime
+    end: Optional[datetime] = None
+
+
+class PaymentImport(BaseModel):
+    """Import row for payments"""
+    id: str
+    patient_id: Optional[str] = None
+    amount: Optional[int] = None  # In cents
+    date: Optional[datetime] = None
+    method: Optional[Literal["cash", "credit_card", "debit_card", "check"]] = None
+    status: Optional[Literal["pending", "paid", "failed"]] = None
+    provider_id: Optional[str] = None
+    appointment_id: Optional[str] = None
+    service_id: Optional[str] = None
+    created_date: Optional[datetime] = None
+
+
+class AutocompleteHit(BaseModel):
+    type: Literal["patient", "provider"]
+    id: str
+    name: str
+    email: Optional[str] = None
+    phone: Optional[str] = None
+    matched: Literal["name", "email", "phone"]  # Which field the query matched
+
+
+class AutocompleteResponse(BaseModel):
+    query: str
+    results: List[AutocompleteHit]
+    took_ms: float
+
+
+class SearchHit(BaseModel):
+    type: Literal["patient", "provider", "service", "appointment"]
+    id: str
+    title: str  # Name; patient name for appointments
+    subtitle: Optional[str] = None  # Email, service description or appointment status
+    rank: float
+
+
+class SearchResponse(BaseModel):
+    query: str
+    results: List[SearchHit]
@@ -0,0 +1,337 @@
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+"""
+Endpoint benchmark and load test.
+
+For each scale factor the database is reloaded (seed_data/ for 1x, otherwise a dataset
+from scripts.generate, generated on first use), the API is started with uvicorn and
+every route in ROUTES is driven by concurrent keep-alive clients. Per route it records
+p50/p95/p99 latency, throughput, SQL statements per request (X-Query-Count) and the
+server's peak RSS, writes everything to a JSON results file, and exits non-zero when a
+route breaks its budget in scripts/benchmark_budgets.json.
+
+The routes are measured with the result cache (services/cache.py) off, so every request
+computes its response. The CACHED_ROUTES are then measured again against a server with
+the cache on, after the warmup has filled it, and reported as "<route>_cached".
+
+    python -m scripts.benchmark --scales 1 10 --concurrency 16 --requests 400
+
+DATABASE_URL must point at a disposable database: every scale resets its tables.
+"""
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+BUDGETS_PATH = os.path.join(os.path.dirname(__file__), "benchmark_budgets.json")
+
+# Budget name -> request path. Query strings mirror what the frontend sends.
+ROUTES = {
+    "patients": "/patients/?skip=0&limit=20",
+    "patients_search": "/patients/?skip=0&limit=20&search=an",
+    "appointments": "/appointments/?skip=0&limit=20",
+    "appointments_json": "/appointments/?skip=0&limit=20&mode=json",
+    "appointment_analytics": "/appointments/analytics",
+    "analytics_summary": "/analytics/summary",
+    "dashboard_summary": "/dashboard/summary",
+    "provider_analytics": "/providers/analytics",
+}
+
+# Routes served from the result cache when it is on
+CACHED_ROUTES = {"appointment_analytics", "analytics_summary", "provider_analytics"}
+
+# Metrics where a budget is a floor rather than a ceiling.
+MIN_BUDGETS = {"throughput_rps"}
+
+
+class HttpClient:
+    """Minimal keep-alive HTTP/1.1 client; one instance per simulated user."""
+
+    def __init__(self, host: str, port: int):
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+
+    async def get(self, path: str):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.writer.write(f"GET {path} HTTP/1.1\r\nHost: {self.host}\r\nAccept: application/json\r\n\r\n".encode())
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("Server closed the connection")
+        status = int(status_line.split()[1])
+        headers = {}
+        while (line := await self.reader.readline()) not in (b"\r\n", b""):
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding") == "chunked":
+            body = b""
+            while size := int((await self.reader.readline()).strip(), 16):
+                body += await self.reader.readexactly(size)
+                await self.reader.readline()
+            await self.reader.readline()
+        else:
+            body = await self.reader.readexactly(int(headers.get("content-length", 0)))
+
+        if headers.get("connection") == "close":
+            await self.close()
+        return status, headers, body
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+
+def percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+def read_rss_mb(pid: int, field: str = "VmRSS") -> float:
+    """Resident memory of a process from /proc (VmHWM is the peak since start)."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+async def sample_rss(pid: int, peak: list, interval: float = 0.05):
+    while True:
+        peak[0] = max(peak[0], read_rss_mb(pid))
+        await asyncio.sleep(interval)
+
+
+async def run_route(host, port, path, requests, concurrency, pid) -> dict:
+    latencies, queries = [], []
+    errors = 0
+    remaining = [requests]
+    peak = [read_rss_mb(pid)]
+
+    async def user():
+        nonlocal errors
+        client = HttpClient(host, port)
+        try:
+            while remaining[0] > 0:
+                remaining[0] -= 1
+                start = time.perf_counter()
+                try:
+                    status, headers, _ = await client.get(path)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    errors += 1
+                    await client.close()
+                    continue
+                latencies.append((time.perf_counter() - start) * 1000)
+                if status >= 400:
+                    errors += 1
+                if "x-query-count" in headers:
+                    queries.append(int(headers["x-query-count"]))
+        finally:
+            await client.close()
+
+    sampler = asyncio.create_task(sample_rss(pid, peak))
+    started = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    sampler.cancel()
+
+    latencies.sort()
+    return {
+        "path": path,
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "error_rate": round(errors / requests, 4),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "max_ms": round(latencies[-1], 2) if latencies else 0.0,
+        "queries": max(queries) if queries else None,
+        "peak_rss_mb": round(peak[0], 1),
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def load_dataset(scale: float, data_root: str, seed: int) -> float:
+    """Reset the tables and bulk load the dataset for `scale`; returns the load time."""
+    env = {**os.environ, "SQL_ECHO": "false"}
+    command = [sys.executable, "-m", "scripts.seed", "--bulk"]
+    if scale != 1:
+        data_dir = os.path.join(data_root, f"{scale:g}x")
+        if not os.path.exists(os.path.join(data_dir, "payment.json")):
+            subprocess.run(
+                [sys.executable, "-m", "scripts.generate", "--scale", str(scale), "--seed", str(seed), "--out", data_dir],
+                cwd=ROOT, env=env, check=True,
+            )
+        command += ["--data-dir", data_dir]
+
+    started = time.perf_counter()
+    subprocess.run(command, cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL)
+    return round(time.perf_counter() - started, 2)
+
+
+async def wait_until_ready(host, port, server, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"API server exited with code {server.returncode}")
+        client = HttpClient(host, port)
+        try:
+            status, _, _ = await client.get("/")
+            if status == 200:
+                return
+        except OSError:
+            pass
+        finally:
+            await client.close()
+        await asyncio.sleep(0.2)
+    raise TimeoutError("API server did not become ready")
+
+
+async def measure(routes, args, cache: bool) -> tuple:
+    """
+    Start the API (with the result cache on or off) and run each route after its
+    warmup. Returns the per-route results and the server's peak RSS.
+    """
+    host, port = "127.0.0.1", free_port()
+    env = {**os.environ, "SQL_ECHO": "false", "QUERY_COUNT_HEADER": "1"}
+    if not cache:
+        env["CACHE_TTL_SECONDS"] = "0"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", host, "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+    try:
+        await wait_until_ready(host, port, server)
+        results = {}
+        for name, path in routes.items():
+            # Warm the pool (and, with the cache on, the cache) so the measurement reflects steady state.
+            await run_route(host, port, path, args.warmup, min(args.concurrency, args.warmup), server.pid)
+            results[name] = await run_route(host, port, path, args.requests, args.concurrency, server.pid)
+            r = results[name]
+            print(
+                f"{name:<28} p50 {r['p50_ms']:>8.1f}ms  p95 {r['p95_ms']:>8.1f}ms  p99 {r['p99_ms']:>8.1f}ms  "
+                f"{r['throughput_rps']:>8.1f} req/s  queries {r['queries']}  rss {r['peak_rss_mb']:.0f}MB  errors {r['errors']}"
+            )
+        peak_rss = read_rss_mb(server.pid, "VmHWM")
+    finally:
+        server.send_signal(signal.SIGINT)
+        try:
+            server.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            server.kill()
+    return results, peak_rss
+
+
+async def benchmark_scale(scale, routes, args) -> dict:
+    print(f"\n=== Scale {scale:g}x ===")
+    load_seconds = load_dataset(scale, args.data_root, args.seed)
+    print(f"Loaded dataset in {load_seconds:.2f}s")
+
+    results, peak_rss = await measure(routes, args, cache=False)
+    cached = {f"{name}_cached": path for name, path in routes.items() if name in CACHED_ROUTES}
+    if cached:
+        cached_results, cached_rss = await measure(cached, args, cache=True)
+        results.update(cached_results)
+        peak_rss = max(peak_rss, cached_rss)
+
+    return {"load_seconds": load_seconds, "peak_rss_mb": round(peak_rss, 1), "routes": results}
+
+
+def check_budgets(results: dict, budgets: dict) -> list:
+    """
+    Compare results against budgets shaped like
+    {"default": {route: {metric: limit}}, "scales": {"10": {route: {metric: limit}}}}.
+    Scale-specific limits override the defaults; MIN_BUDGETS metrics are floors.
+    """
+    violations = []
+    for scale, scale_result in results.items():
+        for route, metrics in scale_result["routes"].items():
+            limits = {
+                **budgets.get("default", {}).get(route, {}),
+                **budgets.get("scales", {}).get(scale, {}).get(route, {}),
+            }
+            for metric, limit in limits.items():
+                value = metrics.get(metric)
+                if value is None:
+                    continue
+                broken = value < limit if metric in MIN_BUDGETS else value > limit
+                if broken:
+                    violations.append({"scale": scale, "route": route, "metric": metric, "value": value, "budget": limit})
+    return violations
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main(args):
+    routes = {name: ROUTES[name] for name in args.routes} if args.routes else ROUTES
+    results = {}
+    for scale in args.scales:
+        results[f"{scale:g}"] = await benchmark_scale(scale, routes, args)
+
+    budgets = {}
+    if args.budgets and os.path.exists(args.budgets):
+        with open(args.budgets) as f:
+            budgets = json.load(f)
+    violations = check_budgets(results, budgets)
+
+    report = {
+        "created_at": datetime.utcnow().isoformat(),
+        "commit": git_commit(),
+        "config": {"concurrency": args.concurrency, "requests": args.requests, "warmup": args.warmup, "seed": args.seed},
+        "scales": results,
+        "violations": violations,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.out}")
+
+    for v in violations:
+        print(f"BUDGET EXCEEDED at {v['scale']}x: {v['route']} {v['metric']} = {v['value']} (budget {v['budget']})")
+    return 1 if violations else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark API routes at several dataset scales")
+    parser.add_argument("--scales", type=float, nargs="+", default=[1.0], help="Scale factors to load and test (e.g. 1 10 100)")
+    parser.add_argument("--routes", nargs="+", choices=sorted(ROUTES), help="Subset of routes to run (default: all)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent clients per route")
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per route")
+    parser.add_argument("--warmup", type=int, default=10, help="Unmeasured requests per route before measuring")
+    parser.add_argument("--seed", type=int, default=42, help="Generator seed for scales other than 1")
+    parser.add_argument("--data-root", default=os.path.join(ROOT, "generated"), help="Where generated datasets are kept")
+    parser.add_argument("--budgets", default=BUDGETS_PATH, help="Budget file; pass '' to skip budget checks")
+    parser.add_argument("--out", default="benchmark_results.json", help="Results file")
+    args = parser.parse_args()
+    # Turn SIGTERM into SystemExit so the finally blocks stop the API server.
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(143))
+    sys.exit(asyncio.run(main(args)))
@@ -0,0 +1,294 @@
+import argparse
+import bisect
+import json
+import math
+import os
+import random
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+"""
+Synthetic dataset generator for load testing and benchmarks.
+
+Learns the distributions in seed_data/ (patient source and gender, appointments per
+patient, status, services per appointment, service mix, provider per service, start
+day/hour, payment coverage and method, ...) and writes a dataset of the same shape at
+any scale factor. Output is deterministic for a given --seed and is written in the
+seed_data file layout, so it can be loaded with:
+
+    python -m scripts.generate --scale 100 --out generated/100x
+    python -m scripts.seed --bulk --data-dir generated/100x
+
+Patients, appointments and payments scale linearly; the service catalog stays the
+same and providers grow with the square root of the scale (a 100x clinic has 10x the
+staff, each seeing more patients). Files are streamed, so memory stays flat.
+"""
+
+SEED_DIR = os.path.join(os.path.dirname(__file__), "..", "seed_data")
+WEEK = timedelta(days=7)
+
+
+class Sampler:
+    """Weighted sampling from observed values (cumulative weights + bisect)."""
+
+    def __init__(self, counts):
+        items = sorted(counts.items(), key=lambda kv: str(kv[0]))  # Stable order for determinism
+        self.values = [value for value, _ in items]
+        self.cumulative = []
+        total = 0
+        for _, weight in items:
+            total += weight
+            self.cumulative.append(total)
+        self.total = total
+
+    def __call__(self, rng: random.Random):
+        return self.values[bisect.bisect_right(self.cumulative, rng.random() * self.total)]
+
+
+def load(name):
+    with open(os.path.join(SEED_DIR, f"{name}.json")) as f:
+        return json.load(f)
+
+
+def dt(value):
+    return datetime.fromisoformat(value)
+
+
+class Profile:
+    """Empirical distributions extracted from seed_data."""
+
+    def __init__(self):
+        patients = load("patient")
+        self.providers = load("provider")
+        self.services = {s["id"]: s for s in load("service")}
+        appointments = load("appointment")
+        links = load("appointment_service")
+        payments = load("payment")
+
+        self.first_names = sorted({p["first_name"] for p in patients})
+        self.last_names = sorted({p["last_name"] for p in patients})
+        self.addresses = sorted({p["address"] for p in patients})
+        self.phones = sorted({p["phone"] for p in patients})
+        self.email_domains = Sampler(Counter(p["email"].split("@")[1] for p in patients))
+        self.gender = Sampler(Counter(p["gender"] for p in patients))
+        self.source = Sampler(Counter(p["source"] for p in patients))
+        self.dob = sorted(p["date_of_birth"] for p in patients)
+        self.patient_created = sorted(p["created_date"] for p in patients)
+
+        per_patient = Counter(a["patient_id"] for a in appointments)
+        self.appointments_per_patient = Sampler(Counter(per_patient[p["id"]] for p in patients))
+        self.status = Sampler(Counter(a["status"] for a in appointments))
+
+        by_appointment = defaultdict(list)
+        for link in links:
+            by_appointment[link["appointment_id"]].append(link)
+        self.services_per_appointment = Sampler(Counter(len(v) for v in by_appointment.values()))
+        self.service = Sampler(Counter(link["service_id"] for link in links))
+        pairs = defaultdict(Counter)
+        for link in links:
+            pairs[link["service_id"]][link["provider_id"]] += 1
+        self.provider_for_service = pairs
+
+        # First start of each appointment keeps the real date, weekday and hour mix;
+        # lead time is how far ahead it was booked.
+        created = {a["id"]: dt(a["created_date"]) for a in appointments}
+        self.first_starts = sorted(min(l["start"] for l in v) for v in by_appointment.values())
+        self.booking_lead = Sampler(Counter(
+            int((dt(min(l["start"] for l in v)) - created[apt_id]).total_seconds())
+            for apt_id, v in by_appointment.items()
+        ))
+        self.gap_minutes = Sampler(Counter(
+            int((dt(b["start"]) - dt(a["end"])).total_seconds() // 60)
+            for v in by_appointment.values()
+            for a, b in zip(sorted(v, key=lambda l: l["start"]), sorted(v, key=lambda l: l["start"])[1:])
+        ) or Counter({15: 1}))
+
+        # Payment coverage per appointment status, and how the paid amount/date relate
+        # to the service booked.
+        status_of = {a["id"]: a["status"] for a in appointments}
+        linked = {(l["appointment_id"], l["service_id"]): l for l in links}
+        services_by_status = Counter(status_of[l["appointment_id"]] for l in links)
+        paid_by_status = Counter(status_of[p["appointment_id"]] for p in payments)
+        self.payment_rate = {
+            status: paid_by_status[status] / count for status, count in services_by_status.items()
+        }
+        self.method = Sampler(Counter(p["method"] for p in payments))
+        self.payment_status = Sampler(Counter(p["status"] for p in payments))
+        self.amount_ratio = Sampler(Counter(
+            round(p["amount"] / self.services[p["service_id"]]["price"], 3) for p in payments
+        ))
+        self.payment_offset = Sampler(Counter(
+            int((dt(p["date"]) - dt(linked[(p["appointment_id"], p["service_id"])]["end"])).total_seconds())
+            for p in payments if (p["appointment_id"], p["service_id"]) in linked
+        ))
+        self.payment_created_lead = Sampler(Counter(
+            int((dt(p["date"]) - dt(p["created_date"])).total_seconds()) for p in payments
+        ))
+
+
+class JsonArrayWriter:
+    """Writes a JSON array one record per line, without holding records in memory."""
+
+    def __init__(self, path):
+        self.file = open(path, "w")
+        self.file.write("[\n")
+        self.count = 0
+
+    def write(self, record: dict):
+        if self.count:
+            self.file.write(",\n")
+        self.file.write(json.dumps(record))
+        self.count += 1
+
+    def close(self):
+        self.file.write("\n]\n")
+        self.file.close()
+
+
+def randomize_digits(rng, template: str) -> str:
+    # Keep the real phone formats, replace the digits.
+    return "".join(str(rng.randrange(10)) if c.isdigit() else c for c in template)
+
+
+def jitter(rng, values, days: int) -> datetime:
+    return dt(rng.choice(values)) + timedelta(days=rng.randint(-days, days), seconds=rng.randint(0, 86399))
+
+
+def build_providers(profile: Profile, rng: random.Random, scale: float):
+    """Real providers plus clones; each clone inherits a real provider's service mix."""
+    count = max(len(profile.providers), round(len(profile.providers) * math.sqrt(scale)))
+    providers, template_of = [], {}
+    for i in range(count):
+        template = profile.providers[i % len(profile.providers)]
+        if i < len(profile.providers):
+            provider = dict(template)
+        else:
+            first, last = rng.choice(profile.first_names), rng.choice(profile.last_names)
+            provider = {
+                "id": f"prv_{i:016x}",
+                "first_name": first,
+                "last_name": last,
+                "email": f"{first}.{last}.{i}@{profile.email_domains(rng)}".lower(),
+                "phone": randomize_digits(rng, template["phone"]),
+                "created_date": template["created_date"],
+            }
+        providers.append(provider)
+        template_of[provider["id"]] = template["id"]
+
+    clones = Counter(template_of.values())
+    provider_for_service = {}
+    for service_id, counts in profile.provider_for_service.items():
+        weights = Counter()
+        for provider in providers:
+            template = template_of[provider["id"]]
+            if counts.get(template):
+                weights[provider["id"]] = counts[template] / clones[template]
+        provider_for_service[service_id] = Sampler(weights)
+    return providers, provider_for_service
+
+
+def generate(scale: float, seed: int, out_dir: str):
+    rng = random.Random(seed)
+    profile = Profile()
+    os.makedirs(out_dir, exist_ok=True)
+    started = time.perf_counter()
+
+    providers, provider_for_service = build_providers(profile, rng, scale)
+    with open(os.path.join(out_dir, "provider.json"), "w") as f:
+        json.dump(providers, f, indent=2)
+    with open(os.path.join(out_dir, "service.json"), "w") as f:
+        json.dump(list(profile.services.values()), f, indent=2)
+
+    writers = {
+        name: JsonArrayWriter(os.path.join(out_dir, f"{name}.json"))
+        for name in ("patient", "appointment", "appointment_service", "payment")
+    }
+    patient_count = max(1, round(len(profile.dob) * scale))
+    appointment_seq = 0
+    payment_seq = 0
+    try:
+        for i in range(patient_count):
+            first, last = rng.choice(profile.first_names), rng.choice(profile.last_names)
+            patient_id = f"pat_{i:016x}"
+            writers["patient"].write({
+                "id": patient_id,
+                "first_name": first,
+                "last_name": last,
+                "date_of_birth": jitter(rng, profile.dob, 180).replace(hour=0, minute=0, second=0).isoformat(),
+                "gender": profile.gender(rng),
+                "source": profile.source(rng),
+                "address": rng.choice(profile.addresses),
+                "phone": randomize_digits(rng, rng.choice(profile.phones)),
+                "email": f"{first}.{last}{i}@{profile.email_domains(rng)}".lower(),
+                "created_date": jitter(rng, profile.patient_created, 3).isoformat(),
+            })
+
+            for _ in range(profile.appointments_per_patient(rng)):
+                appointment_id = f"apt_{appointment_seq:016x}"
+                appointment_seq += 1
+                status = profile.status(rng)
+                # Shift a real start by whole weeks: keeps weekday, hour and seasonality.
+                start = dt(rng.choice(profile.first_starts)) + WEEK * rng.randint(-4, 4)
+                writers["appointment"].write({
+                    "id": appointment_id,
+                    "patient_id": patient_id,
+                    "status": status,
+                    "created_date": (start - timedelta(seconds=profile.booking_lead(rng))).isoformat(),
+                })
+
+                # Distinct services per appointment, as in the real data
+                wanted = min(profile.services_per_appointment(rng), len(profile.services))
+                booked = []
+                while len(booked) < wanted:
+                    service_id = profile.service(rng)
+                    if service_id not in booked:
+                        booked.append(service_id)
+
+                for service_id in booked:
+                    service = profile.services[service_id]
+                    provider_id = provider_for_service[service_id](rng)
+                    end = start + timedelta(minutes=service["duration"])
+                    writers["appointment_service"].write({
+                        "appointment_id": appointment_id,
+                        "service_id": service_id,
+                        "provider_id": provider_id,
+                        "start": start.isoformat(),
+                        "end": end.isoformat(),
+                    })
+
+                    if rng.random() < profile.payment_rate.get(status, 0):
+                        paid_at = end + timedelta(seconds=profile.payment_offset(rng))
+                        writers["payment"].write({
+                            "id": f"pay_{payment_seq:016x}",
+                            "patient_id": patient_id,
+                            "amount": round(service["price"] * profile.amount_ratio(rng)),
+                            "date": paid_at.isoformat(),
+                            "method": profile.method(rng),
+                            "status": profile.payment_status(rng),
+                            "provider_id": provider_id,
+                            "appointment_id": appointment_id,
+                            "service_id": service_id,
+                            "created_date": (paid_at - timedelta(seconds=profile.payment_created_lead(rng))).isoformat(),
+                        })
+                        payment_seq += 1
+                    start = end + timedelta(minutes=profile.gap_minutes(rng))
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    print(f"Generated scale {scale}x (seed {seed}) into {out_dir} in {time.perf_counter() - started:.1f}s")
+    print(f"  providers: {len(providers)}, services: {len(profile.services)}")
+    for name, writer in writers.items():
+        print(f"  {name}: {writer.count}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic dataset shaped like seed_data/")
+    parser.add_argument("--scale", type=float, default=1.0, help="Scale factor relative to seed_data (e.g. 1, 10, 100, 1000)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed; the same seed and scale give identical output")
+    parser.add_argument("--out", default=None, help="Output directory (default: generated/<scale>x)")
+    args = parser.parse_args()
+
+    out = args.out or os.path.join("generated", f"{args.scale:g}x")
+    generate(args.scale, args.seed, out)
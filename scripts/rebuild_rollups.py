@@ -0,0 +1,46 @@
+import argparse
+import asyncio
+import time
+from datetime import date, timedelta
+from database import AsyncSessionLocal, engine
+from repositories.daily_metrics import DailyMetricsRepository
+from services.cache import bump_data_version
+
+"""
+Rebuild the daily_metrics rollup from the raw appointment_services and payments.
+
+Imports keep the rollup current on their own; use this after changing rows by other
+means (manual SQL, restores) or to repair it. With --from/--to only those days are
+recomputed.
+
+    python -m scripts.rebuild_rollups
+    python -m scripts.rebuild_rollups --from 2025-01-01 --to 2025-01-31
+"""
+
+
+async def rebuild(date_from: date = None, date_to: date = None):
+    started = time.perf_counter()
+    async with AsyncSessionLocal() as session:
+        repository = DailyMetricsRepository(session)
+        if date_from or date_to:
+            if not (date_from and date_to):
+                raise SystemExit("--from and --to go together")
+            days = [date_from + timedelta(days=n) for n in range((date_to - date_from).days + 1)]
+            rows = await repository.refresh_dates(days)
+            scope = f"{date_from} to {date_to}"
+        else:
+            rows = await repository.rebuild()
+            scope = "all days"
+        # Cached analytics may have been computed from the old rollup
+        await bump_data_version(session)
+        await session.commit()
+    await engine.dispose()
+    print(f"Rebuilt daily metrics for {scope}: {rows} rows in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the daily_metrics rollup")
+    parser.add_argument("--from", dest="date_from", type=date.fromisoformat, help="First day to recompute (inclusive)")
+    parser.add_argument("--to", dest="date_to", type=date.fromisoformat, help="Last day to recompute (inclusive)")
+    args = parser.parse_args()
+    asyncio.run(rebuild(args.date_from, args.date_to))
@@ -1,10 +1,20 @@
+import argparse
 import asyncio
-import json
 import os
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime
-from sqlalchemy.ext.asyncio import AsyncSession
-from database import AsyncSessionLocal, engine, Base
-from models import Patient, Provider, Service, Appointment, AppointmentService, Payment
+from sqlalchemy import DateTime, func, select, text
+from sqlalchemy.dialects.postgresql import insert
+from database import AsyncSessionLocal, engine
+from models import Patient, Provider, Service, Appointment, AppointmentService, Payment, DailyMetric, SeedRun
+from json_stream import CHUNK_SIZE, convert_fields, iter_json_chunks
+from services.import_pipeline import dependency_stages, run_stages
+from schema_version import reset_schema
+from repositories.appointment import AppointmentRepository
+from repositories.daily_metrics import DailyMetricsRepository
+from services.cache import bump_data_version, result_cache
+from services.view_refresher import view_refresher
 
 # Example inline comment: Helper to parse timestamps properly
 # Helper to parse datetime
@@ -14,128 +24,234 @@ def parse_dt(dt_str):
     # Fix 'Z' suffix for Python 3.9/3.10 ISO compatibility if needed, though modern fromisoformat handles it better.
     return datetime.fromisoformat(dt_str.replace('Z', '+00:00'))
 
-# Reads JSON file asynchronously (well, file IO is blocking here but it's fast enough for seed data)
-async def load_json(filename):
-    script_dir = os.path.dirname(__file__)
-    file_path = os.path.join(script_dir, "..", "seed_data", filename)
-    with open(file_path, "r") as f:
-        return json.load(f)
+SEED_DIR = os.path.join(os.path.dirname(__file__), "..", "seed_data")
 
-async def seed_data(reset=True):
+def seed_path(filename, data_dir=None):
+    return os.path.join(data_dir or SEED_DIR, filename)
+
+def datetime_fields(model):
+    # Names of the timestamp columns that need parse_dt applied.
+    return [c.name for c in model.__table__.columns if isinstance(c.type, DateTime)]
+
+async def load_chunks(filename, model, chunk_size=CHUNK_SIZE, data_dir=None):
+    # Stream a seed file in fixed-size chunks, parsing timestamps off the event loop.
+    transform = convert_fields(datetime_fields(model), parse_dt)
+    async for chunk in iter_json_chunks(seed_path(filename, data_dir), chunk_size, transform):
+        yield chunk
+
+# Seed file for each model. Load order comes from the FK graph (see dependency_stages).
+SEED_FILES = [
+    ("patient.json", Patient),
+    ("provider.json", Provider),
+    ("service.json", Service),
+    ("appointment.json", Appointment),
+    ("appointment_service.json", AppointmentService),
+    ("payment.json", Payment),
+]
+
+async def reset_tables():
+    # WARNING: This wipes existing data!
+    # Drop everything, then rebuild the schema (tables and indexes) from the migrations.
+    print("Dropping existing tables and re-applying migrations...")
+    await reset_schema()
+
+# seed_runs row tracking the seed; see migration 0011
+SEED_RUN = "seed"
+
+async def seed_status():
+    # "loading" if a seed started but never finished (crashed), "complete", or None if never seeded.
+    async with AsyncSessionLocal() as session:
+        return await session.scalar(select(SeedRun.status).where(SeedRun.name == SEED_RUN))
+
+async def mark_seed(status):
+    # "loading" starts a run (before any rows are written), "complete" finishes it.
+    now = datetime.utcnow()
+    if status == "loading":
+        values = {"status": status, "started_at": now, "finished_at": None}
+    else:
+        values = {"status": status, "finished_at": now}
+    async with AsyncSessionLocal() as session:
+        await session.execute(
+            insert(SeedRun).values(name=SEED_RUN, **{"started_at": now, **values})
+            .on_conflict_do_update(index_elements=["name"], set_=values)
+        )
+        await session.commit()
+
+@asynccontextmanager
+async def seed_lock():
+    # Session advisory lock held for a whole seed, so the CLI and API workers starting up
+    # never check or load while another process is seeding.
+    async with engine.connect() as conn:
+        await conn.execute(select(func.pg_advisory_lock(func.hashtext(SEED_RUN))))
+        await conn.commit()
+        try:
+            yield
+        finally:
+            await conn.execute(select(func.pg_advisory_unlock(func.hashtext(SEED_RUN))))
+            await conn.commit()
+
+async def clear_seed_tables():
+    # Empty the seeded tables (and the rollup built from them), e.g. after an interrupted seed.
+    tables = [model.__tablename__ for _, model in SEED_FILES] + [DailyMetric.__tablename__]
+    print("Clearing the rows of an incomplete seed...")
+    async with engine.begin() as conn:
+        await conn.execute(text("TRUNCATE " + ", ".join(tables) + " CASCADE"))
+
+def copy_columns(model):
+    # Columns we send through COPY; autoincrement keys and generated columns are left to the
+    # database, and derived summary columns are filled in by refresh_summaries() after loading.
+    return [
+        c for c in model.__table__.columns
+        if not (c.primary_key and c.autoincrement is True) and c.computed is None and not c.info.get("derived")
+    ]
+
+async def to_records(columns, chunks, counter):
+    # Turn streamed JSON dicts into tuples in column order for COPY.
+    names = [c.name for c in columns]
+    async for chunk in chunks:
+        counter[0] += len(chunk)
+        for row in chunk:
+            yield tuple(row.get(name) for name in names)
+
+async def copy_file(filename, model, data_dir=None):
+    # COPY one seed file on its own connection so independent tables can load in parallel.
+    columns = copy_columns(model)
+    counter = [0]
+
+    async with engine.connect() as conn:
+        # Drop down to the raw asyncpg connection for copy_records_to_table.
+        raw = await conn.get_raw_connection()
+        pg = raw.driver_connection
+
+        start = time.perf_counter()
+        async with pg.transaction():
+            await pg.copy_records_to_table(
+                model.__tablename__,
+                records=to_records(columns, load_chunks(filename, model, data_dir=data_dir), counter),
+                columns=[c.name for c in columns],
+            )
+        elapsed = time.perf_counter() - start
+
+    rate = counter[0] / elapsed if elapsed > 0 else float("inf")
+    print(f"Copied {counter[0]:>8} rows into {model.__tablename__:<22} in {elapsed:6.2f}s ({rate:,.0f} rows/s)")
+    return counter[0]
+
+async def insert_file(filename, model, data_dir=None):
+    # ORM load of one seed file on its own session, committed per chunk so the
+    # identity map never holds more than one chunk.
+    print(f"Seeding {model.__tablename__.replace('_', ' ').title()}...")
+    columns = [c.name for c in copy_columns(model)]
+    count = 0
+    async with AsyncSessionLocal() as session:
+        async for chunk in load_chunks(filename, model, data_dir=data_dir):
+            session.add_all(model(**{c: row.get(c) for c in columns}) for row in chunk)
+            await session.commit()
+            session.expunge_all()
+            count += len(chunk)
+    return count
+
+async def refresh_summaries():
+    # Fill the derived appointment summary columns the loaders leave out.
+    async with AsyncSessionLocal() as session:
+        updated = await AppointmentRepository(session).refresh_summaries()
+        await session.commit()
+    print(f"Refreshed {updated} appointment summaries")
+
+async def rebuild_rollups():
+    # Rebuild the daily_metrics rollup from the loaded rows.
+    async with AsyncSessionLocal() as session:
+        rows = await DailyMetricsRepository(session).rebuild()
+        await session.commit()
+    print(f"Rebuilt daily metrics: {rows} rows")
+
+async def bump_version():
+    # Cached analytics were computed from the old data; see services/cache.py.
+    async with AsyncSessionLocal() as session:
+        version = await bump_data_version(session)
+        await session.commit()
+    await result_cache.invalidate(version)
+
+async def refresh_views():
+    # Repopulate the analytics materialized views from the loaded rows.
+    await view_refresher.refresh(force=True)
+
+async def analyze_tables():
+    # Fresh planner statistics after a load: better plans, and accurate count=estimate totals.
+    async with engine.connect() as conn:
+        await conn.execute(text("ANALYZE " + ", ".join(model.__tablename__ for _, model in SEED_FILES)))
+        await conn.commit()
+
+def print_stages():
+    stages = dependency_stages([model.__tablename__ for _, model in SEED_FILES])
+    print("Load stages: " + " -> ".join("[" + ", ".join(stage) + "]" for stage in stages))
+
+async def bulk_load(reset=True, data_dir=None):
+    """
+    Load every seed file with asyncpg's binary COPY, bypassing the ORM.
+    Much faster than seed_data() for large files; expects empty tables (use reset=True).
+    Tables in the same dependency stage are copied concurrently, one transaction each.
+    data_dir points at another dataset in the seed_data layout (e.g. scripts.generate output).
+    """
+    if reset:
+        await reset_tables()
+    await mark_seed("loading")
+
+    print_stages()
+    total_start = time.perf_counter()
+    await run_stages({
+        model.__tablename__: (lambda f=filename, m=model: copy_file(f, m, data_dir))
+        for filename, model in SEED_FILES
+    })
+    await refresh_summaries()
+    await rebuild_rollups()
+    await bump_version()
+    await refresh_views()
+    await analyze_tables()
+    await mark_seed("complete")
+    print(f"Bulk load complete in {time.perf_counter() - total_start:.2f}s")
+
+async def seed_data(reset=True, data_dir=None):
     if reset:
         # 1. Recreate tables to ensure a clean slate
-        # WARNING: This wipes existing data!
-        async with engine.begin() as conn:
-            print("Dropping existing tables...")
-            await conn.run_sync(Base.metadata.drop_all)
-            print("Creating new tables...")
-            await conn.run_sync(Base.metadata.create_all)
+        await reset_tables()
     else:
          print("Skipping table reset (reset=False)...")
+    await mark_seed("loading")
 
-    # 2. Start a DB session to insert data
-    async with AsyncSessionLocal() as session:
-        # --- SEED PATIENTS ---
-        print("Seeding Patients...")
-        patients_data = await load_json("patient.json")
-        patients = [
-            Patient(
-                id=p["id"],
-                first_name=p["first_name"],
-                last_name=p["last_name"],
-                date_of_birth=parse_dt(p["date_of_birth"]),
-                gender=p["gender"],
-                address=p["address"],
-                phone=p["phone"],
-                email=p["email"],
-                source=p.get("source"),
-                created_date=parse_dt(p["created_date"])
-            ) for p in patients_data
-        ]
-        session.add_all(patients)
-        
-        # --- SEED PROVIDERS ---
-        print("Seeding Providers...")
-        providers_data = await load_json("provider.json")
-        providers = [
-            Provider(
-                id=p["id"],
-                first_name=p["first_name"],
-                last_name=p["last_name"],
-                email=p["email"],
-                phone=p["phone"],
-                created_date=parse_dt(p["created_date"])
-            ) for p in providers_data
-        ]
-        session.add_all(providers)
-
-        # --- SEED SERVICES ---
-        print("Seeding Services...")
-        services_data = await load_json("service.json")
-        services = [
-            Service(
-                id=s["id"],
-                name=s["name"],
-                description=s["description"],
-                price=s["price"],
-                duration=s["duration"],
-                created_date=parse_dt(s["created_date"])
-            ) for s in services_data
-        ]
-        session.add_all(services)
-        
-        # Commit patients, providers, services first so they can be referenced
-        await session.commit() 
-
-        # --- SEED APPOINTMENTS ---
-        print("Seeding Appointments...")
-        appointments_data = await load_json("appointment.json")
-        appointments = [
-             Appointment(
-                id=a["id"],
-                patient_id=a["patient_id"],
-                status=a["status"],
-                created_date=parse_dt(a["created_date"])
-            ) for a in appointments_data
-        ]
-        session.add_all(appointments)
-        await session.commit() # Commit appointments to reference them in payments/app_services
-
-        # --- SEED APPOINTMENTS SERVICES (Link Table) ---
-        print("Seeding Appointment Services...")
-        app_services_data = await load_json("appointment_service.json")
-        app_services = [
-            AppointmentService(
-                appointment_id=aps["appointment_id"],
-                service_id=aps["service_id"],
-                provider_id=aps["provider_id"],
-                start=parse_dt(aps["start"]),
-                end=parse_dt(aps["end"])
-            ) for aps in app_services_data
-        ]
-        session.add_all(app_services)
-
-        # --- SEED PAYMENTS ---
-        print("Seeding Payments...")
-        payments_data = await load_json("payment.json")
-        payments = [
-            Payment(
-                id=pym["id"],
-                patient_id=pym["patient_id"],
-                amount=pym["amount"],
-                date=parse_dt(pym["date"]),
-                method=pym["method"],
-                status=pym["status"],
-                provider_id=pym["provider_id"],
-                appointment_id=pym["appointment_id"],
-                service_id=pym["service_id"],
-                created_date=parse_dt(pym["created_date"])
-            ) for pym in payments_data
-        ]
-        session.add_all(payments)
-        
-        await session.commit()
-        print("Seeding Complete!")
+    # 2. Insert each file through the ORM; parents load before the rows that reference them
+    print_stages()
+    await run_stages({
+        model.__tablename__: (lambda f=filename, m=model: insert_file(f, m, data_dir))
+        for filename, model in SEED_FILES
+    })
+    await refresh_summaries()
+    await rebuild_rollups()
+    await bump_version()
+    await refresh_views()
+    await analyze_tables()
+    await mark_seed("complete")
+    print("Seeding Complete!")
+
+async def main(args):
+    async with seed_lock():
+        reset = not args.no_reset
+        if args.resume:
+            if await seed_status() != "loading":
+                print("No interrupted seed to resume.")
+                return
+            # Start the interrupted seed over on the existing schema
+            await clear_seed_tables()
+            reset = False
+        if args.bulk:
+            await bulk_load(reset=reset, data_dir=args.data_dir)
+        else:
+            await seed_data(reset=reset, data_dir=args.data_dir)
 
 if __name__ == "__main__":
-    asyncio.run(seed_data())
+    parser = argparse.ArgumentParser(description="Seed the database from seed_data/*.json")
+    parser.add_argument("--bulk", action="store_true", help="Load with binary COPY instead of the ORM")
+    parser.add_argument("--no-reset", action="store_true", help="Keep existing tables and data")
+    parser.add_argument("--resume", action="store_true", help="Clear the rows of an interrupted seed and load again (keeps the schema)")
+    parser.add_argument("--data-dir", default=None, help="Load from this directory instead of seed_data/ (e.g. scripts.generate output)")
+    args = parser.parse_args()
+    asyncio.run(main(args))
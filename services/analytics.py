@@ -1,16 +1,69 @@
+import asyncio
+import os
+import time
+from typing import Any, Dict
+from database import AsyncSessionLocal
 from repositories.analytics import AnalyticsRepository
 from schemas import AnalyticsSummary, StatItem
 
+"""
+The analytics summary is a dozen independent aggregates. They run concurrently,
+each on its own session (and so its own pooled connection), so the endpoint takes
+about as long as its slowest query rather than the sum of them all.
+"""
+
+# Summary queries in flight at once, across all concurrent summary requests of the
+# process. Keep it well under the engine's pool (5 connections + 10 overflow) so
+# other requests still get a connection.
+ANALYTICS_CONCURRENCY = int(os.getenv("ANALYTICS_CONCURRENCY", "4"))
+
+# Shared by every AnalyticsService; the controller builds one per request
+QUERY_SLOTS = asyncio.Semaphore(max(1, ANALYTICS_CONCURRENCY))
+
+# AnalyticsRepository methods behind the summary, slowest first so they start first
+SUMMARY_QUERIES = (
+    "get_retention_opportunities",
+    "get_top_patients",
+    "get_appointment_patterns",
+    "get_top_services",
+    "get_provider_services",
+    "get_provider_revenue",
+    "get_monthly_revenue",
+    "get_patient_demographics",
+    "get_patients_by_source",
+    "get_appointments_by_status",
+    "get_total_revenue",
+    "get_total_patients",
+    "get_total_appointments",
+)
+
+
 class AnalyticsService:
-    def __init__(self, repository: AnalyticsRepository):
-        self.repository = repository
+    def __init__(self, session_factory=AsyncSessionLocal, semaphore: asyncio.Semaphore = QUERY_SLOTS):
+        self.session_factory = session_factory
+        self.semaphore = semaphore
+
+    async def _run(self, name: str, timings: Dict[str, float]) -> Any:
+        """One repository query on a session of its own; records its time in `timings`."""
+        async with self.semaphore:
+            started = time.perf_counter()
+            async with self.session_factory() as session:
+                result = await getattr(AnalyticsRepository(session), name)()
+            timings[name.removeprefix("get_")] = round((time.perf_counter() - started) * 1000, 2)
+        return result
 
     async def get_summary(self) -> AnalyticsSummary:
-        revenue = await self.repository.get_total_revenue()
-        patients = await self.repository.get_total_patients()
-        appointments = await self.repository.get_total_appointments()
+        timings: Dict[str, float] = {}
+        results = dict(zip(
+            SUMMARY_QUERIES,
+            await asyncio.gather(*[self._run(name, timings) for name in SUMMARY_QUERIES]),
+        ))
+
+        revenue = results["get_total_revenue"]
+        patients = results["get_total_patients"]
+        appointments = results["get_total_appointments"]
         
-        sources_raw = await self.repository.get_patients_by_source()
+        sources_raw = results["get_patients_by_source"]
         sources = [
             StatItem(
                 label=str(s[0]).replace("_", " ").title() if s[0] else "Unknown", 
@@ -19,7 +72,7 @@ class AnalyticsService:
             for s in sources_raw
         ]
 
-        services_raw = await self.repository.get_top_services()
+        services_raw = results["get_top_services"]
         services = [
             StatItem(
                 label=str(s[0]).title(), 
@@ -28,7 +81,7 @@ class AnalyticsService:
             for s in services_raw
         ]
         
-        status_raw = await self.repository.get_appointments_by_status()
+        status_raw = results["get_appointments_by_status"]
         statuses = [
             StatItem(
                 label=str(s[0]).replace("_", " ").title(), 
@@ -38,13 +91,13 @@ class AnalyticsService:
         ]
 
         # New Metrics
-        revenue_raw = await self.repository.get_monthly_revenue()
+        revenue_raw = results["get_monthly_revenue"]
         revenue_trend = [
             {"date": r[0] or "Unknown", "value": (r[1] or 0) / 100.0} # Convert cents to dollars
             for r in revenue_raw
         ]
 
-        demographics_raw = await self.repository.get_patient_demographics()
+        demographics_raw = results["get_patient_demographics"]
         genders = [StatItem(label=str(g[0]).title() if g[0] else "Unknown", value=g[1]) for g in demographics_raw["gender"]]
         
         # Format age buckets (0 -> "0-10", 1 -> "10-20")
@@ -55,7 +108,7 @@ class AnalyticsService:
             end = bucket * 10
             ages.append(StatItem(label=f"{start}-{end}", value=count))
 
-        patterns_raw = await self.repository.get_appointment_patterns()
+        patterns_raw = results["get_appointment_patterns"]
         
         day_mapping = {
             "Monday": 0, "Tuesday": 1, "Wednesday": 2, "Thursday": 3,
@@ -65,13 +118,13 @@ class AnalyticsService:
         days = [StatItem(label=str(p[0]).strip(), value=p[1]) for p in patterns_raw]
         days.sort(key=lambda x: day_mapping.get(x.label, 99))
 
-        provider_rev_raw = await self.repository.get_provider_revenue()
+        provider_rev_raw = results["get_provider_revenue"]
         prov_rev = [
             StatItem(label=str(p[0]), value=(p[1] or 0) / 100.0) # Convert cents to dollars
             for p in provider_rev_raw
         ]
 
-        provider_serv_raw = await self.repository.get_provider_services()
+        provider_serv_raw = results["get_provider_services"]
         prov_serv = [
             StatItem(label=str(p[0]), value=p[1])
             for p in provider_serv_raw
@@ -96,6 +149,7 @@ class AnalyticsService:
                 "revenue_by_provider": prov_rev,
                 "services_by_provider": prov_serv
             },
-            top_patients=await self.repository.get_top_patients(),
-            retention_opportunities=await self.repository.get_retention_opportunities()
+            top_patients=results["get_top_patients"],
+            retention_opportunities=results["get_retention_opportunities"],
+            query_timings_ms=timings
         )
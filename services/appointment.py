@@ -1,7 +1,15 @@
+import json
+from datetime import datetime
 from typing import List, Optional
 from models import Appointment
 from repositories.appointment import AppointmentRepository
 
+def local_naive(value: Optional[datetime]) -> Optional[datetime]:
+    """Timestamps are stored as naive server-local time; convert aware input to match."""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone().replace(tzinfo=None)
+    return value
+
 class AppointmentService:
     def __init__(self, repository: AppointmentRepository):
         self.repository = repository
@@ -13,93 +21,43 @@ class AppointmentService:
         search: str = None,
         sort_by: str = "start_time",
         sort_order: str = "desc",
-        date_filter: str = None
+        date_filter: str = None,
+        cursor: str = None,
+        count: str = "exact"
     ) -> dict:
-        appointments, total = await self.repository.get_all_with_patient(
+        appointments, total, total_kind, next_cursor = await self.repository.get_all_with_patient(
             skip=skip, 
             limit=limit,
             search=search,
             sort_by=sort_by,
             sort_order=sort_order,
-            date_filter=date_filter
+            date_filter=date_filter,
+            cursor=cursor,
+            count=count
         )
         
-        # Calculate metrics for each appointment
-        for appointment in appointments:
-            if appointment.services:
-                # Service count
-                appointment.service_count = len(appointment.services)
-                
-                # Total cost (sum of all service prices)
-                appointment.total_cost = sum(
-                    svc.service.price for svc in appointment.services if svc.service
-                )
-                
-                # Duration (earliest start to latest end) and start time
-                if appointment.services:
-                    starts = [svc.start for svc in appointment.services if svc.start]
-                    ends = [svc.end for svc in appointment.services if svc.end]
-                    if starts and ends:
-                        earliest_start = min(starts)
-                        latest_end = max(ends)
-                        appointment.duration_minutes = int((latest_end - earliest_start).total_seconds() / 60)
-                        appointment.start_time = earliest_start  # Add start time
-                    else:
-                        appointment.start_time = None
-                
-                # Payment status for each service
-                for service in appointment.services:
-                    # Find payment for this specific service
-                    payment = next(
-                        (p for p in (appointment.payments or [])
-                         if p.service_id == service.service_id),
-                        None
-                    )
-                    if payment:
-                        service.payment_status = payment.status  # "pending", "paid", or "failed"
-                    else:
-                        service.payment_status = "unpaid"
-            else:
-                appointment.service_count = 0
-                appointment.total_cost = 0
-                appointment.duration_minutes = 0
-                appointment.start_time = None
-        
-        return {"data": appointments, "total": total}
+        # service_count, total_cost, duration_minutes and start_time are stored on the row;
+        # payment_status and outstanding_balance are resolved by the query (see models.py)
+        return {"data": appointments, "total": total, "total_kind": total_kind, "next_cursor": next_cursor}
+
+    async def get_appointments_json(self, **params) -> str:
+        """
+        get_appointments as a finished JSON body, same shape as PaginatedAppointmentsResponse.
+        Postgres builds each appointment's document in the page query; they are spliced
+        into the body as-is, with no ORM objects or Pydantic validation in between.
+        """
+        documents, total, total_kind, next_cursor = await self.repository.get_all_with_patient(**params, as_json=True)
+        return (
+            '{"data":[' + ",".join(documents) + "],"
+            f'"total":{json.dumps(total)},"total_kind":{json.dumps(total_kind)},"next_cursor":{json.dumps(next_cursor)}}}'
+        )
 
     async def get_appointment(self, appointment_id: str) -> Optional[Appointment]:
-        appointment = await self.repository.get_by_id_with_details(appointment_id)
-        
-        if appointment and appointment.services:
-            # Calculate metrics
-            appointment.service_count = len(appointment.services)
-            appointment.total_cost = sum(
-                svc.service.price for svc in appointment.services if svc.service
-            )
-            
-            if appointment.services:
-                starts = [svc.start for svc in appointment.services]
-                ends = [svc.end for svc in appointment.services]
-                if starts and ends:
-                    earliest_start = min(starts)
-                    latest_end = max(ends)
-                    appointment.duration_minutes = int((latest_end - earliest_start).total_seconds() / 60)
-            
-            # Payment status for each service
-            for service in appointment.services:
-                # Find payment for this specific service
-                payment = next(
-                    (p for p in (appointment.payments or [])
-                     if p.service_id == service.service_id),
-                    None
-                )
-                if payment:
-                    service.payment_status = payment.status  # "pending", "paid", or "failed"
-                else:
-                    service.payment_status = "unpaid"
-        
-        return appointment
+        return await self.repository.get_by_id_with_details(appointment_id)
     
-    async def get_analytics(self) -> dict:
-        """Get appointment analytics"""
-        return await self.repository.get_analytics()
+    async def get_analytics(self, date_from: Optional[datetime] = None, date_to: Optional[datetime] = None) -> dict:
+        """Get appointment analytics, optionally for the window [date_from, date_to)"""
+        date_from, date_to = local_naive(date_from), local_naive(date_to)
+        if date_from and date_to and date_from >= date_to:
+            raise ValueError("'from' must be before 'to'")
+        return await self.repository.get_analytics(date_from=date_from, date_to=date_to)
@@ -0,0 +1,253 @@
+import asyncio
+import bisect
+import os
+import re
+import time
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import select
+from database import AsyncSessionLocal
+from models import DataVersion, Patient, Provider
+from repositories.base import BaseRepository
+from services.cache import DATA, result_cache
+
+"""
+In-process prefix index for typeahead search over patient and provider names,
+emails and phones. Lookups are a bisect into sorted key lists and never touch
+Postgres. The index is loaded at startup and patched when imports change
+patients or providers.
+
+Keys are "<normalized text>\\0<type>\\0<id>" strings kept in two sorted lists: a
+large main list built at load time, and a small delta list for incremental
+updates that is merged into the main list once it grows. Updated records leave
+their old keys behind; lookups skip keys an entity no longer has, and
+compaction drops them. At 500k patients the index holds ~2M keys.
+
+Imports in this process patch the index directly. Changes made by other processes
+show up as a data version (services/cache.py) this index hasn't accounted for,
+which triggers a reload.
+"""
+
+SEP = "\0"
+TYPES = {"patient": Patient, "provider": Provider}
+SCAN_LIMIT = 400  # Keys examined per list and lookup; bounds latency for one-letter prefixes
+COMPACT_MIN = 20000  # Delta size that triggers a merge into the main list
+RELOAD_SECONDS = int(os.getenv("AUTOCOMPLETE_RELOAD_SECONDS", "0"))  # Periodic full reload (0 = off)
+# How often to check whether another process changed the data (0 = never); see start_reloading
+CHECK_SECONDS = int(os.getenv("AUTOCOMPLETE_CHECK_SECONDS", "30"))
+
+# Each record has up to four keys, in this order; names rank above emails, emails above phones.
+NAME, EMAIL, PHONE = 3, 2, 1
+KEY_KINDS = (PHONE, EMAIL, NAME, NAME)
+MATCHED = {NAME: "name", EMAIL: "email", PHONE: "phone"}
+
+_NON_DIGITS = re.compile(r"\D")
+
+
+def normalize(text: Optional[str]) -> str:
+    """Lowercase, strip accents and collapse whitespace."""
+    if not text:
+        return ""
+    if text.isascii():
+        return " ".join(text.lower().split())
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(text.lower().split())
+
+
+def phone_digits(phone: Optional[str]) -> str:
+    """National number digits: extension, punctuation and the +1/001 prefix removed."""
+    if not phone:
+        return ""
+    digits = _NON_DIGITS.sub("", phone.lower().split("x")[0])
+    return digits[-10:] if len(digits) > 10 else digits
+
+
+def entity_keys(first_name, last_name, email, phone) -> Tuple[str, str, str, str]:
+    """Index keys for one record, in KEY_KINDS order ("" when a field is empty)."""
+    first, last = normalize(first_name), normalize(last_name)
+    return (
+        phone_digits(phone),
+        normalize(email),
+        f"{last} {first}".strip(),  # "smith j"
+        f"{first} {last}".strip(),  # "john sm", and first-name prefixes
+    )
+
+
+class AutocompleteIndex:
+    def __init__(self):
+        self._main: List[str] = []
+        self._delta: List[str] = []
+        # (type, id) -> (display name, email, phone, keys)
+        self._entities: Dict[Tuple[str, str], tuple] = {}
+        self._stale = set()  # Entries whose record has changed since they were added
+        self._reload_task: Optional[asyncio.Task] = None
+        self._pending: Optional[list] = None  # Upserts made while a load is reading, replayed onto it
+        self.loaded_at: Optional[float] = None
+        self.data_version: Optional[int] = None  # Data version the index reflects
+
+    def __len__(self):
+        return len(self._entities)
+
+    def _entries(self, type: str, rows) -> list:
+        # rows: (id, first_name, last_name, email, phone). Returns the entries to add and
+        # records the ones the new values replace in self._stale.
+        entries = []
+        for id, first_name, last_name, email, phone in rows:
+            new_keys = entity_keys(first_name, last_name, email, phone)
+            previous = self._entities.get((type, id))
+            old_keys = previous[3] if previous else ()
+            self._entities[(type, id)] = (f"{first_name or ''} {last_name or ''}".strip(), email, phone, new_keys)
+            for key in set(new_keys):
+                if key and key not in old_keys:
+                    entry = f"{key}{SEP}{type}{SEP}{id}"
+                    self._stale.discard(entry)  # The value came back; its old entry is live again
+                    entries.append(entry)
+            for key in set(old_keys):
+                if key and key not in new_keys:
+                    self._stale.add(f"{key}{SEP}{type}{SEP}{id}")
+        return entries
+
+    async def load(self):
+        """(Re)build the whole index from the database."""
+        started = time.perf_counter()
+        fresh = AutocompleteIndex()
+        keys = []
+        self._pending = pending = []
+        async with AsyncSessionLocal() as session:
+            # Read before the rows, so a change committed meanwhile counts as not yet seen
+            version = await session.scalar(select(DataVersion.version).where(DataVersion.name == DATA))
+            for type, model in TYPES.items():
+                repository = BaseRepository(session, model)
+                columns = (model.id, model.first_name, model.last_name, model.email, model.phone)
+                async for rows in repository.stream_columns(columns):
+                    keys.extend(fresh._entries(type, rows))
+        keys = await asyncio.to_thread(sorted, keys)
+
+        # Imports that committed while this was reading may be missing from it (or
+        # read at an older value): apply them again, in order, on top.
+        fresh._main = keys
+        for type, rows in pending:
+            fresh.upsert(type, rows)
+        if self._pending is pending:
+            self._pending = None
+
+        # Swap in one step so lookups never see a half-built index.
+        self._main, self._delta, self._entities, self._stale = fresh._main, fresh._delta, fresh._entities, fresh._stale
+        self.loaded_at = time.time()
+        self.data_version = version
+        print(f"Autocomplete index loaded: {len(self._entities)} records, {len(keys)} keys "
+              f"in {time.perf_counter() - started:.2f}s")
+
+    def upsert(self, type: str, rows: Iterable[tuple]):
+        """Add or replace records: rows of (id, first_name, last_name, email, phone)."""
+        rows = list(rows)
+        if self._pending is not None:
+            self._pending.append((type, rows))
+        entries = self._entries(type, rows)
+        # Both inputs are sorted runs, so this is a linear merge.
+        self._delta = sorted(self._delta + sorted(entries))
+        if len(self._delta) > max(COMPACT_MIN, len(self._main) // 20):
+            self._compact()
+
+    def _compact(self):
+        merged = sorted(self._main + self._delta)
+        stale, previous = self._stale, None
+        if stale or self._delta:
+            # Drop stale entries and adjacent duplicates (a value that changed and came back).
+            kept = []
+            for entry in merged:
+                if entry != previous and entry not in stale:
+                    kept.append(entry)
+                previous = entry
+            merged = kept
+        self._main, self._delta, self._stale = merged, [], set()
+
+    def search(self, query: str, limit: int = 10, types: Optional[Iterable[str]] = None) -> List[dict]:
+        """Top `limit` records whose name, email or phone starts with `query`."""
+        prefixes = {normalize(query)} - {""}
+        digits = phone_digits(query)
+        if len(digits) >= 3 and not any(c.isalpha() for c in query):
+            prefixes.add(digits)  # A (partial) phone number in any format
+        allowed = set(types) if types else None
+
+        # (type, id) -> best sort key seen: exact matches, then by kind, then shorter keys.
+        best: Dict[Tuple[str, str], tuple] = {}
+        for prefix in prefixes:
+            for keys in (self._main, self._delta):
+                start = bisect.bisect_left(keys, prefix)
+                for entry in keys[start:start + SCAN_LIMIT]:
+                    if not entry.startswith(prefix):
+                        break
+                    key, type, id = entry.split(SEP)
+                    if allowed is not None and type not in allowed:
+                        continue
+                    entity = self._entities.get((type, id))
+                    if entity is None or key not in entity[3]:
+                        continue  # Stale key from an earlier version of the record
+                    kind = KEY_KINDS[entity[3].index(key)]
+                    rank = (key != prefix, -kind, len(key), key)
+                    if rank < best.get((type, id), (True, 0, float("inf"), "")):
+                        best[(type, id)] = rank
+
+        results = []
+        for (type, id), rank in sorted(best.items(), key=lambda item: item[1])[:limit]:
+            name, email, phone, keys = self._entities[(type, id)]
+            results.append({
+                "type": type,
+                "id": id,
+                "name": name,
+                "email": email,
+                "phone": phone,
+                "matched": MATCHED[-rank[1]],
+            })
+        return results
+
+    async def fetch_rows(self, type: str, ids: List[str], session) -> list:
+        """Current index rows for `ids`, read through `session` (so an import sees its own writes)."""
+        model = TYPES[type]
+        return await BaseRepository(session, model).get_columns(
+            (model.id, model.first_name, model.last_name, model.email, model.phone), ids
+        )
+
+    def note_version(self, version: int):
+        """
+        This process bumped the data version to `version` and has applied its change
+        to the index (or it didn't touch patients or providers). Any other bump means
+        another process wrote, and the next check reloads.
+        """
+        if self.data_version is not None and version == self.data_version + 1:
+            self.data_version = version
+
+    async def changed_elsewhere(self) -> bool:
+        return await result_cache.data_version() != self.data_version
+
+    def start_reloading(self, interval: int = RELOAD_SECONDS, check: int = CHECK_SECONDS):
+        """
+        Reload from the database when another process has changed the data (checked
+        every `check` seconds), and every `interval` seconds regardless.
+        """
+        if self._reload_task or (interval <= 0 and check <= 0):
+            return
+
+        async def loop():
+            while True:
+                await asyncio.sleep(min(seconds for seconds in (interval, check) if seconds > 0))
+                try:
+                    due = interval > 0 and time.time() - (self.loaded_at or 0) >= interval
+                    if due or (check > 0 and await self.changed_elsewhere()):
+                        await self.load()
+                except Exception as e:
+                    print(f"Autocomplete reload failed: {e}")
+
+        self._reload_task = asyncio.create_task(loop())
+
+    async def stop(self):
+        if self._reload_task:
+            self._reload_task.cancel()
+            await asyncio.gather(self._reload_task, return_exceptions=True)
+            self._reload_task = None
+
+
+# Shared index for the API process
+autocomplete = AutocompleteIndex()
@@ -0,0 +1,277 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, NamedTuple, Optional
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import AsyncSessionLocal
+from models import CacheEntry, DataVersion
+from services.singleflight import flights
+
+"""
+Result cache for the analytics endpoints, which aggregate whole tables but whose
+inputs only change when data is imported.
+
+Entries are keyed by endpoint and parameters and stamped with the data version
+they were computed at. The version is a counter in data_versions that imports and
+the seed scripts bump (bump_data_version) in the same transaction as their writes;
+an entry from an older version is never served. Within the version, an entry is
+fresh for CACHE_TTL_SECONDS; for CACHE_STALE_SECONDS after that it is still served
+while a background task recomputes it (stale-while-revalidate).
+
+Results read from the analytics materialized views are also keyed by the views
+version, which the view refresher bumps instead of the data version: a refresh
+retires only those entries, not every cached result.
+
+CACHE_BACKEND picks the store: "memory" (default) is a per-process LRU of
+CACHE_MAX_ENTRIES, "postgres" shares entries between workers through the unlogged
+cache_entries table. Each process rereads the versions at most every
+CACHE_VERSION_CHECK_SECONDS, so a bump made by another worker takes effect within
+that interval; the bumping process sees it at once.
+"""
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "60"))  # 0 turns the cache off
+CACHE_STALE_SECONDS = float(os.getenv("CACHE_STALE_SECONDS", "300"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "256"))
+CACHE_VERSION_CHECK_SECONDS = float(os.getenv("CACHE_VERSION_CHECK_SECONDS", "2"))
+
+# data_versions row for the data the analytics are computed from
+DATA = "data"
+# data_versions row for the analytics materialized views (services/view_refresher.py).
+# Entries computed from the views are also keyed by it, so a refresh only retires them.
+VIEW_DATA = "views"
+
+
+def endpoint(key: str) -> str:
+    """Key without its parameters, for grouping counters."""
+    return key.split("?", 1)[0]
+
+
+class Entry(NamedTuple):
+    value: Any  # JSON-compatible (jsonable_encoder output)
+    version: int
+    created_at: float  # time.time()
+
+
+async def bump_data_version(session: AsyncSession, name: str = DATA) -> int:
+    """Increment the data (or views) version inside the caller's transaction; returns the new version."""
+    version = await session.scalar(
+        update(DataVersion)
+        .where(DataVersion.name == name)
+        .values(version=DataVersion.version + 1, updated_at=datetime.now())
+        .returning(DataVersion.version)
+    )
+    if version is None:
+        # Row missing (e.g. restored from an older dump, or the first view refresh): start counting
+        await session.execute(
+            insert(DataVersion).values(name=name, version=1, updated_at=datetime.now()).on_conflict_do_nothing()
+        )
+        version = 1
+    return version
+
+
+class MemoryBackend:
+    """Per-process LRU."""
+    name = "memory"
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, Entry] = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Entry]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    async def set(self, key: str, entry: Entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def discard_before(self, version: int):
+        for key in [key for key, entry in self._entries.items() if entry.version < version]:
+            del self._entries[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class PostgresBackend:
+    """Entries in cache_entries, shared by every worker; the oldest beyond max_entries are pruned on write."""
+    name = "postgres"
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+
+    async def get(self, key: str) -> Optional[Entry]:
+        async with AsyncSessionLocal() as session:
+            row = (await session.execute(
+                select(CacheEntry.value, CacheEntry.version, CacheEntry.created_at).where(CacheEntry.key == key)
+            )).first()
+        return Entry(row.value, row.version, row.created_at.timestamp()) if row else None
+
+    async def set(self, key: str, entry: Entry):
+        values = dict(value=entry.value, version=entry.version, created_at=datetime.fromtimestamp(entry.created_at))
+        async with AsyncSessionLocal() as session:
+            await session.execute(
+                insert(CacheEntry).values(key=key, **values).on_conflict_do_update(index_elements=["key"], set_=values)
+            )
+            oldest = select(CacheEntry.key).order_by(CacheEntry.created_at.desc()).offset(self.max_entries)
+            await session.execute(delete(CacheEntry).where(CacheEntry.key.in_(oldest)))
+            await session.commit()
+
+    async def discard_before(self, version: int):
+        async with AsyncSessionLocal() as session:
+            await session.execute(delete(CacheEntry).where(CacheEntry.version < version))
+            await session.commit()
+
+
+BACKENDS = {backend.name: backend for backend in (MemoryBackend, PostgresBackend)}
+
+
+class ResultCache:
+    def __init__(self, backend=None, ttl: float = CACHE_TTL_SECONDS, stale: float = CACHE_STALE_SECONDS):
+        if backend is None:
+            if CACHE_BACKEND not in BACKENDS:
+                raise ValueError(f"Unknown CACHE_BACKEND {CACHE_BACKEND!r}; use one of {', '.join(BACKENDS)}")
+            backend = BACKENDS[CACHE_BACKEND]()
+        self.backend = backend
+        self.ttl = ttl
+        self.stale = stale
+        self.stats: Dict[str, int] = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "refresh_errors": 0}
+        self._version: Optional[int] = None
+        self._views_version = 0
+        self._version_checked = 0.0
+        self._refreshing: Dict[str, asyncio.Task] = {}
+
+    async def data_version(self) -> int:
+        if self._version is None or time.monotonic() - self._version_checked >= CACHE_VERSION_CHECK_SECONDS:
+            versions = await flights.do("data_version", self._read_versions)
+            self._version, self._views_version = versions.get(DATA, 0), versions.get(VIEW_DATA, 0)
+            self._version_checked = time.monotonic()
+        return self._version
+
+    async def views_version(self) -> int:
+        await self.data_version()  # Both are reread together
+        return self._views_version
+
+    async def _read_versions(self) -> Dict[str, int]:
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(DataVersion.name, DataVersion.version).where(DataVersion.name.in_([DATA, VIEW_DATA]))
+            )
+            return dict(result.all())
+
+    async def invalidate(self, version: Optional[int] = None):
+        """
+        Forget results computed before `version` (after a bump this process made);
+        with no version, force the next lookup to reread it.
+        """
+        if version is None:
+            self._version = None
+            return
+        self._version, self._version_checked = version, time.monotonic()
+        await self.backend.discard_before(version)
+
+    def invalidate_views(self, version: int):
+        """
+        Stop serving results computed from the views before `version` (after a refresh
+        this process made); other entries are untouched. The old view entries are no
+        longer looked up and age out of the backend.
+        """
+        self._views_version = max(self._views_version, version)
+
+    async def get_or_compute(
+        self, key: str, compute: Callable[[AsyncSession], Awaitable[Any]], views: bool = False
+    ) -> Any:
+        """
+        Cached result for `key`, else `await compute(session)` on a session of its own
+        (so a background refresh can outlive the request). Results are stored, and
+        returned, in their JSON-compatible form. Pass `views` when the result reads the
+        analytics materialized views, so it is recomputed after they are refreshed.
+        """
+        if self.ttl <= 0:
+            return await flights.do(key, lambda: self._compute(compute), group=endpoint(key))
+
+        version = await self.data_version()
+        if views:
+            key = f"{key}@views={self._views_version}"
+        entry = await self.backend.get(key)
+        if entry is not None and entry.version == version:
+            age = time.time() - entry.created_at
+            if age < self.ttl:
+                self.stats["hits"] += 1
+                return entry.value
+            if age < self.ttl + self.stale:
+                self.stats["stale_hits"] += 1
+                self._revalidate(key, compute, version)
+                return entry.value
+
+        self.stats["misses"] += 1
+        return await self._fill(key, compute, version)
+
+    async def _compute(self, compute) -> Any:
+        async with AsyncSessionLocal() as session:
+            return jsonable_encoder(await compute(session))
+
+    async def _fill(self, key: str, compute, version: int) -> Any:
+        # Concurrent misses (and a refresh racing them) share one computation
+        return await flights.do(
+            f"{key}@{version}", lambda: self._compute_and_store(key, compute, version), group=endpoint(key)
+        )
+
+    async def _compute_and_store(self, key: str, compute, version: int) -> Any:
+        created_at = time.time()
+        value = await self._compute(compute)
+        # Don't store a result computed from data that changed meanwhile (a bump seen by this process)
+        if self._version is None or self._version <= version:
+            await self.backend.set(key, Entry(value, version, created_at))
+        return value
+
+    def _revalidate(self, key: str, compute, version: int):
+        if key in self._refreshing:
+            return
+
+        async def refresh():
+            try:
+                await self._fill(key, compute, version)
+                self.stats["refreshes"] += 1
+            except Exception as e:
+                # The stale value keeps being served until it expires; the next miss retries
+                self.stats["refresh_errors"] += 1
+                print(f"Cache refresh of {key} failed: {e.__class__.__name__}: {e}")
+            finally:
+                self._refreshing.pop(key, None)
+
+        self._refreshing[key] = asyncio.create_task(refresh())
+
+    def info(self) -> dict:
+        """Configuration and counters, for /admin/cache_stats."""
+        return {
+            "backend": self.backend.name,
+            "ttl_seconds": self.ttl,
+            "stale_seconds": self.stale,
+            "data_version": self._version,
+            "views_version": self._views_version,
+            "entries": len(self.backend) if isinstance(self.backend, MemoryBackend) else None,  # Not tracked for postgres
+            "refreshing": len(self._refreshing),
+            **self.stats,
+        }
+
+    async def close(self):
+        """Cancel background refreshes (application shutdown)."""
+        tasks = list(self._refreshing.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# Shared cache for the API process
+result_cache = ResultCache()
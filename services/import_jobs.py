@@ -0,0 +1,177 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import uuid
+from datetime import datetime
+from typing import Dict, Optional
+from database import AsyncSessionLocal
+from models import ImportJob
+from repositories.import_job import ImportJobRepository
+from services.import_pipeline import run_stages
+from services.import_service import IMPORT_TYPES, ImportService
+
+"""
+Background import jobs.
+Uploads are written to IMPORT_DIR and loaded by an in-process task, so the HTTP request
+returns immediately with a job id. Every chunk commits together with its checkpoint,
+which lets a job interrupted by a crash or restart resume where it stopped.
+"""
+
+IMPORT_DIR = os.getenv("IMPORT_DIR", os.path.join(tempfile.gettempdir(), "bms_imports"))
+STALE_AFTER_SECONDS = 120  # A running job without a heartbeat this long is considered orphaned
+
+COUNT_KEYS = ("inserted", "updated", "unchanged", "duplicates")
+
+
+def job_status(job: ImportJob) -> dict:
+    """Summarize a job for the status endpoint: progress, throughput and ETA."""
+    progress = job.progress or {}
+    bytes_done = sum(p.get("bytes") or 0 for p in progress.values())
+    bytes_total = sum(p.get("bytes_total") or 0 for p in progress.values())
+
+    throughput = None
+    eta_seconds = None
+    if job.started_at:
+        elapsed = ((job.finished_at or datetime.utcnow()) - job.started_at).total_seconds()
+        run_rows = job.rows_processed - job.rows_at_start
+        if elapsed > 0:
+            throughput = round(run_rows / elapsed, 1)
+        if job.status == "running" and throughput and bytes_done:
+            # Extrapolate the row total from how much of the files has been read.
+            estimated_rows = job.rows_processed * bytes_total / bytes_done
+            eta_seconds = round(max(estimated_rows - job.rows_processed, 0) / throughput, 1)
+    if job.status == "completed":
+        eta_seconds = 0
+
+    return {
+        "id": job.id,
+        "status": job.status,
+        "rows_processed": job.rows_processed,
+        "throughput_rows_per_sec": throughput,
+        "eta_seconds": eta_seconds,
+        "bytes_processed": bytes_done,
+        "bytes_total": bytes_total,
+        "progress": progress,
+        "error_count": job.error_count,
+        "errors": job.errors or [],
+        "created_date": job.created_date,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+
+class ImportJobRunner:
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    async def submit(self, uploads: Dict[str, object]) -> ImportJob:
+        """Persist the uploaded files (type -> binary file object), create the job and start it."""
+        for type in uploads:
+            if type not in IMPORT_TYPES:
+                raise ValueError(f"Unknown data type: {type}")
+
+        job_id = uuid.uuid4().hex
+        job_dir = os.path.join(IMPORT_DIR, job_id)
+        os.makedirs(job_dir, exist_ok=True)
+
+        sources, progress = {}, {}
+        for type, fileobj in uploads.items():
+            path = os.path.join(job_dir, f"{type}.json")
+            await asyncio.to_thread(self._save, fileobj, path)
+            sources[type] = path
+            progress[type] = {"rows": 0, "bytes": 0, "bytes_total": os.path.getsize(path), "done": False,
+                              **{key: 0 for key in COUNT_KEYS}}
+
+        async with AsyncSessionLocal() as session:
+            job = await ImportJobRepository(session).create(job_id, sources, progress)
+        await self.start(job_id)
+        return job
+
+    @staticmethod
+    def _save(fileobj, path):
+        with open(path, "wb") as out:
+            shutil.copyfileobj(fileobj, out, 1 << 20)
+
+    async def start(self, job_id: Optional[str] = None, include_failed: bool = False) -> list[str]:
+        """Claim runnable jobs (one id, or every orphaned/queued job) and run them in the background."""
+        async with AsyncSessionLocal() as session:
+            claimed = await ImportJobRepository(session).claim(
+                job_id, stale_after=STALE_AFTER_SECONDS, include_failed=include_failed
+            )
+        for claimed_id in claimed:
+            task = asyncio.create_task(self._run(claimed_id))
+            self._tasks[claimed_id] = task
+            task.add_done_callback(lambda _, i=claimed_id: self._tasks.pop(i, None))
+        return claimed
+
+    async def resume_pending(self) -> list[str]:
+        """Restart queued jobs and jobs orphaned by a crashed worker (called at startup)."""
+        return await self.start()
+
+    async def shutdown(self):
+        # Cancelled jobs keep status 'running'; their heartbeat goes stale and they resume on next start.
+        for task in list(self._tasks.values()):
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    async def get(self, job_id: str) -> Optional[ImportJob]:
+        async with AsyncSessionLocal() as session:
+            return await ImportJobRepository(session).get_by_id(job_id)
+
+    async def _run(self, job_id: str):
+        job = await self.get(job_id)
+        progress = job.progress or {}
+        pending = {type: path for type, path in job.sources.items() if not progress.get(type, {}).get("done")}
+
+        try:
+            await run_stages({
+                type: (lambda t=type, p=path: self._load(job_id, t, p, progress.get(t, {})))
+                for type, path in pending.items()
+            })
+        except Exception as e:
+            async with AsyncSessionLocal() as session:
+                await ImportJobRepository(session).finish(
+                    job_id, "failed", {"message": str(e), "at": datetime.utcnow().isoformat()}
+                )
+            return
+
+        async with AsyncSessionLocal() as session:
+            await ImportJobRepository(session).finish(job_id, "completed")
+        shutil.rmtree(os.path.join(IMPORT_DIR, job_id), ignore_errors=True)
+
+    async def _load(self, job_id: str, type: str, path: str, checkpoint: dict):
+        # Cumulative checkpoint for this type, continuing from what was already committed.
+        state = {
+            "rows": checkpoint.get("rows", 0),
+            "bytes": checkpoint.get("bytes", 0),
+            "bytes_total": checkpoint.get("bytes_total"),
+            "done": False,
+            **{key: checkpoint.get(key, 0) for key in COUNT_KEYS},
+        }
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Upload for '{type}' is no longer available; submit the import again")
+
+        async with AsyncSessionLocal() as session:
+            repository = ImportJobRepository(session)
+
+            async def on_chunk(rows, counts, stream):
+                state["rows"] += rows
+                state["bytes"] = stream.bytes_read
+                state["bytes_total"] = stream.bytes_total
+                for key in COUNT_KEYS:
+                    state[key] += counts[key]
+                await repository.record_progress(job_id, type, rows, state)
+
+            # Data and checkpoint share a transaction; import_file commits once per chunk.
+            service = ImportService(session, autocommit=False)
+            await service.import_file(type, path, skip=state["rows"], on_chunk=on_chunk)
+
+            state["done"] = True
+            state["bytes"] = state["bytes_total"]
+            await repository.record_progress(job_id, type, 0, state)
+            await session.commit()
+
+
+# Shared runner for the API process
+import_jobs = ImportJobRunner()
@@ -0,0 +1,71 @@
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Dict, List
+from database import Base
+import models  # noqa: F401  (registers every table on Base.metadata)
+from services.import_service import IMPORT_TYPES
+
+"""
+Import orchestration.
+Tables are grouped into dependency stages from the foreign keys declared in models.py:
+a stage only starts once every table it references has finished loading, and the
+tables inside a stage load concurrently, each on its own pooled connection.
+"""
+
+
+def dependency_stages(table_names) -> List[List[str]]:
+    """
+    Group table names into stages so every FK target sits in an earlier stage.
+    References to tables outside `table_names` are assumed to be loaded already.
+    """
+    tables = {name: Base.metadata.tables[name] for name in table_names}
+    depends_on = {
+        name: {
+            fk.column.table.name
+            for fk in table.foreign_keys
+            if fk.column.table.name in tables and fk.column.table.name != name
+        }
+        for name, table in tables.items()
+    }
+
+    stages, done = [], set()
+    while len(done) < len(tables):
+        ready = sorted(name for name in tables if name not in done and depends_on[name] <= done)
+        if not ready:
+            raise ValueError(f"Circular foreign key dependency between: {sorted(set(tables) - done)}")
+        stages.append(ready)
+        done.update(ready)
+    return stages
+
+
+async def run_stages(loaders: Dict[str, Callable[[], Awaitable]]) -> dict:
+    """
+    Run one loader per table, stage by stage. Loaders in a stage run concurrently and
+    must open their own connection. If any loader fails the remaining stages are
+    skipped and the first error is raised once its stage has settled.
+    Returns {table: {"result": ..., "seconds": ...}}.
+    """
+    results = {}
+    for stage in dependency_stages(loaders):
+
+        async def timed(name):
+            start = time.perf_counter()
+            result = await loaders[name]()
+            results[name] = {"result": result, "seconds": round(time.perf_counter() - start, 3)}
+
+        outcomes = await asyncio.gather(*(timed(name) for name in stage), return_exceptions=True)
+        errors = [o for o in outcomes if isinstance(o, BaseException)]
+        if errors:
+            raise errors[0]
+    return results
+
+
+def type_for_filename(filename: str) -> str:
+    """Map an upload name like 'patient.json' or 'appointment_services.json' to its import type."""
+    stem = os.path.splitext(os.path.basename(filename or ""))[0].lower()
+    for candidate in (stem, f"{stem}s"):
+        if candidate in IMPORT_TYPES:
+            return candidate
+    raise ValueError(f"Cannot infer data type from file name: {filename}")
+
@@ -1,152 +1,450 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import column, func, literal_column, select, tuple_, update, values
+from sqlalchemy.dialects.postgresql import insert
 from models import Patient, Provider, Service, Appointment, AppointmentService, Payment
+import asyncio
+import json
 from datetime import datetime
+from pydantic import ValidationError
+from json_stream import CHUNK_SIZE, convert_fields, iter_json_chunks, iter_ndjson_batches
+import schemas
+from services.autocomplete import autocomplete
+from repositories.appointment import AppointmentRepository
+from repositories.daily_metrics import DailyMetricsRepository
+from services.cache import bump_data_version, result_cache
+
+UPSERT_BATCH_SIZE = 5000  # Rows per INSERT ... ON CONFLICT statement
+MAX_BIND_PARAMS = 32767  # Postgres limit on parameters in a single statement
 
 def parse_dt(dt_str):
     if not dt_str:
         return None
+    if isinstance(dt_str, datetime):
+        return dt_str  # Already converted by the streaming reader
     # Handle various formats or fallback
     try:
         return datetime.fromisoformat(str(dt_str).replace('Z', '+00:00'))
     except ValueError:
         return None
 
+# Import type -> (upsert method, timestamp fields converted while streaming)
+IMPORT_TYPES = {
+    "patients": ("upsert_patients", ("date_of_birth", "created_date")),
+    "providers": ("upsert_providers", ("created_date",)),
+    "services": ("upsert_services", ("created_date",)),
+    "appointments": ("upsert_appointments", ("created_date",)),
+    "appointment_services": ("upsert_appointment_services", ("start", "end")),
+    "payments": ("upsert_payments", ("date", "created_date")),
+}
+
+# Import type -> schema each NDJSON line is validated against
+IMPORT_SCHEMAS = {
+    "patients": schemas.PatientImport,
+    "providers": schemas.ProviderImport,
+    "services": schemas.ServiceImport,
+    "appointments": schemas.AppointmentImport,
+    "appointment_services": schemas.AppointmentServiceImport,
+    "payments": schemas.PaymentImport,
+}
+
+def describe_error(e: Exception) -> str:
+    return f"{e.__class__.__name__}: {getattr(e, 'orig', e)}"
+
+def validate_lines(schema, lines: list) -> tuple[list, list]:
+    """Parse and validate raw NDJSON lines; returns (records, errors) keeping line numbers."""
+    records, errors = [], []
+    for line_no, raw in lines:
+        try:
+            record = json.loads(raw)
+            if not isinstance(record, dict):
+                raise ValueError("Each line must be a JSON object")
+            validated = schema.model_validate(record)
+        except ValidationError as e:
+            errors.append({"line": line_no, "error": "; ".join(
+                f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()
+            )})
+            continue
+        except ValueError as e:
+            errors.append({"line": line_no, "error": str(e)})
+            continue
+        # Keep only the fields that were sent so missing ones keep their stored values
+        records.append((line_no, validated.model_dump(include=set(record))))
+    return records, errors
+
+class IncompleteRecords(ValueError):
+    """New records (not yet stored, so they can't be partial updates) missing required fields."""
+
+    def __init__(self, table: str, missing: dict):
+        self.missing = missing  # key tuple -> names of the missing fields
+        details = "; ".join(
+            f"{'/'.join(str(part) for part in key)}: {', '.join(fields)}" for key, fields in list(missing.items())[:10]
+        )
+        more = f" (and {len(missing) - 10} more)" if len(missing) > 10 else ""
+        super().__init__(f"{len(missing)} new {table} record(s) missing required fields: {details}{more}")
+
+
 class ImportService:
-    def __init__(self, session: AsyncSession):
+    def __init__(self, session: AsyncSession, autocommit: bool = True):
         self.session = session
+        # With autocommit off the caller owns the transaction (e.g. to commit data
+        # together with a job checkpoint); import_file and import_ndjson always commit
+        # once per chunk themselves.
+        self.autocommit = autocommit
+        # Work to run once the current transaction commits (e.g. patching in-process indexes)
+        self._after_commit = []
 
-    async def upsert_patients(self, data: list[dict]):
-        for item in data:
-            # Check if exists by ID
-            stmt = select(Patient).where(Patient.id == item["id"])
-            result = await self.session.execute(stmt)
-            existing = result.scalar_one_or_none()
-
-            if existing:
-                # Update fields
-                existing.first_name = item.get("first_name", existing.first_name)
-                existing.last_name = item.get("last_name", existing.last_name)
-                existing.email = item.get("email", existing.email)
-                existing.phone = item.get("phone", existing.phone)
-                # ... add other fields as needed
-            else:
-                # Create new
-                new_record = Patient(
-                    id=item["id"],
-                    first_name=item["first_name"],
-                    last_name=item["last_name"],
-                    date_of_birth=parse_dt(item.get("date_of_birth")),
-                    gender=item.get("gender"),
-                    address=item.get("address"),
-                    phone=item.get("phone"),
-                    email=item.get("email"),
-                    source=item.get("source"),
-                    created_date=parse_dt(item.get("created_date")) or datetime.utcnow()
-                )
-                self.session.add(new_record)
+    async def commit(self):
+        # Invalidates cached analytics once the data commits (same transaction)
+        version = await bump_data_version(self.session)
         await self.session.commit()
+        await result_cache.invalidate(version)
+        hooks, self._after_commit = self._after_commit, []
+        for hook in hooks:
+            hook()
+        autocomplete.note_version(version)  # The hooks applied this change to the index
 
-    async def upsert_providers(self, data: list[dict]):
-        for item in data:
-            stmt = select(Provider).where(Provider.id == item["id"])
-            result = await self.session.execute(stmt)
-            existing = result.scalar_one_or_none()
-
-            if existing:
-                existing.first_name = item.get("first_name", existing.first_name)
-                existing.last_name = item.get("last_name", existing.last_name)
-                existing.email = item.get("email", existing.email)
-                existing.phone = item.get("phone", existing.phone)
-            else:
-                new_record = Provider(
-                    id=item["id"],
-                    first_name=item["first_name"],
-                    last_name=item["last_name"],
-                    email=item.get("email"),
-                    phone=item.get("phone"),
-                    created_date=parse_dt(item.get("created_date")) or datetime.utcnow()
-                )
-                self.session.add(new_record)
-        await self.session.commit()
+    async def rollback(self):
+        await self.session.rollback()
+        self._after_commit = []
 
-    async def upsert_services(self, data: list[dict]):
-        for item in data:
-            stmt = select(Service).where(Service.id == item["id"])
-            result = await self.session.execute(stmt)
-            existing = result.scalar_one_or_none()
-
-            if existing:
-                existing.name = item.get("name", existing.name)
-                existing.price = item.get("price", existing.price)
-                existing.duration = item.get("duration", existing.duration)
-            else:
-                new_record = Service(
-                    id=item["id"],
-                    name=item["name"],
-                    description=item.get("description"),
-                    price=item.get("price"),
-                    duration=item.get("duration"),
-                    created_date=parse_dt(item.get("created_date")) or datetime.utcnow()
-                )
-                self.session.add(new_record)
-        await self.session.commit()
+    async def import_file(self, type: str, source, chunk_size: int = CHUNK_SIZE, skip: int = 0, on_chunk=None) -> dict:
+        """
+        Stream a JSON array file (path or binary file object) into the matching upsert,
+        one chunk at a time so memory stays bounded by chunk_size.
+        `skip` resumes after that many records; `on_chunk(rows, counts, stream)` is awaited
+        after each chunk is written and before it is committed.
+        Returns the number of records processed plus inserted/updated/unchanged/duplicates counts.
+        """
+        if type not in IMPORT_TYPES:
+            raise ValueError(f"Unknown data type: {type}")
+        method_name, date_fields = IMPORT_TYPES[type]
+        upsert = getattr(self, method_name)
+
+        totals = {"processed": 0, "inserted": 0, "updated": 0, "unchanged": 0, "duplicates": 0}
+        transform = convert_fields(date_fields, parse_dt)
+        stream = iter_json_chunks(source, chunk_size, transform, skip=skip)
+        # Each chunk (and whatever on_chunk writes) commits here, once, never inside the upserts
+        autocommit, self.autocommit = self.autocommit, False
+        try:
+            async for chunk in stream:
+                counts = await upsert(chunk)
+                if on_chunk:
+                    await on_chunk(len(chunk), counts, stream)
+                await self.commit()
+                totals["processed"] += len(chunk)
+                for key, value in counts.items():
+                    totals[key] += value
+        except Exception:
+            await self.rollback()  # The failed chunk is not committed
+            raise
+        finally:
+            self.autocommit = autocommit
+            stream.close()
+        return totals
+
+    async def import_ndjson(self, type: str, byte_chunks, batch_size: int = CHUNK_SIZE):
+        """
+        Import newline-delimited JSON as it arrives (e.g. straight from a request body).
+        Async generator of report entries: one per invalid line, one per written batch
+        and a final summary. Each batch commits on its own. A batch that fails to write
+        is rolled back and retried line by line, so the lines at fault are reported
+        individually and the rest of the batch still imports. Memory is bounded by
+        batch_size.
+        """
+        if type not in IMPORT_TYPES:
+            raise ValueError(f"Unknown data type: {type}")
+        upsert = getattr(self, IMPORT_TYPES[type][0])
+        schema = IMPORT_SCHEMAS[type]
+
+        # Batches (and retried lines) commit here, never inside the upserts
+        autocommit, self.autocommit = self.autocommit, False
+        totals = {"processed": 0, "inserted": 0, "updated": 0, "unchanged": 0, "duplicates": 0, "failed": 0}
+        try:
+            async for lines in iter_ndjson_batches(byte_chunks, batch_size):
+                records, errors = await asyncio.to_thread(validate_lines, schema, lines)
+                totals["failed"] += len(errors)
+                for error in errors:
+                    yield error
+
+                if not records:
+                    continue
+                try:
+                    counts = await upsert([record for _, record in records])
+                    await self.commit()
+                except Exception:
+                    await self.rollback()
+                    async for entry in self._import_lines(upsert, records, totals):
+                        yield entry
+                    continue
+
+                totals["processed"] += len(records)
+                for key, value in counts.items():
+                    totals[key] += value
+                yield {"lines": [records[0][0], records[-1][0]], "written": len(records), **counts}
+        finally:
+            self.autocommit = autocommit
+
+        yield {"status": "completed", "type": type, **totals}
+
+    async def _import_lines(self, upsert, records: list, totals: dict):
+        # Write a failed batch again one record per savepoint: records that fail are
+        # reported by line and skipped, the rest commit together.
+        written = []
+        counts = {"inserted": 0, "updated": 0, "unchanged": 0, "duplicates": 0}
+        for line_no, record in records:
+            hooks = len(self._after_commit)
+            try:
+                async with self.session.begin_nested():
+                    line_counts = await upsert([record])
+            except Exception as e:
+                del self._after_commit[hooks:]  # Post-commit work for the rolled back record
+                totals["failed"] += 1
+                yield {"line": line_no, "error": describe_error(e)}
+                continue
+            written.append(line_no)
+            for key, value in line_counts.items():
+                counts[key] += value
+
+        if not written:
+            await self.rollback()
+            return
+        await self.commit()
+        totals["processed"] += len(written)
+        for key, value in counts.items():
+            totals[key] += value
+        yield {"lines": [written[0], written[-1]], "written": len(written), **counts}
+
+    async def _upsert(self, model, rows: list[dict], update_fields: list[str], conflict_fields=("id",), commit=True) -> dict:
+        """
+        Set-based upsert: INSERT ... ON CONFLICT DO UPDATE in batches.
+        Only update_fields are touched on conflict; a NULL/missing incoming value keeps
+        the stored one, and rows whose values would not change are skipped entirely.
+        Partial records (missing a required column) of existing rows can only update,
+        so they go through a batched UPDATE ... FROM (VALUES ...) instead; a partial
+        record for a new key raises IncompleteRecords before anything is written.
+        Repeated keys in `rows` are written once (last occurrence wins) and counted
+        as duplicates, so the counts add up to len(rows).
+        commit=False leaves the autocommit to the caller, for follow-up writes that
+        belong in the same transaction.
+        """
+        counts = {"inserted": 0, "updated": 0, "unchanged": 0, "duplicates": 0}
+        if not rows:
+            return counts
+
+        # ON CONFLICT cannot touch the same row twice in one statement: last occurrence wins.
+        unique = list({tuple(r[f] for f in conflict_fields): r for r in rows}.values())
+        counts["duplicates"] = len(rows) - len(unique)
+
+        table = model.__table__
+        required = [c.name for c in table.columns if not c.nullable and c.name in rows[0]]
+        full_rows, partial_rows = [], []
+        for row in unique:
+            (partial_rows if any(row[c] is None for c in required) else full_rows).append(row)
+        if partial_rows:
+            await self._check_existing(table, partial_rows, conflict_fields, required)
+
+        batch_size = max(1, min(UPSERT_BATCH_SIZE, MAX_BIND_PARAMS // len(rows[0])))
+        for start in range(0, len(full_rows), batch_size):
+            batch = full_rows[start:start + batch_size]
+
+            stmt = insert(table).values(batch)
+            new_values = {f: func.coalesce(stmt.excluded[f], table.c[f]) for f in update_fields}
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c[f] for f in conflict_fields],
+                set_=new_values,
+                where=tuple_(*[table.c[f] for f in update_fields]).is_distinct_from(tuple_(*new_values.values())),
+            ).returning(literal_column("xmax = 0"))  # xmax is 0 only for freshly inserted rows
 
-    async def upsert_appointments(self, data: list[dict]):
-        for item in data:
-            stmt = select(Appointment).where(Appointment.id == item["id"])
             result = await self.session.execute(stmt)
-            existing = result.scalar_one_or_none()
-
-            if existing:
-                existing.status = item.get("status", existing.status)
-            else:
-                new_record = Appointment(
-                    id=item["id"],
-                    patient_id=item["patient_id"],
-                    status=item.get("status"),
-                    created_date=parse_dt(item.get("created_date")) or datetime.utcnow()
-                )
-                self.session.add(new_record)
-        await self.session.commit()
+            flags = result.scalars().all()
+            inserted = sum(1 for f in flags if f)
+            counts["inserted"] += inserted
+            counts["updated"] += len(flags) - inserted
+            counts["unchanged"] += len(batch) - len(flags)
 
-    async def upsert_appointment_services(self, data: list[dict]):
-        # This one is tricky because it has a composite logic or auto-increment ID.
-        # Assuming we trust the input data's logic or just append if ID not present.
-        # For simplicity, if no ID is provided, we treat it as new.
-        for item in data:
-            # We rarely update these unless we have a specific ID. 
-            # If creating new, just add.
-            new_record = AppointmentService(
-                appointment_id=item["appointment_id"],
-                service_id=item["service_id"],
-                provider_id=item["provider_id"],
-                start=parse_dt(item.get("start")),
-                end=parse_dt(item.get("end"))
-            )
-            self.session.add(new_record)
-        await self.session.commit()
+        key_fields = list(conflict_fields) + update_fields
+        batch_size = max(1, min(UPSERT_BATCH_SIZE, MAX_BIND_PARAMS // len(key_fields)))
+        for start in range(0, len(partial_rows), batch_size):
+            batch = partial_rows[start:start + batch_size]
 
-    async def upsert_payments(self, data: list[dict]):
-        for item in data:
-            stmt = select(Payment).where(Payment.id == item["id"])
+            incoming = values(*[column(f, table.c[f].type) for f in key_fields], name="incoming").data(
+                [tuple(r[f] for f in key_fields) for r in batch]
+            )
+            new_values = {f: func.coalesce(incoming.c[f], table.c[f]) for f in update_fields}
+            stmt = (
+                update(table)
+                .where(*[table.c[f] == incoming.c[f] for f in conflict_fields])
+                .where(tuple_(*[table.c[f] for f in update_fields]).is_distinct_from(tuple_(*new_values.values())))
+                .values(new_values)
+            )
             result = await self.session.execute(stmt)
-            existing = result.scalar_one_or_none()
-
-            if existing:
-                existing.status = item.get("status", existing.status)
-            else:
-                new_record = Payment(
-                    id=item["id"],
-                    patient_id=item["patient_id"],
-                    amount=item["amount"],
-                    date=parse_dt(item.get("date")),
-                    method=item.get("method"),
-                    status=item.get("status"),
-                    provider_id=item.get("provider_id"),
-                    appointment_id=item.get("appointment_id"),
-                    service_id=item.get("service_id"),
-                    created_date=parse_dt(item.get("created_date")) or datetime.utcnow()
-                )
-                self.session.add(new_record)
-        await self.session.commit()
+            counts["updated"] += result.rowcount
+            counts["unchanged"] += len(batch) - result.rowcount
+
+        if self.autocommit and commit:
+            await self.commit()
+        return counts
+
+    async def _check_existing(self, table, rows: list[dict], conflict_fields, required: list[str]):
+        # Partial records may only update: raise for any whose key isn't stored yet
+        key_columns = [table.c[f] for f in conflict_fields]
+        keys = [tuple(r[f] for f in conflict_fields) for r in rows]
+        existing = set()
+        for start in range(0, len(keys), UPSERT_BATCH_SIZE):
+            batch = [key for key in keys[start:start + UPSERT_BATCH_SIZE] if None not in key]
+            if batch:
+                result = await self.session.execute(select(*key_columns).where(tuple_(*key_columns).in_(batch)))
+                existing.update(tuple(row) for row in result)
+
+        missing = {}
+        for key, row in zip(keys, rows):
+            if key not in existing:
+                missing[key] = [c for c in required if row[c] is None]
+        if missing:
+            raise IncompleteRecords(table.name, missing)
+
+    async def _refresh_derived(self, counts: dict, appointment_ids=None, days=None):
+        # Keep the stored appointment summaries and the daily_metrics rollup in step
+        # with the rows just written, in the same transaction.
+        if counts["inserted"] or counts["updated"]:
+            if appointment_ids is not None:
+                await AppointmentRepository(self.session).refresh_summaries(appointment_ids)
+            if days is not None:
+                await DailyMetricsRepository(self.session).refresh_dates(days)
+        if self.autocommit:
+            await self.commit()
+
+    async def _refresh_autocomplete(self, type: str, rows: list[dict], counts: dict):
+        # Re-read what was actually stored (partial rows keep their old values) and
+        # apply it to the typeahead index once the transaction commits.
+        if not (counts["inserted"] or counts["updated"]):
+            return
+        stored = await autocomplete.fetch_rows(type, [row["id"] for row in rows], self.session)
+        hook = lambda: autocomplete.upsert(type, stored)
+        if self.autocommit:
+            hook()  # _upsert has already committed
+        else:
+            self._after_commit.append(hook)
+
+    async def upsert_patients(self, data: list[dict]) -> dict:
+        rows = [
+            {
+                "id": item["id"],
+                "first_name": item.get("first_name"),
+                "last_name": item.get("last_name"),
+                "date_of_birth": parse_dt(item.get("date_of_birth")),
+                "gender": item.get("gender"),
+                "address": item.get("address"),
+                "phone": item.get("phone"),
+                "email": item.get("email"),
+                "source": item.get("source"),
+                "created_date": parse_dt(item.get("created_date")) or datetime.utcnow(),
+            }
+            for item in data
+        ]
+        # Existing patients only get their name and contact details refreshed
+        counts = await self._upsert(Patient, rows, ["first_name", "last_name", "email", "phone"])
+        await self._refresh_autocomplete("patient", rows, counts)
+        return counts
+
+    async def upsert_providers(self, data: list[dict]) -> dict:
+        rows = [
+            {
+                "id": item["id"],
+                "first_name": item.get("first_name"),
+                "last_name": item.get("last_name"),
+                "email": item.get("email"),
+                "phone": item.get("phone"),
+                "created_date": parse_dt(item.get("created_date")) or datetime.utcnow(),
+            }
+            for item in data
+        ]
+        counts = await self._upsert(Provider, rows, ["first_name", "last_name", "email", "phone"])
+        await self._refresh_autocomplete("provider", rows, counts)
+        return counts
+
+    async def upsert_services(self, data: list[dict]) -> dict:
+        rows = [
+            {
+                "id": item["id"],
+                "name": item.get("name"),
+                "description": item.get("description"),
+                "price": item.get("price"),
+                "duration": item.get("duration"),
+                "created_date": parse_dt(item.get("created_date")) or datetime.utcnow(),
+            }
+            for item in data
+        ]
+        counts = await self._upsert(Service, rows, ["name", "price", "duration"], commit=False)
+        # A price change moves the total cost of every appointment that includes the service
+        service_ids = [row["id"] for row in rows]
+        await self._refresh_derived(
+            counts,
+            appointment_ids=select(AppointmentService.appointment_id).where(AppointmentService.service_id.in_(service_ids)),
+        )
+        return counts
+
+    async def upsert_appointments(self, data: list[dict]) -> dict:
+        rows = [
+            {
+                "id": item["id"],
+                "patient_id": item.get("patient_id"),
+                "status": item.get("status"),
+                "created_date": parse_dt(item.get("created_date")) or datetime.utcnow(),
+            }
+            for item in data
+        ]
+        counts = await self._upsert(Appointment, rows, ["status"], commit=False)
+        # A status change moves the appointment's bookings and payments between rollup rows
+        await self._refresh_derived(
+            counts, days=DailyMetricsRepository.days_of_appointments([row["id"] for row in rows])
+        )
+        return counts
+
+    async def upsert_appointment_services(self, data: list[dict]) -> dict:
+        # The surrogate id never appears in import files, so rows are matched on the
+        # natural key instead; only the end time can change for an existing slot.
+        rows = [
+            {
+                "appointment_id": item["appointment_id"],
+                "service_id": item["service_id"],
+                "provider_id": item["provider_id"],
+                "start": parse_dt(item.get("start")),
+                "end": parse_dt(item.get("end")),
+            }
+            for item in data
+        ]
+        counts = await self._upsert(
+            AppointmentService,
+            rows,
+            ["end"],
+            conflict_fields=("appointment_id", "service_id", "provider_id", "start"),
+            commit=False,
+        )
+        await self._refresh_derived(
+            counts,
+            appointment_ids=list({row["appointment_id"] for row in rows}),
+            days={row["start"].date() for row in rows if row["start"]},
+        )
+        return counts
+
+    async def upsert_payments(self, data: list[dict]) -> dict:
+        rows = [
+            {
+                "id": item["id"],
+                "patient_id": item.get("patient_id"),
+                "amount": item.get("amount"),
+                "date": parse_dt(item.get("date")),
+                "method": item.get("method"),
+                "status": item.get("status"),
+                "provider_id": item.get("provider_id"),
+                "appointment_id": item.get("appointment_id"),
+                "service_id": item.get("service_id"),
+                "created_date": parse_dt(item.get("created_date")) or datetime.utcnow(),
+            }
+            for item in data
+        ]
+        # Payments are immutable apart from their status
+        counts = await self._upsert(Payment, rows, ["status"], commit=False)
+        await self._refresh_derived(counts, days=DailyMetricsRepository.days_of_payments([row["id"] for row in rows]))
+        return counts
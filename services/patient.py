@@ -11,35 +11,29 @@ class PatientService:
         skip: int = 0, 
         limit: int = 100,
         search: str = None,
-        sort_by: str = "first_name",
-        sort_order: str = "asc"
+        sort_by: str = None,
+        sort_order: str = "asc",
+        cursor: str = None,
+        count: str = "exact"
     ) -> dict:
-        patients, total = await self.repository.get_all(
+        patients, total, total_kind, next_cursor = await self.repository.get_all(
             skip=skip, 
             limit=limit,
             search=search,
             sort_by=sort_by,
-            sort_order=sort_order
+            sort_order=sort_order,
+            cursor=cursor,
+            count=count
         )
-        return {"data": patients, "total": total}
+        return {"data": patients, "total": total, "total_kind": total_kind, "next_cursor": next_cursor}
+
+    async def get_retention(self, **params) -> dict:
+        opportunities, total, total_kind, next_cursor = await self.repository.get_retention(**params)
+        return {"data": opportunities, "total": total, "total_kind": total_kind, "next_cursor": next_cursor}
 
     async def get_patient(self, patient_id: str) -> Optional[Patient]:
-        patient = await self.repository.get_by_id_with_appointments(patient_id)
-        
-        # Calculate metrics for each appointment
-        if patient and patient.appointments:
-            for appointment in patient.appointments:
-                # Load services count and calculate total cost
-                if hasattr(appointment, 'services') and appointment.services:
-                    appointment.service_count = len(appointment.services)
-                    appointment.total_cost = sum(
-                        svc.service.price for svc in appointment.services if svc.service
-                    )
-                else:
-                    appointment.service_count = 0
-                    appointment.total_cost = 0
-        
-        return patient
+        # Appointment service_count and total_cost are stored summary columns
+        return await self.repository.get_by_id_with_appointments(patient_id)
 
     async def get_analytics(self) -> dict:
         return await self.repository.get_analytics()
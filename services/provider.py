@@ -11,19 +11,25 @@ class ProviderService:
         limit: int = 100,
         search: str = None,
         sort_by: str = "first_name",
-        sort_order: str = "asc"
+        sort_order: str = "asc",
+        cursor: str = None,
+        count: str = "exact"
     ) -> dict:
-        providers, total = await self.repository.get_all(
+        providers, total, total_kind, next_cursor = await self.repository.get_all(
             skip=skip, 
             limit=limit,
             search=search,
             sort_by=sort_by,
-            sort_order=sort_order
+            sort_order=sort_order,
+            cursor=cursor,
+            count=count
         )
         
         return {
             "data": providers,
             "total": total,
+            "total_kind": total_kind,
+            "next_cursor": next_cursor,
             "page": (skip // limit) + 1,
             "limit": limit
         }
@@ -0,0 +1,12 @@
+from typing import Iterable, Optional
+from repositories.search import SearchRepository
+
+class SearchService:
+    def __init__(self, repository: SearchRepository):
+        self.repository = repository
+
+    async def search(self, query: str, types: Optional[Iterable[str]] = None, limit: int = 20) -> dict:
+        results = await self.repository.search(query, types=types, limit=limit)
+        for hit in results:
+            hit["rank"] = round(float(hit["rank"]), 4)
+        return {"query": query, "results": results}
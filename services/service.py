@@ -12,17 +12,21 @@ class ServiceService:
         limit: int = 100,
         search: str = None,
         sort_by: str = "name",
-        sort_order: str = "asc"
+        sort_order: str = "asc",
+        cursor: str = None,
+        count: str = "exact"
     ) -> dict:
-        services, total = await self.repository.get_all(
+        services, total, total_kind, next_cursor = await self.repository.get_all(
             skip=skip, 
             limit=limit,
             search=search,
             sort_by=sort_by,
-            sort_order=sort_order
+            sort_order=sort_order,
+            cursor=cursor,
+            count=count
         )
         
-        return {"data": services, "total": total}
+        return {"data": services, "total": total, "total_kind": total_kind, "next_cursor": next_cursor}
 
     async def get_service_analytics(self) -> list[dict]:
         return await self.repository.get_service_analytics()
@@ -0,0 +1,54 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+"""
+Request coalescing ("single flight"): concurrent calls with the same key share one
+in-flight computation instead of each running it. When the clinic opens and every
+workstation loads the dashboard at once, the first request computes and the rest
+wait for its result, so the burst costs one set of queries and one connection.
+
+Only calls that overlap are coalesced; nothing is kept once the computation
+finishes (that is the result cache's job, see services/cache.py).
+"""
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+        # group -> {"calls", "coalesced"}; "calls" - "coalesced" computations actually ran
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    async def do(self, key: str, compute: Callable[[], Awaitable[Any]], group: Optional[str] = None) -> Any:
+        """
+        Result of `await compute()`, shared with every concurrent call for `key`.
+        Callers get the same object (or exception), so it should not be mutated.
+        `group` names the counters (default: the key).
+        """
+        stats = self.stats.setdefault(group or key, {"calls": 0, "coalesced": 0})
+        stats["calls"] += 1
+
+        task = self._calls.get(key)
+        if task is not None:
+            stats["coalesced"] += 1
+        else:
+            task = asyncio.create_task(compute())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+
+        # Shielded: a caller that goes away (client disconnect) must not cancel the
+        # computation the other callers are waiting for.
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # Retrieved here so an unawaited failure isn't logged as "never retrieved"
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+
+# Shared by the API process
+flights = SingleFlight()
@@ -0,0 +1,88 @@
+import asyncio
+import os
+from typing import List, Optional
+from sqlalchemy import select
+from database import AsyncSessionLocal
+from models import DataVersion
+from repositories.materialized_views import VIEWS, MaterializedViewRepository
+from services.cache import DATA, VIEW_DATA, bump_data_version, result_cache
+
+"""
+Background refresh of the analytics materialized views (migration 0010): top
+patients, provider analytics and service analytics. They tolerate a few minutes of
+staleness, so instead of aggregating every booked service per request they are
+recomputed every VIEW_REFRESH_SECONDS, and only when the data has changed since the
+last refresh (the data version, see services/cache.py, has moved on).
+
+The refresh runs in one transaction that holds an advisory lock, so with several
+workers only one refreshes and the others skip that round. REFRESH ... CONCURRENTLY
+keeps the views readable throughout. The transaction also bumps the views version
+(not the data version: no rows changed), so only cached results computed from the
+old view contents are dropped, everywhere.
+"""
+
+VIEW_REFRESH_SECONDS = int(os.getenv("VIEW_REFRESH_SECONDS", "300"))  # 0 turns the scheduler off
+
+
+class ViewRefresher:
+    def __init__(self, session_factory=AsyncSessionLocal):
+        self.session_factory = session_factory
+        self.stats = {"refreshes": 0, "skipped": 0, "locked": 0, "errors": 0}
+        self._task: Optional[asyncio.Task] = None
+
+    async def refresh(self, force: bool = False) -> Optional[List[str]]:
+        """
+        Refresh the views if the data changed since their last refresh (always with
+        `force`). Returns the views refreshed ([] when up to date), or None if
+        another worker is refreshing them.
+        """
+        async with self.session_factory() as session:
+            repository = MaterializedViewRepository(session)
+            if not await repository.try_lock():
+                self.stats["locked"] += 1
+                return None
+
+            version = await session.scalar(select(DataVersion.version).where(DataVersion.name == DATA)) or 0
+            refreshed = await repository.refreshed_versions()
+            if not force and all(refreshed.get(name) == version for name in VIEWS):
+                self.stats["skipped"] += 1
+                return []
+
+            durations = {name: await repository.refresh(name) for name in VIEWS}
+            for name, duration_ms in durations.items():
+                await repository.record(name, duration_ms, version)
+            views_version = await bump_data_version(session, VIEW_DATA)
+            await session.commit()
+
+        # No rows changed: only results computed from the views are retired
+        result_cache.invalidate_views(views_version)
+        self.stats["refreshes"] += 1
+        print("Refreshed materialized views: " + ", ".join(f"{name} {ms:.0f}ms" for name, ms in durations.items()))
+        return list(durations)
+
+    def start(self, interval: int = VIEW_REFRESH_SECONDS):
+        """Check for (and do) a refresh now and then every `interval` seconds."""
+        if interval <= 0 or self._task:
+            return
+
+        async def loop():
+            while True:
+                try:
+                    await self.refresh()
+                except Exception as e:
+                    # The views keep their previous contents; the next round retries
+                    self.stats["errors"] += 1
+                    print(f"Materialized view refresh failed: {e.__class__.__name__}: {e}")
+                await asyncio.sleep(interval)
+
+        self._task = asyncio.create_task(loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+# Shared scheduler for the API process
+view_refresher = ViewRefresher()